@@ -0,0 +1,165 @@
+"""
+Servidor asíncrono (aiohttp + redis.asyncio) con las mismas rutas que main.py.
+
+/metrics lee Redis sin bloquear el event loop, así muchos scrapers y
+dashboards concurrentes no esperan por un hilo libre. Las rutas de consulta
+(/history, /grafana/*) corren sus lecturas en el pool de hilos del loop.
+
+    python async_main.py      # servidor asíncrono en el puerto 5000
+                              # (+ recolector si APP_ROLE=ALL, como main.py)
+
+Requiere aiohttp (está en requirements.txt); el modo Flask de main.py no lo necesita.
+No importa main.py: ambos arman sus servicios con web_services.
+"""
+import asyncio
+import time
+from typing import List, Optional
+
+from aiohttp import web
+
+from src.Services.AsyncRedisService import AsyncRedisService
+from src.Services.ExpositionService import ExpositionService
+from src.Services.GrafanaService import GrafanaService
+from src.Services.HistoryService import HistoryService
+
+
+def create_app(
+    exposition: ExpositionService,
+    redis: AsyncRedisService,
+    history: Optional[HistoryService],
+    grafana: GrafanaService,
+    targets: List[str],
+) -> web.Application:
+    routes = web.RouteTableDef()
+
+    @routes.get("/metrics")
+    async def getmetrics(request: web.Request):
+        """Exposición Prometheus (texto) de todos los targets y del exporter."""
+        etag, body, gzipped = await exposition.fetchExpositionAsync(redis)
+        # ETag fuerte por codificación: el cuerpo gzip y el plano son bytes distintos
+        gzip = _accepts_gzip(request.headers.get("Accept-Encoding"))
+        etag = ExpositionService.encoded_etag(etag, gzip)
+        headers = {"ETag": f'"{etag}"', "Vary": "Accept-Encoding"}
+
+        if _etag_matches(request.headers.get("If-None-Match"), etag):
+            return web.Response(status=304, headers=headers)
+        if gzip:
+            headers["Content-Encoding"] = "gzip"
+            return web.Response(body=gzipped, content_type="text/plain", charset="utf-8", headers=headers)
+        return web.Response(body=body, content_type="text/plain", charset="utf-8", headers=headers)
+
+    @routes.get("/history")
+    async def gethistory(request: web.Request):
+        if not history:
+            return web.json_response({"error": "historial deshabilitado"}, status=404)
+
+        now = time.time()
+        query = request.query
+        try:
+            limit = int(query["limit"]) if query.get("limit") else None
+            result = await asyncio.to_thread(
+                history.read,
+                target=query.get("target", targets[0]),
+                start=float(query.get("from", now - 3600)),
+                end=float(query.get("to", now)),
+                tier=query.get("tier", "auto"),
+                tables=query.getall("table", []),
+                limit=limit,
+            )
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        return web.json_response(result)
+
+    # ------------------- Grafana JSON API datasource -------------------
+    @routes.get("/grafana/")
+    async def grafana_health(request: web.Request):
+        return web.Response(text="OK")
+
+    @routes.post("/grafana/search")
+    async def grafana_search(request: web.Request):
+        return web.json_response(grafana.search(await _json(request)))
+
+    @routes.post("/grafana/metrics")
+    async def grafana_metrics(request: web.Request):
+        names = grafana.search(await _json(request))
+        return web.json_response([{"label": name, "value": name} for name in names])
+
+    @routes.post("/grafana/query")
+    async def grafana_query(request: web.Request):
+        return await _grafana_call(grafana.query, request)
+
+    @routes.post("/grafana/annotations")
+    async def grafana_annotations(request: web.Request):
+        return await _grafana_call(grafana.annotations, request)
+
+    async def close_redis(app: web.Application):
+        await redis.close()
+
+    app = web.Application()
+    app.add_routes(routes)
+    app.on_cleanup.append(close_redis)
+    return app
+
+
+async def _grafana_call(handler, request: web.Request):
+    try:
+        return web.json_response(await asyncio.to_thread(handler, await _json(request)))
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+
+
+async def _json(request: web.Request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/").strip('"') == etag:
+            return True
+    return False
+
+
+def _accepts_gzip(header: Optional[str]) -> bool:
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        return quality > 0
+    return False
+
+
+if __name__ == "__main__":
+    from src.Utils.RedisConection import RedisConection
+    from settings.AppSettings import REDIS_ASYNC_POOL_SIZE
+    from web_services import build_web_services, configure_logging, start_embedded_collector
+
+    configure_logging()
+    services = build_web_services()
+    # con APP_ROLE=ALL el recolector corre en este mismo proceso, una sola vez
+    start_embedded_collector(services)
+
+    web.run_app(
+        create_app(
+            exposition=services["exposition"],
+            redis=AsyncRedisService(RedisConection(), max_connections=REDIS_ASYNC_POOL_SIZE),
+            history=services["history"],
+            grafana=services["grafana"],
+            targets=services["targets"],
+        ),
+        host="0.0.0.0",
+        port=5000,
+    )
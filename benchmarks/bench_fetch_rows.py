@@ -0,0 +1,156 @@
+"""
+Benchmark de la lectura de filas del plan cache.
+
+Compara, para N filas sintéticas de dm_exec_query_stats:
+- dict:    fetchall() + dict(zip(...)) por fila + copy() en la normalización (camino anterior)
+- compact: fetchmany() en bloques + CompactRow anotada en el lugar (camino actual)
+
+Cada modo corre en un subproceso propio para que el pico de RSS sea comparable.
+
+    python -m benchmarks.bench_fetch_rows --rows 50000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+COLUMNS = [
+    ("execution_count", int), ("cpu_time_total", int), ("cpu_time_avg", int),
+    ("duration_total", int), ("duration_avg", int), ("logical_reads_total", int),
+    ("logical_reads_avg", int), ("logical_writes_total", int), ("logical_writes_avg", int),
+    ("physical_reads_total", int), ("physical_reads_avg", int), ("plan_reuse_count", int),
+    ("creation_time", datetime), ("last_execution_time", datetime), ("last_completion_time", datetime),
+    ("query_hash", str), ("sql_handle", str), ("plan_handle", str), ("statement_start_offset", int),
+    ("statement_end_offset", int), ("database_name", str), ("is_internal", int),
+    ("query_text", str), ("avg_cost", Decimal),
+]
+DESCRIPTION = [(name, type_code, None, None, None, None, True) for name, type_code in COLUMNS]
+
+
+def synthetic_rows(count: int):
+    now = datetime(2024, 1, 1)
+    for i in range(count):
+        yield (
+            i + 1, i * 1000, 1000, i * 2000, 2000, i * 10, 10, i, 1, i // 2, 0, 1,
+            now, now + timedelta(seconds=i), now + timedelta(seconds=i, milliseconds=2),
+            f"0x{i:016X}", f"0x{i:040X}", f"0x{i:044X}",
+            0, -1, "Baseconta", 0,
+            f"SELECT col_a, col_b FROM tabla_{i % 300} WHERE id = @p{i % 7}",
+            Decimal("1.25"),
+        )
+
+
+class FakeCursor:
+    def __init__(self, count: int):
+        self.description = DESCRIPTION
+        self._rows = synthetic_rows(count)
+
+    def execute(self, query, params=()):
+        return self
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def fetchmany(self, size):
+        return [row for _, row in zip(range(size), self._rows)]
+
+    def nextset(self):
+        return False
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, count: int):
+        self.count = count
+
+    def cursor(self):
+        return FakeCursor(self.count)
+
+
+class FakePool:
+    def __init__(self, count: int):
+        self.count = count
+
+    def connection(self):
+        from contextlib import nullcontext
+        return nullcontext(FakeConnection(self.count))
+
+    def stats(self):
+        return {}
+
+
+def run_dict(count: int):
+    """Camino anterior: fetchall + dict por fila + copy() al normalizar."""
+    cursor = FakeCursor(count)
+    results = cursor.fetchall()
+    names = [column[0] for column in cursor.description]
+    rows = [dict(zip(names, row)) for row in results]
+    annotated = []
+    for row in rows:
+        row = row.copy()
+        row["query_normalized"] = " ".join(row["query_text"].split()).lower()
+        row["main_table"] = "t"
+        annotated.append(row)
+    return annotated
+
+
+def run_compact(count: int):
+    """Camino actual: BdRepository.getQueryStatsSince (fetchmany + CompactRow) + anotación en el lugar."""
+    from src.Repositories.BdRepository import BdRepository
+
+    repo = BdRepository(db_connection=None, pool=FakePool(count))
+    annotated = []
+    for row in repo.getQueryStatsSince(None):
+        row["query_normalized"] = " ".join(row["query_text"].split()).lower()
+        row["main_table"] = "t"
+        annotated.append(row)
+    return annotated
+
+
+def measure(mode: str, count: int) -> dict:
+    runner = run_dict if mode == "dict" else run_compact
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = runner(count)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "mode": mode,
+        "rows": len(rows),
+        "seconds": round(elapsed, 4),
+        "traced_peak_mb": round(peak / 1024 / 1024, 2),
+        "retained_mb": round(current / 1024 / 1024, 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--mode", choices=["dict", "compact"])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode, args.rows)))
+        return
+
+    print(f"{'mode':<8} {'rows':>8} {'seconds':>9} {'traced_peak_mb':>15} {'retained_mb':>12} {'max_rss_mb':>11}")
+    for mode in ("dict", "compact"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_fetch_rows", "--rows", str(args.rows), "--mode", mode],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{r['mode']:<8} {r['rows']:>8} {r['seconds']:>9} {r['traced_peak_mb']:>15} {r['retained_mb']:>12} {r['max_rss_mb']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Benchmark de scrapes concurrentes a /metrics: Flask (servidor con hilos, como
+main.py) contra async_main (aiohttp + redis.asyncio).
+
+Redis es el stand-in en memoria (benchmarks.redis_standin) en su propio proceso;
+cada servidor corre en otro subproceso y el generador de carga en este.
+Un publicador cambia la generación de un target cada --publish-every segundos
+para que también haya scrapes que releen y recomprimen.
+
+    pip install aiohttp
+    python -m benchmarks.bench_serving --concurrency 1 16 64 --duration 5
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+TARGETS = ["Baseconta", "Nomina"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_port(port: int, timeout: float = 15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"el puerto {port} no respondió")
+
+
+# ------------------- Procesos auxiliares -------------------
+def services():
+    from src.Services.ExpositionService import ExpositionService
+    from src.Services.PrometheusService import PrometheusService
+    from src.Services.RedisService import RedisService
+    from src.Utils.RedisConection import RedisConection
+
+    redis = RedisService(RedisConection())
+    prometheus = PrometheusService()
+    return RedisConection, redis, prometheus, ExpositionService(redis, prometheus, TARGETS)
+
+
+def publish(redis, prometheus, tables: int, seed: int):
+    from src.Services.ExpositionService import ExpositionService
+
+    deltas = {
+        f"tabla_{i}": {
+            "execution_count_delta": seed + i,
+            "cpu_time_total_delta": (seed + i) * 1.5,
+            "duration_total_delta": seed * i,
+            "is_new_table": False,
+        }
+        for i in range(tables)
+    }
+    for target in TARGETS:
+        labels = {"target": target}
+        redis.publish_generation(target, {
+            "metrics": prometheus.generate_text(deltas, "heavy", labels),
+            "QueriesProcessing": prometheus.generate_simple_gauge("db_current_queries", "Consultas", seed, labels),
+        }, 3600)
+        redis.publish_generation(
+            ExpositionService.exporter_namespace(target),
+            {"exposition": prometheus.generate_gauges([("exporter_up", "up", 1, labels)])},
+            3600,
+        )
+
+
+def publisher(tables: int, every: float):
+    _, redis, prometheus, _ = services()
+    seed = 1
+    while True:
+        time.sleep(every)
+        seed += 1
+        publish(redis, prometheus, tables, seed)
+
+
+def run_flask(port: int, tables: int, every: float):
+    from flask import Flask, Response, request
+
+    _, redis, prometheus, exposition = services()
+    publish(redis, prometheus, tables, 1)
+    threading.Thread(target=publisher, args=(tables, every), daemon=True).start()
+
+    app = Flask(__name__)
+
+    # misma ruta que main.py
+    @app.get("/metrics")
+    def getmetrics():
+        etag, body, gzipped = exposition.fetchExposition()
+        gzip = request.accept_encodings.quality("gzip") > 0
+        etag = exposition.encoded_etag(etag, gzip)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        elif gzip:
+            response = Response(gzipped, mimetype="text/plain")
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = Response(body, mimetype="text/plain")
+        response.set_etag(etag)
+        response.vary.add("Accept-Encoding")
+        return response
+
+    import logging
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    app.run(host="127.0.0.1", port=port, threaded=True)
+
+
+def run_async(port: int, tables: int, every: float):
+    from aiohttp import web
+
+    from async_main import create_app
+    from src.Services.AsyncRedisService import AsyncRedisService
+    from src.Services.GrafanaService import GrafanaService
+
+    RedisConection, redis, prometheus, exposition = services()
+    publish(redis, prometheus, tables, 1)
+    threading.Thread(target=publisher, args=(tables, every), daemon=True).start()
+
+    app = create_app(
+        exposition=exposition,
+        redis=AsyncRedisService(RedisConection()),
+        history=None,
+        grafana=GrafanaService(redis, None, TARGETS),
+        targets=TARGETS,
+    )
+    web.run_app(app, host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+# ------------------- Carga -------------------
+async def load(port: int, concurrency: int, duration: float):
+    import aiohttp
+
+    url = f"http://127.0.0.1:{port}/metrics"
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector, headers={"Accept-Encoding": "gzip"}) as session:
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    async with session.get(url) as response:
+                        await response.read()
+                        if response.status != 200:
+                            errors += 1
+                except aiohttp.ClientError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "p50_ms": pick(0.50),
+        "p99_ms": pick(0.99),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--tables", type=int, default=300)
+    parser.add_argument("--publish-every", type=float, default=1.0)
+    parser.add_argument("--role", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == "flask":
+        return run_flask(args.port, args.tables, args.publish_every)
+    if args.role == "async":
+        return run_async(args.port, args.tables, args.publish_every)
+
+    redis_port = free_port()
+    env = {**os.environ, "REDIS_SERVER": "127.0.0.1", "REDIS_PORT": str(redis_port)}
+    module = [sys.executable, "-m", "benchmarks.bench_serving"]
+    common = ["--tables", str(args.tables), "--publish-every", str(args.publish_every)]
+
+    redis_proc = subprocess.Popen([sys.executable, "-m", "benchmarks.redis_standin", "--port", str(redis_port)], env=env)
+    try:
+        wait_port(redis_port)
+        print(f"{'server':>7} {'conc':>5} {'requests':>9} {'req/s':>9} {'p50_ms':>8} {'p99_ms':>8} {'errors':>7}")
+        for role in ("flask", "async"):
+            port = free_port()
+            proc = subprocess.Popen(module + ["--role", role, "--port", str(port)] + common, env=env)
+            try:
+                wait_port(port)
+                asyncio.run(load(port, 4, 1))  # calentamiento
+                for concurrency in args.concurrency:
+                    r = asyncio.run(load(port, concurrency, args.duration))
+                    print(
+                        f"{role:>7} {concurrency:>5} {r['requests']:>9} {r['rps']:>9.0f} "
+                        f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['errors']:>7}"
+                    )
+            finally:
+                proc.terminate()
+                proc.wait()
+    finally:
+        redis_proc.terminate()
+        redis_proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark del snapshot guardado en Redis (<target>:LastMetrics).
+
+Compara JSON con el formato binario de SnapshotCodec (con y sin zlib) en
+tamaño del payload, tiempo de codificación y de decodificación, y verifica
+que cada decode devuelve lo mismo que json.loads(json.dumps(snapshot)).
+
+    python -m benchmarks.bench_snapshot_codec
+    python -m benchmarks.bench_snapshot_codec --tables 100 1000 10000
+"""
+import argparse
+import json
+import random
+import time
+
+from src.Domain.MetricsDomain import MetricsDomain
+from src.Utils.SnapshotCodec import SnapshotCodec
+
+
+def synthetic_rows(count: int, tables: int, seed: int):
+    rng = random.Random(seed)
+    return [
+        {
+            "main_table": f"tabla_{rng.randrange(tables)}",
+            "execution_count": rng.randrange(1, 10_000),
+            "cpu_time_total": rng.randrange(0, 10**9),
+            "logical_reads_total": rng.randrange(0, 10**8),
+            "logical_writes_total": rng.randrange(0, 10**6),
+            "physical_reads_total": rng.randrange(0, 10**6),
+            "duration_total": rng.randrange(0, 10**9),
+        }
+        for _ in range(count)
+    ]
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def synthetic_snapshot(tables: int, seed: int):
+    rows = synthetic_rows(tables * 5, tables, seed)
+    rng = random.Random(seed)
+    for row in rows:
+        # sumas con decimales como las de columnas DECIMAL convertidas a float
+        row["exec_per_second"] = round(rng.random() * 50, 4)
+        row["cpu_time_total"] = row["cpu_time_total"] * 1.0 if rng.random() < 0.5 else row["cpu_time_total"]
+    return MetricsDomain.build_snapshot(
+        MetricsDomain.group_heavy_queries(rows),
+        MetricsDomain.group_frequent_queries(rows),
+        "2026-10-17T12:00:00-06:00",
+        "2026-10-17T11:59:58.123000",
+    )
+
+
+CODECS = {
+    "json": lambda s: SnapshotCodec.encode(s, binary=False),
+    "binary": lambda s: SnapshotCodec.encode(s, compress=False),
+    "binary+zlib": lambda s: SnapshotCodec.encode(s, compress=True),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'tables':>7} {'codec':>12} {'bytes':>10} {'encode_ms':>10} {'decode_ms':>10}  same_output")
+    for tables in args.tables:
+        snapshot = synthetic_snapshot(tables, seed=tables)
+        # json.dumps también distingue 5 de 5.0 y el orden de las claves
+        expected = json.dumps(snapshot)
+        for name, encode in CODECS.items():
+            payload = encode(snapshot)
+            if isinstance(payload, str):
+                payload = payload.encode("utf-8")
+            encode_s = best_of(lambda: encode(snapshot), args.repeat)
+            decode_s = best_of(lambda: SnapshotCodec.decode(payload), args.repeat)
+            same = json.dumps(SnapshotCodec.decode(payload)) == expected
+            print(f"{tables:>7} {name:>12} {len(payload):>10} {encode_s * 1000:>10.2f} {decode_s * 1000:>10.2f}  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark del análisis de sentencias: lexer de una pasada (QueryDomain.analyze)
+contra la cascada de regex anterior (legacy_query_domain).
+
+- Precisión sobre el corpus etiquetado (sql_corpus): aciertos por campo
+  (tabla principal, tipo, todas las tablas). Sale con código 1 si el lexer
+  acierta menos que la cascada en algún campo.
+- Tiempo por sentencia sobre los textos del plan cache sintético: las tres
+  respuestas juntas (lo que hacía QueryAnalysisService._analyze_text) y solo
+  la tabla principal (getMainTable, el camino sin cache de análisis).
+- Cuántas sentencias sintéticas cambian de tabla principal entre ambos.
+
+    python -m benchmarks.bench_sql_lexer
+    python -m benchmarks.bench_sql_lexer --statements 20000 --repeat 5 --verbose
+"""
+import argparse
+import sys
+import time
+
+from benchmarks.legacy_query_domain import LegacyQueryDomain
+from benchmarks.plan_cache_generator import PlanCacheGenerator
+from benchmarks.sql_corpus import CORPUS
+from src.Domain.QueryDomain import QueryDomain
+
+FIELDS = ("main_table", "query_type", "tables")
+
+
+def accuracy(analyze, verbose: bool, label: str):
+    hits = dict.fromkeys(FIELDS, 0)
+    for case in CORPUS:
+        result = analyze(case["sql"])
+        for field in FIELDS:
+            if result[field] == case[field]:
+                hits[field] += 1
+            elif verbose:
+                print(f"  {label:<7} {field:<10} esperado {case[field]!r:<28} obtuvo {result[field]!r}  <- {case['sql'][:60]!r}")
+    return hits
+
+
+def best_of(function, texts, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            function(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--statements", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--verbose", action="store_true", help="muestra cada fallo del corpus")
+    args = parser.parse_args()
+
+    legacy_hits = accuracy(LegacyQueryDomain.analyze, args.verbose, "regex")
+    lexer_hits = accuracy(QueryDomain.analyze, args.verbose, "lexer")
+    print(f"\nCorpus: {len(CORPUS)} sentencias")
+    print(f"{'campo':<12} {'regex':>7} {'lexer':>7}")
+    for field in FIELDS:
+        print(f"{field:<12} {legacy_hits[field]:>7} {lexer_hits[field]:>7}")
+
+    texts = [row["query_text"] for row in PlanCacheGenerator(statements=args.statements).rows()]
+    cases = [
+        ("analyze (tabla + tipo + tablas)", LegacyQueryDomain.analyze, QueryDomain.analyze),
+        ("getMainTable", lambda text: LegacyQueryDomain.getMainTable(" ".join(text.split()).lower()),
+         QueryDomain.getMainTable),
+    ]
+    print(f"\nPlan cache sintético: {len(texts)} sentencias, mejor de {args.repeat}")
+    print(f"{'caso':<34} {'regex_us':>9} {'lexer_us':>9} {'ratio':>7}")
+    for name, legacy, lexer in cases:
+        legacy_time = best_of(legacy, texts, args.repeat)
+        lexer_time = best_of(lexer, texts, args.repeat)
+        print(
+            f"{name:<34} {legacy_time / len(texts) * 1e6:>9.2f} {lexer_time / len(texts) * 1e6:>9.2f} "
+            f"{lexer_time / legacy_time:>7.2f}"
+        )
+
+    changed = sum(
+        1 for text in texts
+        if LegacyQueryDomain.analyze(text)["main_table"] != QueryDomain.analyze(text)["main_table"]
+    )
+    print(f"\nTabla principal distinta en {changed} de {len(texts)} sentencias sintéticas")
+
+    if any(lexer_hits[field] < legacy_hits[field] for field in FIELDS):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark del respaldo de QueryDomain cuando ningún extractor encuentra la
+tabla: búsqueda de la primera tabla de TABLES que aparece en la sentencia.
+
+- loop:  un regex \\b...\\b compilado y corrido por cada entrada de TABLES
+         (camino original)
+- index: índice nombre -> (posición, nombre) armado una vez al importar y
+         una sola pasada por las palabras de la sentencia
+         (QueryDomain._match_known_table)
+
+Las sentencias no tienen FROM/JOIN/UPDATE/INSERT/DELETE, así que siempre
+llegan al respaldo. Se verifica además que ambos caminos elijan la misma
+tabla (gana la primera de TABLES).
+
+    python -m benchmarks.bench_table_matcher
+    python -m benchmarks.bench_table_matcher --statements 6000
+"""
+import argparse
+import random
+import re
+import sys
+import time
+
+from src.Const.tables import TABLES
+from src.Domain.QueryDomain import QueryDomain
+
+
+def statements(count: int, seed: int = 7):
+    """EXEC de procedimientos que reciben 0 a 3 tablas conocidas como argumentos."""
+    rnd = random.Random(seed)
+    texts = []
+    for idx in range(count):
+        names = rnd.sample(TABLES, rnd.randint(0, 3))
+        args = ", ".join(f"@p{pos} = {name}" for pos, name in enumerate(names))
+        texts.append(f"exec sp_proceso_{idx % 97} {args} -- lote {idx}".lower())
+    return texts
+
+
+def loop_match(sql: str):
+    for table in TABLES:
+        if re.search(r'\b' + re.escape(table.lower()) + r'\b', sql):
+            return table
+    return None
+
+
+def index_match(sql: str):
+    tokens = QueryDomain.tokenize(sql)
+    return QueryDomain._match_known_table(filter(None, map(QueryDomain._name, tokens)))
+
+
+def timed(function, texts):
+    started = time.perf_counter()
+    results = [function(text) for text in texts]
+    return time.perf_counter() - started, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--statements", type=int, default=1000)
+    args = parser.parse_args()
+
+    texts = statements(args.statements)
+    loop_time, loop_results = timed(loop_match, texts)
+    index_time, index_results = timed(index_match, texts)
+    mismatches = sum(1 for old, new in zip(loop_results, index_results) if old != new)
+
+    print(f"{len(texts)} sentencias sin extractor, {len(TABLES)} entradas en TABLES")
+    print(f"{'caso':<8} {'total_s':>10} {'por_sentencia_us':>18}")
+    for name, seconds in (("loop", loop_time), ("index", index_time)):
+        print(f"{name:<8} {seconds:>10.3f} {seconds / len(texts) * 1e6:>18.1f}")
+    print(f"speedup {loop_time / index_time:.0f}x, resultados distintos: {mismatches}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
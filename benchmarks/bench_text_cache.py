@@ -0,0 +1,82 @@
+"""
+Benchmark del cache de texto de sentencias (StatementTextService).
+
+Recolección incremental sobre el plan cache sintético, ciclo a ciclo:
+- text:   QUERY_STATS_SQL con dm_exec_sql_text en cada fila (camino anterior)
+- cached: QUERY_COUNTERS_SQL + getStatementTexts solo para lo que falta en cache
+
+Por ciclo se informa el volumen aproximado que viaja desde SQL Server
+(texto de las cadenas + 8 bytes por valor no textual), cuántas sentencias
+se pidieron a dm_exec_sql_text y el tiempo de getCollectionBatch en Python.
+Sin Redis: solo el LRU local (el nivel Redis evita el primer ciclo frío tras
+un reinicio).
+
+    python -m benchmarks.bench_text_cache --statements 10000 --cycles 5
+"""
+import argparse
+import time
+
+from benchmarks.plan_cache_generator import FakeRepository, PlanCacheGenerator
+from src.Services.DatabaseService import DatabaseService
+from src.Services.PlanCacheService import PlanCacheService
+from src.Services.StatementTextService import StatementTextService
+
+
+def payload_bytes(rows) -> int:
+    total = 0
+    for row in rows:
+        for _, value in row.items():
+            total += len(value.encode("utf-8")) if isinstance(value, str) else 8
+    return total
+
+
+class MeteredRepository(FakeRepository):
+    """FakeRepository que suma el volumen de todo lo que "llega" de SQL Server."""
+
+    def __init__(self, generator: PlanCacheGenerator):
+        super().__init__(generator)
+        self.bytes = 0
+
+    def getCollectionBatch(self, db_name, incremental=False, since=None, with_text=True, live=True):
+        batch = super().getCollectionBatch(db_name, incremental, since, with_text, live)
+        self.bytes += payload_bytes(batch["plan_cache"])
+        return batch
+
+    def getStatementTexts(self, keys):
+        rows = super().getStatementTexts(keys)
+        # la consulta también envía las claves como parámetros
+        self.bytes += payload_bytes(rows) + sum(len(key[0]) + 16 for key in keys)
+        return rows
+
+
+def run(mode: str, statements: int, cycles: int):
+    repo = MeteredRepository(PlanCacheGenerator(statements=statements))
+    texts = StatementTextService(target="bench", max_items=statements * 2) if mode == "cached" else None
+    database = DatabaseService(repo=repo, texts=texts)
+    plan_cache = PlanCacheService(database=database)
+    watermark = None
+    for cycle in range(1, cycles + 1):
+        repo.bytes = 0
+        looked_up = repo.looked_up
+        since = plan_cache.resolve_since(watermark)
+        started = time.perf_counter()
+        batch = database.getCollectionBatch("Baseconta", incremental=True, since=since)
+        elapsed = time.perf_counter() - started
+        _, _, watermark = plan_cache.apply(batch["plan_cache"], since, "Baseconta")
+        yield cycle, len(batch["plan_cache"]), repo.bytes, repo.looked_up - looked_up, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--statements", type=int, default=10_000)
+    parser.add_argument("--cycles", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'mode':<7} {'cycle':>5} {'rows':>7} {'kb':>9} {'text_lookups':>13} {'batch_ms':>9}")
+    for mode in ("text", "cached"):
+        for cycle, rows, size, lookups, elapsed in run(mode, args.statements, args.cycles):
+            print(f"{mode:<7} {cycle:>5} {rows:>7} {size / 1024:>9.1f} {lookups:>13} {elapsed * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
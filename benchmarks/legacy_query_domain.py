@@ -0,0 +1,175 @@
+"""
+Copia congelada de la cascada de regex de QueryDomain anterior al lexer
+(tabla principal, tipo y tablas), sin instrumentación. Solo la usa
+bench_sql_lexer para comparar precisión y tiempo con QueryDomain.analyze.
+"""
+import re
+from typing import Dict, Optional
+
+from src.Const.tables import TABLES
+
+_TABLES_ORDER = {}
+for _idx, _name in enumerate(TABLES):
+    _TABLES_ORDER.setdefault(_name.lower(), (_idx, _name))
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+class LegacyQueryDomain:
+
+    @staticmethod
+    def analyze(text: str) -> Dict:
+        """Lo que hacía QueryAnalysisService._analyze_text: normalizar y correr las tres funciones."""
+        clean = " ".join(text.split()).lower()
+        return {
+            "main_table": LegacyQueryDomain.getMainTable(clean),
+            "query_type": LegacyQueryDomain.get_query_type(clean),
+            "tables": LegacyQueryDomain.extract_all_tables(clean),
+        }
+
+    @staticmethod
+    def getMainTable(sql: str) -> str:
+        if not sql or not sql.strip():
+            return "unknown"
+
+        sql = sql.lower()
+        clean_sql = LegacyQueryDomain._normalize_sql(sql)
+        table = (
+            LegacyQueryDomain._extract_from_update(clean_sql) or
+            LegacyQueryDomain._extract_from_delete(clean_sql) or
+            LegacyQueryDomain._extract_from_insert(clean_sql) or
+            LegacyQueryDomain._extract_from_select(clean_sql) or
+            LegacyQueryDomain._extract_from_join(clean_sql) or
+            None
+        )
+        if not table:
+            table = LegacyQueryDomain._match_known_table(clean_sql)
+        if not table:
+            table = "unknown"
+        return LegacyQueryDomain._clean_table_name(table)
+
+    @staticmethod
+    def _match_known_table(sql: str) -> Optional[str]:
+        """
+        Devuelve la tabla de TABLES que aparece en el SQL como palabra completa,
+        respetando el orden de TABLES (gana la primera de la lista).
+        Una sola pasada lineal sobre el texto.
+        """
+        best = None
+        for word in _WORD_PATTERN.findall(sql):
+            found = _TABLES_ORDER.get(word)
+            if found is not None and (best is None or found[0] < best[0]):
+                best = found
+                if best[0] == 0:
+                    break
+        return best[1] if best else None
+
+    @staticmethod
+    def _normalize_sql(sql: str) -> str:
+        """Normaliza el SQL para hacer el parsing más fácil"""
+        # Reemplazar múltiples espacios y newlines con un solo espacio
+        sql = re.sub(r'\s+', ' ', sql)
+        # Remover comentarios
+        sql = re.sub(r'--.*?$', '', sql, flags=re.MULTILINE)
+        sql = re.sub(r'/\*.*?\*/', '', sql, flags=re.DOTALL)
+        sql = sql.replace('[', '').replace(']', '').replace('dbo','').replace('.',' ')
+        return sql.strip()
+
+    @staticmethod
+    def _extract_from_select(sql: str) -> Optional[str]:
+        """Extrae tabla de consultas SELECT"""
+        # Patrón para SELECT ... FROM table
+        patterns = [
+            r'\bFROM\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?(?:\s+AS\s+\w+)?)(?:\s|$)',  # FROM table
+            r'\bJOIN\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)(?:\s|$)',  # JOIN table
+        ]
+
+        for pattern in patterns:
+            match = re.search(pattern, sql, re.IGNORECASE)
+            if match:
+                return match.group(1)
+        return None
+
+    @staticmethod
+    def _extract_from_update(sql: str) -> Optional[str]:
+        """Extrae tabla de consultas UPDATE"""
+        match = re.search(r'\bUPDATE\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)', sql, re.IGNORECASE)
+        return match.group(1) if match else None
+
+    @staticmethod
+    def _extract_from_delete(sql: str) -> Optional[str]:
+        """Extrae tabla de consultas DELETE"""
+        match = re.search(r'\bDELETE\s+(?:\w+\s+)?FROM\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)', sql, re.IGNORECASE)
+        return match.group(1) if match else None
+
+    @staticmethod
+    def _extract_from_insert(sql: str) -> Optional[str]:
+        """Extrae tabla de consultas INSERT"""
+        match = re.search(r'\bINSERT\s+(?:\w+\s+)?INTO\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)', sql, re.IGNORECASE)
+        return match.group(1) if match else None
+
+    @staticmethod
+    def _extract_from_join(sql: str) -> Optional[str]:
+        """Extrae la primera tabla en JOINs complejos"""
+        # Buscar el primer FROM que no sea subquery
+        from_match = re.search(r'\bFROM\s+([a-zA-Z0-9_#@]+)', sql, re.IGNORECASE)
+        return from_match.group(1) if from_match else None
+
+    @staticmethod
+    def _clean_table_name(table_name: str) -> str:
+        """Limpia el nombre de tabla removiendo alias y espacios"""
+        if table_name == "unknown":
+            return table_name
+
+        # Remover alias (AS alias)
+        table_name = re.sub(r'\s+AS\s+\w+$', '', table_name, flags=re.IGNORECASE)
+        # Remover espacios extras
+        table_name = table_name.strip()
+        # Remover comillas si existen
+        table_name = re.sub(r'^\[|\]$|^"|"$|^`|`$', '', table_name)
+
+        return table_name.lower() if table_name else "unknown"
+
+    @staticmethod
+    def get_query_type(sql: str) -> str:
+        """Determina el tipo de consulta"""
+        clean_sql = LegacyQueryDomain._normalize_sql(sql)
+
+        if re.search(r'^\s*SELECT', clean_sql, re.IGNORECASE):
+            return "SELECT"
+        elif re.search(r'^\s*UPDATE', clean_sql, re.IGNORECASE):
+            return "UPDATE"
+        elif re.search(r'^\s*INSERT', clean_sql, re.IGNORECASE):
+            return "INSERT"
+        elif re.search(r'^\s*DELETE', clean_sql, re.IGNORECASE):
+            return "DELETE"
+        elif re.search(r'^\s*CREATE', clean_sql, re.IGNORECASE):
+            return "DDL"
+        elif re.search(r'^\s*ALTER', clean_sql, re.IGNORECASE):
+            return "DDL"
+        elif re.search(r'^\s*DROP', clean_sql, re.IGNORECASE):
+            return "DDL"
+        else:
+            return "UNKNOWN"
+
+    @staticmethod
+    def extract_all_tables(sql: str) -> list:
+        """Extrae todas las tablas mencionadas en la consulta"""
+        clean_sql = LegacyQueryDomain._normalize_sql(sql)
+        tables = set()
+
+        # Patrones para encontrar tablas
+        patterns = [
+            r'\bFROM\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)',
+            r'\bJOIN\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)',
+            r'\bUPDATE\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)',
+            r'\bINSERT\s+(?:\w+\s+)?INTO\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)',
+        ]
+
+        for pattern in patterns:
+            matches = re.findall(pattern, clean_sql, re.IGNORECASE)
+            for match in matches:
+                clean_table = LegacyQueryDomain._clean_table_name(match)
+                if clean_table and clean_table != "unknown":
+                    tables.add(clean_table)
+
+        return sorted(list(tables))
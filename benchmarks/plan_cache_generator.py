@@ -0,0 +1,290 @@
+"""
+Generador de un plan cache sintético con la forma de QUERY_STATS_SQL
+(sys.dm_exec_query_stats + dm_exec_sql_text) y un repositorio en memoria
+que lo sirve con la misma interfaz que BdRepository/DatabaseService.
+
+Las sentencias mezclan SELECT/UPDATE/INSERT/DELETE/EXEC con comentarios,
+corchetes, esquemas, alias, JOINs y parámetros; las tablas salen de TABLES
+con una distribución sesgada (pocas tablas concentran la mayoría, como en
+producción). Los contadores crecen ciclo a ciclo para que haya deltas.
+
+    from benchmarks.plan_cache_generator import PlanCacheGenerator, FakeRepository
+    repo = FakeRepository(PlanCacheGenerator(statements=10_000))
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from src.Const.tables import TABLES
+from src.Utils.CompactRow import CompactRow
+
+# Columnas de QUERY_STATS_SQL (mismo orden y tipos que devuelve el driver)
+COLUMNS = [
+    ("execution_count", int), ("cpu_time_total", int), ("cpu_time_avg", int),
+    ("duration_total", int), ("duration_avg", int), ("logical_reads_total", int),
+    ("logical_reads_avg", int), ("logical_writes_total", int), ("logical_writes_avg", int),
+    ("physical_reads_total", int), ("physical_reads_avg", int), ("plan_reuse_count", int),
+    ("creation_time", datetime), ("last_execution_time", datetime), ("last_completion_time", datetime),
+    ("query_hash", str), ("sql_handle", str), ("plan_handle", str), ("statement_start_offset", int),
+    ("statement_end_offset", int), ("database_name", str), ("is_internal", int),
+    ("query_text", str),
+]
+RANK_COLUMNS = [("is_frequent_candidate", int), ("heavy_rank", int), ("frequent_rank", int)]
+# Columnas de dm_exec_sql_text (QUERY_COUNTERS_SQL las omite)
+TEXT_COLUMNS = ("database_name", "is_internal", "query_text")
+COUNTER_COLUMNS = [column for column in COLUMNS if column[0] not in TEXT_COLUMNS]
+TEXT_LOOKUP_COLUMNS = [("sql_handle", str), ("statement_start_offset", int), ("statement_end_offset", int)] + [
+    column for column in COLUMNS if column[0] in TEXT_COLUMNS
+]
+
+
+def description(columns) -> List[tuple]:
+    return [(name, type_code, None, None, None, None, True) for name, type_code in columns]
+
+
+# ------------------- Texto SQL -------------------
+def pick_table(rng: random.Random) -> str:
+    # Pareto: unas pocas tablas reciben la mayoría de las sentencias
+    index = int(rng.paretovariate(1.2)) - 1
+    if index >= len(TABLES) or rng.random() < 0.3:
+        index = rng.randrange(len(TABLES))
+    return TABLES[index]
+
+
+def qualified(rng: random.Random, table: str) -> str:
+    style = rng.random()
+    if style < 0.3:
+        return f"[dbo].[{table}]"
+    if style < 0.5:
+        return f"dbo.{table}"
+    if style < 0.6:
+        return f"[{table}]"
+    if style < 0.65:
+        return table.upper()
+    return table
+
+
+def comment(rng: random.Random) -> str:
+    if rng.random() < 0.15:
+        return f"/* {rng.choice(['reporte', 'job nocturno', 'api v2', 'ORM'])} */ "
+    if rng.random() < 0.1:
+        return f"-- {rng.choice(['consulta generada', 'ticket 1234', 'no tocar'])}\n"
+    return ""
+
+
+def random_statement(rng: random.Random) -> str:
+    table = pick_table(rng)
+    target = qualified(rng, table)
+    kind = rng.random()
+
+    if kind < 0.55:
+        columns = ", ".join(f"t.col_{rng.randrange(40)}" for _ in range(rng.randrange(1, 8)))
+        sql = f"SELECT {'TOP 100 ' if rng.random() < 0.2 else ''}{columns}\nFROM {target} AS t"
+        for j in range(rng.randrange(0, 4)):
+            sql += f"\n  {rng.choice(['INNER', 'LEFT', 'LEFT OUTER'])} JOIN {qualified(rng, pick_table(rng))} j{j} ON j{j}.id = t.id_{j}"
+        if rng.random() < 0.8:
+            sql += f"\nWHERE t.estado = @P{rng.randrange(5)} AND t.fecha >= @P{rng.randrange(5, 9)}"
+        if rng.random() < 0.1:
+            sql += f"\n  AND t.id IN (SELECT s.id FROM {qualified(rng, pick_table(rng))} s WHERE s.activo = 1)"
+        if rng.random() < 0.3:
+            sql += "\nORDER BY t.fecha DESC"
+    elif kind < 0.7:
+        sql = f"UPDATE {target}\n   SET col_{rng.randrange(40)} = @P0, fecha_mod = GETDATE()\n WHERE id = @P1"
+    elif kind < 0.85:
+        columns = ", ".join(f"col_{c}" for c in range(rng.randrange(2, 12)))
+        sql = f"INSERT INTO {target} ({columns})\nVALUES ({', '.join('@P' + str(c) for c in range(columns.count(',') + 1))})"
+    elif kind < 0.93:
+        sql = f"DELETE FROM {target} WHERE id = @P0"
+    else:
+        sql = f"EXEC sp_{table}_{rng.choice(['guardar', 'consultar', 'recalcular'])} @P0, @P1"
+
+    return comment(rng) + sql
+
+
+# ------------------- Plan cache -------------------
+class PlanCacheGenerator:
+    """
+    Un conjunto fijo de sentencias cuyos contadores acumulados crecen en cada
+    ciclo. En cada ciclo solo una fracción (`active`) se ejecuta, como en un
+    servidor real: es lo que lee la recolección incremental.
+    """
+
+    def __init__(
+        self,
+        statements: int = 1_000,
+        seed: int = 1,
+        databases=("Baseconta", "Nomina", "master"),
+        active: float = 0.3,
+        start: datetime = datetime(2024, 1, 1),
+    ):
+        rng = random.Random(seed)
+        self.seed = seed
+        self.active = active
+        self.start = start
+        self.cycle = 0
+        self.statements = []
+        for i in range(statements):
+            text = random_statement(rng)
+            database = databases[0] if rng.random() < 0.7 else rng.choice(databases)
+            self.statements.append({
+                "index": i,
+                "text": text,
+                "database_name": database,
+                "is_internal": int("dm_exec" in text or database == "master" and rng.random() < 0.5),
+                "query_hash": f"0x{rng.getrandbits(64):016X}",
+                "sql_handle": f"0x{rng.getrandbits(160):040X}",
+                "plan_handle": f"0x{rng.getrandbits(176):044X}",
+                "offset": rng.randrange(0, 4000, 2),
+                # costo por ejecución y ejecuciones por ciclo
+                "cpu": rng.lognormvariate(7, 2),
+                "reads": rng.lognormvariate(4, 2),
+                "rate": max(1, int(rng.paretovariate(0.8))),
+                "executions": rng.randrange(1, 10_000),
+                "last_cycle": 0,
+            })
+        self._build = CompactRow.builder(description(COLUMNS))
+        self._build_ranked = CompactRow.builder(description(COLUMNS + RANK_COLUMNS))
+        self._build_counters = CompactRow.builder(description(COUNTER_COLUMNS))
+        self._build_text = CompactRow.builder(description(TEXT_LOOKUP_COLUMNS))
+        self._by_text_key = {
+            (st["sql_handle"], st["offset"], st["offset"] + 2 * len(st["text"])): st for st in self.statements
+        }
+
+    def advance(self):
+        """Un ciclo más: cada sentencia activa suma sus ejecuciones (determinista por semilla)."""
+        self.cycle += 1
+        rng = random.Random(self.seed * 1_000_003 + self.cycle)
+        for st in self.statements:
+            if rng.random() < self.active:
+                st["executions"] += st["rate"]
+                st["last_cycle"] = self.cycle
+
+    def now(self) -> datetime:
+        return self.start + timedelta(minutes=self.cycle)
+
+    def _values(self, st: Dict) -> list:
+        executions = st["executions"]
+        cpu = int(st["cpu"] * executions)
+        duration = int(cpu * 1.3)
+        reads = int(st["reads"] * executions)
+        writes = reads // 50
+        physical = reads // 200
+        started = self.start + timedelta(minutes=st["last_cycle"], seconds=st["index"] % 60)
+        return [
+            executions, cpu, cpu // executions, duration, duration // executions,
+            reads, reads // executions, writes, writes // executions, physical, physical // executions,
+            1 + st["index"] % 3,
+            self.start - timedelta(hours=1), started,
+            # LAST_COMPLETION_TIME: inicio + last_elapsed_time, en milisegundos
+            started + timedelta(milliseconds=duration // executions // 1000),
+            st["query_hash"], st["sql_handle"], st["plan_handle"],
+            st["offset"], st["offset"] + 2 * len(st["text"]),
+            st["database_name"], st["is_internal"], st["text"],
+        ]
+
+    def rows(self, since: Optional[datetime] = None, with_text: bool = True) -> List[CompactRow]:
+        """
+        Filas de QUERY_STATS_SQL (con since: solo last_completion_time >= since).
+        Con with_text=False, las de QUERY_COUNTERS_SQL (sin las columnas de texto).
+        """
+        result = []
+        for st in self.statements:
+            values = self._values(st)
+            if since is None or values[14] >= since:
+                result.append(self._build(values) if with_text else self._build_counters(values[:20]))
+        return result
+
+    def texts(self, keys) -> List[CompactRow]:
+        """Resultado de STATEMENT_TEXT_SQL para las claves (sql_handle, start, end) conocidas."""
+        result = []
+        for key in keys:
+            st = self._by_text_key.get(tuple(key))
+            if st:
+                result.append(self._build_text(list(key) + [st["database_name"], st["is_internal"], st["text"]]))
+        return result
+
+    def top_rows(self, db_name, top: int = 50) -> List[CompactRow]:
+        """
+        Resultado de PLAN_CACHE_TOP_SQL: TOP heavy + TOP frequent de cada base
+        (db_name: una o varias) con sus rankings.
+        """
+        db_names = {db_name} if isinstance(db_name, str) else set(db_name)
+        rows = [self._values(st) for st in self.statements]
+        rows.sort(key=lambda v: v[1], reverse=True)
+        # ROW_NUMBER() OVER (PARTITION BY is_frequent_candidate, database_name)
+        ranks: Dict[tuple, int] = {}
+        ranked = []
+        for heavy_rank, values in enumerate(rows, start=1):
+            candidate = int(values[20] in db_names and values[21] == 0)
+            partition = (candidate, values[20])
+            rank = ranks[partition] = ranks.get(partition, 0) + 1
+            if heavy_rank <= top or (candidate and rank <= top):
+                ranked.append(self._build_ranked(values + [candidate, heavy_rank, rank]))
+        return ranked
+
+    def current_queries(self) -> List[Dict]:
+        return [{"queries_processing_now": 5 + self.cycle % 17}]
+
+    def current_users(self) -> List[Dict]:
+        rng = random.Random(self.seed + self.cycle)
+        return [
+            {
+                "host_name": f"APP-{i:02d}",
+                "client_net_address": f"10.0.0.{i}",
+                "program_name": rng.choice([".Net SqlClient Data Provider", "Microsoft JDBC Driver", "SSMS"]),
+                "requests_running_now": rng.randrange(0, 5),
+            }
+            for i in range(20)
+        ]
+
+    def memory(self) -> List[Dict]:
+        return [{
+            "sqlserver_memory_used_mb": 8192 + self.cycle,
+            "vas_reserved_mb": 16384,
+            "vas_committed_mb": 9000,
+            "locked_pages_mb": 0,
+        }]
+
+
+class FakeRepository:
+    """
+    Sustituto en memoria de BdRepository/DatabaseService para MetricsService:
+    cada getCollectionBatch devuelve un ciclo nuevo del generador.
+    """
+
+    def __init__(self, generator: PlanCacheGenerator):
+        self.generator = generator
+        # llamadas a getStatementTexts y sentencias pedidas (para medir el cache de texto)
+        self.lookups = 0
+        self.looked_up = 0
+
+    def getCollectionBatch(
+        self, db_name, incremental: bool = False, since=None, with_text: bool = True, live: bool = True
+    ) -> dict:
+        self.generator.advance()
+        g = self.generator
+        result = {"queries": [], "users": [], "memory": []}
+        if live:
+            result = {"queries": g.current_queries(), "users": g.current_users(), "memory": g.memory()}
+        if incremental:
+            result["plan_cache"] = g.rows(since, with_text)
+        else:
+            ranked = g.top_rows(db_name)
+            result["heavy"] = [r for r in ranked if r["heavy_rank"] <= 50]
+            result["frequent"] = [r for r in ranked if r["is_frequent_candidate"] == 1 and r["frequent_rank"] <= 50]
+        return result
+
+    def getQueryStatsSince(self, since=None, with_text: bool = True):
+        return self.generator.rows(since, with_text)
+
+    def getStatementTexts(self, keys) -> List[CompactRow]:
+        self.lookups += 1
+        self.looked_up += len(keys)
+        return self.generator.texts(keys)
+
+    def runCollector(self, name: str, query: str, timeout=None) -> list:
+        g = self.generator
+        return {"current_queries": g.current_queries, "current_users": g.current_users, "memory": g.memory}[name]()
+
+    def getPoolStats(self) -> dict:
+        return {"size": 1, "idle": 1, "in_use": 0, "checkouts": self.generator.cycle, "timeouts": 0}
@@ -0,0 +1,453 @@
+"""
+Stand-in de Redis en memoria para los benchmarks (protocolo RESP2 sobre TCP).
+
+Implementa solo los comandos que usa el exporter: strings, hashes, listas,
+sorted sets, MULTI/EXEC y los scripts Lua del repo (ejecutados como funciones
+Python equivalentes, registradas por su SHA1). Un solo hilo con asyncio:
+cada comando es atómico, igual que en Redis.
+
+    python -m benchmarks.redis_standin --port 6390
+"""
+import argparse
+import asyncio
+import fnmatch
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class RespError(Exception):
+    pass
+
+
+class Status(str):
+    """Respuesta simple (+OK)."""
+
+
+QUEUED = Status("QUEUED")
+OK = Status("OK")
+
+
+class Store:
+    def __init__(self):
+        self.data: Dict[bytes, object] = {}
+        self.expires: Dict[bytes, float] = {}
+        self.scripts: Dict[str, Callable] = {}
+        self.known_scripts: Dict[bytes, Callable] = {}
+
+    # ------------------- claves -------------------
+    def _alive(self, key: bytes) -> bool:
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def get(self, key: bytes, kind: type, create: bool = False):
+        if not self._alive(key):
+            if not create:
+                return None
+            self.data[key] = kind()
+        value = self.data[key]
+        if not isinstance(value, kind):
+            raise RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def register_script(self, source: str, func: Callable):
+        self.known_scripts[source.encode("utf-8")] = func
+
+    # ------------------- despacho -------------------
+    def execute(self, args: List[bytes]):
+        name = args[0].decode().upper()
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            raise RespError(f"ERR unknown command '{name}'")
+        return handler(*args[1:])
+
+    # strings
+    def cmd_ping(self, *args):
+        return args[0] if args else Status("PONG")
+
+    def cmd_client(self, *args):
+        return OK
+
+    def cmd_select(self, db):
+        return OK
+
+    def cmd_get(self, key):
+        return self.get(key, bytes)
+
+    def cmd_set(self, key, value, *options):
+        options = [o.upper() for o in options]
+        if b"NX" in options and self._alive(key):
+            return None
+        if b"XX" in options and not self._alive(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        for flag, scale in ((b"EX", 1), (b"PX", 0.001)):
+            if flag in options:
+                ttl = float(options[options.index(flag) + 1]) * scale
+                self.expires[key] = time.monotonic() + ttl
+        return OK
+
+    def cmd_setex(self, key, ttl, value):
+        return self.cmd_set(key, value, b"EX", ttl)
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) if self._alive(key) and isinstance(self.data[key], bytes) else None for key in keys]
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, b"1")
+
+    def cmd_incrby(self, key, amount):
+        value = int(self.get(key, bytes) or b"0") + int(amount)
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self.data[key]
+                self.expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._alive(key))
+
+    def cmd_expire(self, key, ttl):
+        return self.cmd_pexpire(key, str(int(ttl) * 1000).encode())
+
+    def cmd_pexpire(self, key, ttl):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + int(ttl) / 1000
+        return 1
+
+    def cmd_pttl(self, key):
+        if not self._alive(key):
+            return -2
+        deadline = self.expires.get(key)
+        return -1 if deadline is None else int((deadline - time.monotonic()) * 1000)
+
+    def cmd_keys(self, pattern):
+        pattern = pattern.decode()
+        return [key for key in list(self.data) if self._alive(key) and fnmatch.fnmatchcase(key.decode(), pattern)]
+
+    def cmd_type(self, key):
+        if not self._alive(key):
+            return Status("none")
+        kinds = {bytes: "string", dict: "hash", list: "list", ZSet: "zset"}
+        return Status(kinds[type(self.data[key])])
+
+    # hashes
+    def cmd_hset(self, key, *pairs):
+        hash_ = self.get(key, dict, create=True)
+        added = 0
+        for field, value in zip(pairs[0::2], pairs[1::2]):
+            added += field not in hash_
+            hash_[field] = value
+        return added
+
+    def cmd_hget(self, key, field):
+        return (self.get(key, dict) or {}).get(field)
+
+    def cmd_hgetall(self, key):
+        return [item for pair in (self.get(key, dict) or {}).items() for item in pair]
+
+    # listas
+    def cmd_rpush(self, key, *values):
+        items = self.get(key, list, create=True)
+        items.extend(values)
+        return len(items)
+
+    def cmd_lrange(self, key, start, stop):
+        return _slice(self.get(key, list) or [], start, stop)
+
+    def cmd_ltrim(self, key, start, stop):
+        items = self.get(key, list)
+        if items is not None:
+            items[:] = self.cmd_lrange(key, start, stop)
+        return OK
+
+    # sorted sets
+    def cmd_zadd(self, key, *pairs):
+        zset = self.get(key, ZSet, create=True)
+        return sum(zset.add(member, float(score)) for score, member in zip(pairs[0::2], pairs[1::2]))
+
+    def cmd_zcard(self, key):
+        return len(self.get(key, ZSet) or ())
+
+    def cmd_zrange(self, key, start, stop, *options):
+        zset = self.get(key, ZSet) or ZSet()
+        return ZSet.reply(_slice(zset.items(), start, stop), options)
+
+    def cmd_zrangebyscore(self, key, low, high, *options):
+        zset = self.get(key, ZSet) or ZSet()
+        items = zset.by_score(low, high)
+        upper = [o.upper() for o in options]
+        if b"LIMIT" in upper:
+            i = upper.index(b"LIMIT")
+            offset, count = int(options[i + 1]), int(options[i + 2])
+            items = items[offset:] if count < 0 else items[offset:offset + count]
+        return ZSet.reply(items, options)
+
+    def cmd_zremrangebyscore(self, key, low, high):
+        zset = self.get(key, ZSet)
+        return zset.remove([m for m, _ in zset.by_score(low, high)]) if zset else 0
+
+    def cmd_zremrangebyrank(self, key, start, stop):
+        zset = self.get(key, ZSet)
+        return zset.remove([m for m, _ in _slice(zset.items(), start, stop)]) if zset else 0
+
+    # scripts
+    def cmd_script(self, sub, *args):
+        if sub.upper() == b"LOAD":
+            func = self.known_scripts.get(args[0])
+            if func is None:
+                raise RespError("ERR script no soportado por el stand-in")
+            sha = hashlib.sha1(args[0]).hexdigest()
+            self.scripts[sha] = func
+            return sha.encode()
+        if sub.upper() == b"EXISTS":
+            return [int(arg.decode() in self.scripts) for arg in args]
+        return OK
+
+    def cmd_evalsha(self, sha, numkeys, *rest):
+        func = self.scripts.get(sha.decode())
+        if func is None:
+            raise RespError("NOSCRIPT No matching script. Please use EVAL.")
+        count = int(numkeys)
+        return func(self, list(rest[:count]), list(rest[count:]))
+
+    def cmd_eval(self, source, numkeys, *rest):
+        sha = self.cmd_script(b"LOAD", source)
+        return self.cmd_evalsha(sha, numkeys, *rest)
+
+
+def _slice(items: list, start: bytes, stop: bytes) -> list:
+    """Rango con índices inclusivos y negativos, como LRANGE/ZRANGE."""
+    start, stop = int(start), int(stop)
+    size = len(items)
+    start = max(0, size + start) if start < 0 else start
+    stop = size + stop if stop < 0 else stop
+    if stop < 0:
+        return []
+    return items[start:stop + 1]
+
+
+class ZSet:
+    def __init__(self):
+        self.scores: Dict[bytes, float] = {}
+
+    def __len__(self):
+        return len(self.scores)
+
+    def add(self, member: bytes, score: float) -> int:
+        added = member not in self.scores
+        self.scores[member] = score
+        return int(added)
+
+    def remove(self, members) -> int:
+        for member in members:
+            self.scores.pop(member, None)
+        return len(members)
+
+    def items(self):
+        return sorted(self.scores.items(), key=lambda item: (item[1], item[0]))
+
+    def by_score(self, low: bytes, high: bytes):
+        low_ok = ZSet._bound(low, lower=True)
+        high_ok = ZSet._bound(high, lower=False)
+        return [(m, s) for m, s in self.items() if low_ok(s) and high_ok(s)]
+
+    @staticmethod
+    def _bound(raw: bytes, lower: bool):
+        text = raw.decode()
+        exclusive = text.startswith("(")
+        value = float(text.lstrip("("))
+        if lower:
+            return (lambda s: s > value) if exclusive else (lambda s: s >= value)
+        return (lambda s: s < value) if exclusive else (lambda s: s <= value)
+
+    @staticmethod
+    def reply(items, options):
+        if any(o.upper() == b"WITHSCORES" for o in options):
+            return [x for m, s in items for x in (m, repr(s).encode())]
+        return [m for m, _ in items]
+
+
+# ------------------- Scripts del repo -------------------
+def _publish_generation(store: Store, keys: List[bytes], args: List[bytes]):
+    generation_key, live_key, current_key, lease_key, *extra_keys = keys
+    if lease_key and store.cmd_get(lease_key) != args[3]:
+        return 0
+    i = 6
+    for key, ttl, count in ((generation_key, args[1], int(args[4])), (live_key, args[2], int(args[5]))):
+        if count:
+            store.cmd_hset(key, *args[i:i + count * 2])
+            store.cmd_expire(key, ttl)
+        i += count * 2
+    for key, value in zip(extra_keys, args[i:]):
+        store.cmd_set(key, value)
+    store.cmd_set(current_key, args[0])
+    return 1
+
+
+def _read_generation(store: Store, keys: List[bytes], args: List[bytes]):
+    generation = store.cmd_get(keys[0])
+    if generation is None:
+        return []
+    key = args[0] + generation
+    return [generation, store.cmd_hgetall(key), store.cmd_hgetall(key + b":live")]
+
+
+def _renew_lease(store: Store, keys: List[bytes], args: List[bytes]):
+    if store.cmd_get(keys[0]) == args[0]:
+        return store.cmd_pexpire(keys[0], args[1])
+    return 0
+
+
+def _release_lease(store: Store, keys: List[bytes], args: List[bytes]):
+    if store.cmd_get(keys[0]) == args[0]:
+        return store.cmd_del(keys[0])
+    return 0
+
+
+def _set_fenced(store: Store, keys: List[bytes], args: List[bytes]):
+    if store.cmd_get(keys[1]) != args[1]:
+        return 0
+    store.cmd_set(keys[0], args[0])
+    return 1
+
+
+def _zset_put_fenced(store: Store, keys: List[bytes], args: List[bytes]):
+    if store.cmd_get(keys[1]) != args[3]:
+        return 0
+    member, score, max_items = args[0], args[1], int(args[2])
+    store.cmd_zremrangebyscore(keys[0], score, score)
+    store.cmd_zadd(keys[0], score, member)
+    if max_items:
+        store.cmd_zremrangebyrank(keys[0], b"0", str(-max_items - 1).encode())
+    return 1
+
+
+def default_store() -> Store:
+    from src.Services.RedisService import (
+        PUBLISH_GENERATION_LUA,
+        READ_GENERATION_LUA,
+        RELEASE_LEASE_LUA,
+        RENEW_LEASE_LUA,
+        SET_FENCED_LUA,
+        ZSET_PUT_FENCED_LUA,
+    )
+
+    store = Store()
+    store.register_script(PUBLISH_GENERATION_LUA, _publish_generation)
+    store.register_script(READ_GENERATION_LUA, _read_generation)
+    store.register_script(RENEW_LEASE_LUA, _renew_lease)
+    store.register_script(RELEASE_LEASE_LUA, _release_lease)
+    store.register_script(SET_FENCED_LUA, _set_fenced)
+    store.register_script(ZSET_PUT_FENCED_LUA, _zset_put_fenced)
+    return store
+
+
+# ------------------- Protocolo -------------------
+def encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, Status):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, RespError):
+        return b"-" + str(value).encode() + b"\r\n"
+    if isinstance(value, bool):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(encode(item) for item in value)
+    raise TypeError(f"no se puede codificar {type(value)}")
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()
+    args = []
+    for _ in range(int(line[1:])):
+        size = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(size + 2))[:-2])
+    return args
+
+
+async def handle(store: Store, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    queued: Optional[List[List[bytes]]] = None
+    try:
+        while True:
+            args = await read_command(reader)
+            if args is None:
+                break
+            name = args[0].upper()
+            try:
+                if name == b"MULTI":
+                    queued, reply = [], OK
+                elif name == b"EXEC":
+                    reply = []
+                    for command in queued or []:
+                        try:
+                            reply.append(store.execute(command))
+                        except RespError as e:
+                            reply.append(e)
+                    queued = None
+                elif name == b"DISCARD":
+                    queued, reply = None, OK
+                elif queued is not None:
+                    queued.append(args)
+                    reply = QUEUED
+                else:
+                    reply = store.execute(args)
+            except RespError as e:
+                reply = e
+            except (ValueError, IndexError, TypeError) as e:
+                reply = RespError(f"ERR {e}")
+            writer.write(encode(reply))
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(port: int, host: str = "127.0.0.1", store: Optional[Store] = None):
+    store = store or default_store()
+    server = await asyncio.start_server(lambda r, w: handle(store, r, w), host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def start_in_thread(port: int, host: str = "127.0.0.1", store: Optional[Store] = None) -> threading.Thread:
+    """Levanta el stand-in en un hilo propio (para benchmarks en un solo proceso)."""
+    thread = threading.Thread(target=lambda: asyncio.run(serve(port, host, store)), daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.host))
+
+
+if __name__ == "__main__":
+    main()
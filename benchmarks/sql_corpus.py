@@ -0,0 +1,208 @@
+"""
+Corpus de sentencias T-SQL con el resultado esperado del análisis (tabla
+principal, tipo y todas las tablas), para medir la precisión de
+QueryDomain.analyze contra la cascada de regex anterior (bench_sql_lexer).
+
+Cubre lo que aparece en el plan cache: sentencias parametrizadas con la
+declaración "(@P0 ...)" delante, nombres de varias partes y entre corchetes,
+comentarios de línea y de bloque (también anidados), literales que contienen
+palabras clave, CTE, subconsultas, alias en UPDATE/DELETE, hints y DDL.
+"""
+
+CORPUS = [
+    # ------------------- SELECT -------------------
+    {
+        "sql": "SELECT t.col_1, t.col_2 FROM clientes AS t WHERE t.estado = @P0",
+        "main_table": "clientes", "query_type": "SELECT", "tables": ["clientes"],
+    },
+    {
+        "sql": "SELECT TOP 100 t.col_3\nFROM [dbo].[facturas] AS t\n  INNER JOIN dbo.clientes j0 ON j0.id = t.id_0\nORDER BY t.fecha DESC",
+        "main_table": "facturas", "query_type": "SELECT", "tables": ["clientes", "facturas"],
+    },
+    {
+        "sql": "(@P0 int,@P1 nvarchar(20))SELECT a.id FROM dbo.pedidos a LEFT OUTER JOIN dbo.items i ON i.pedido = a.id WHERE a.id = @P0",
+        "main_table": "pedidos", "query_type": "SELECT", "tables": ["items", "pedidos"],
+    },
+    {
+        "sql": "SELECT * FROM ventas.facturas f WHERE f.total > 0",
+        "main_table": "facturas", "query_type": "SELECT", "tables": ["facturas"],
+    },
+    {
+        "sql": "SELECT * FROM erp.dbo.movimientos m JOIN erp..cuentas c ON c.id = m.cuenta",
+        "main_table": "movimientos", "query_type": "SELECT", "tables": ["cuentas", "movimientos"],
+    },
+    {
+        "sql": "SELECT * FROM [Order Details] od JOIN [dbo].[Orders] o ON o.OrderID = od.OrderID",
+        "main_table": "order details", "query_type": "SELECT", "tables": ["order details", "orders"],
+    },
+    {
+        "sql": "SELECT c.nombre FROM dbo_config c WHERE c.clave = 'dbo'",
+        "main_table": "dbo_config", "query_type": "SELECT", "tables": ["dbo_config"],
+    },
+    {
+        "sql": "SELECT id FROM mailbox WHERE owner = @P0",
+        "main_table": "mailbox", "query_type": "SELECT", "tables": ["mailbox"],
+    },
+    {
+        "sql": "SELECT * FROM clientes c WITH (NOLOCK) WHERE c.id = 1",
+        "main_table": "clientes", "query_type": "SELECT", "tables": ["clientes"],
+    },
+    {
+        "sql": "SELECT * FROM clientes (NOLOCK) WHERE id = 1",
+        "main_table": "clientes", "query_type": "SELECT", "tables": ["clientes"],
+    },
+    {
+        "sql": "SELECT a.x, b.y FROM alfa a, beta b WHERE a.id = b.id",
+        "main_table": "alfa", "query_type": "SELECT", "tables": ["alfa", "beta"],
+    },
+    {
+        "sql": "SELECT (SELECT MAX(fecha) FROM auditoria) AS ultima, u.nombre FROM usuarios u",
+        "main_table": "usuarios", "query_type": "SELECT", "tables": ["auditoria", "usuarios"],
+    },
+    {
+        "sql": "SELECT x.total FROM (SELECT SUM(valor) AS total FROM pagos GROUP BY cliente) x",
+        "main_table": "pagos", "query_type": "SELECT", "tables": ["pagos"],
+    },
+    {
+        "sql": "SELECT t.id FROM tareas t WHERE t.id IN (SELECT s.id FROM [dbo].[subtareas] s WHERE s.activo = 1)",
+        "main_table": "tareas", "query_type": "SELECT", "tables": ["subtareas", "tareas"],
+    },
+    {
+        "sql": "SELECT * FROM OPENJSON(@json) j JOIN productos p ON p.id = j.value",
+        "main_table": "productos", "query_type": "SELECT", "tables": ["productos"],
+    },
+    {
+        "sql": "SELECT s.name FROM sys.objects s WHERE s.type = 'U'",
+        "main_table": "objects", "query_type": "SELECT", "tables": ["objects"],
+    },
+    {
+        "sql": "SELECT COUNT(*) AS queries_processing_now FROM sys.dm_exec_requests WHERE status = 'running'",
+        "main_table": "dm_exec_requests", "query_type": "SELECT", "tables": ["dm_exec_requests"],
+    },
+    {
+        "sql": "SELECT nota FROM comentarios WHERE texto = 'update stock set x = 1 from bodega'",
+        "main_table": "comentarios", "query_type": "SELECT", "tables": ["comentarios"],
+    },
+    {
+        "sql": "SELECT id FROM logs WHERE msg LIKE N'%from inventario%' AND nivel = 'it''s'",
+        "main_table": "logs", "query_type": "SELECT", "tables": ["logs"],
+    },
+    {
+        "sql": "SELECT a.id INTO #tmp FROM afiliados a WHERE a.estado = 1",
+        "main_table": "afiliados", "query_type": "SELECT", "tables": ["#tmp", "afiliados"],
+    },
+    {
+        "sql": "SELECT 1",
+        "main_table": "unknown", "query_type": "SELECT", "tables": [],
+    },
+    # ------------------- Comentarios -------------------
+    {
+        "sql": "-- consulta generada\nSELECT t.col_1 FROM empleados AS t WHERE t.estado = @P0",
+        "main_table": "empleados", "query_type": "SELECT", "tables": ["empleados"],
+    },
+    {
+        "sql": "/* reporte */ SELECT t.col_1 FROM nomina AS t",
+        "main_table": "nomina", "query_type": "SELECT", "tables": ["nomina"],
+    },
+    {
+        "sql": "/* job /* anidado: FROM falsa */ nocturno */ SELECT * FROM cierres",
+        "main_table": "cierres", "query_type": "SELECT", "tables": ["cierres"],
+    },
+    {
+        "sql": "SELECT * -- FROM comentada\nFROM reales r",
+        "main_table": "reales", "query_type": "SELECT", "tables": ["reales"],
+    },
+    {
+        "sql": "-- ticket 1234\nUPDATE dbo.saldos SET valor = @P0 WHERE id = @P1",
+        "main_table": "saldos", "query_type": "UPDATE", "tables": ["saldos"],
+    },
+    # ------------------- CTE -------------------
+    {
+        "sql": "WITH ultimos AS (SELECT id FROM movimientos WHERE fecha > @P0) SELECT * FROM ultimos",
+        "main_table": "movimientos", "query_type": "SELECT", "tables": ["movimientos"],
+    },
+    {
+        "sql": ";WITH a AS (SELECT id FROM uno), b (id) AS (SELECT id FROM dos) SELECT * FROM a JOIN b ON a.id = b.id",
+        "main_table": "uno", "query_type": "SELECT", "tables": ["dos", "uno"],
+    },
+    {
+        "sql": "WITH d AS (SELECT id, ROW_NUMBER() OVER (ORDER BY id) rn FROM duplicados) DELETE FROM d WHERE rn > 1",
+        "main_table": "duplicados", "query_type": "DELETE", "tables": ["duplicados"],
+    },
+    # ------------------- UPDATE -------------------
+    {
+        "sql": "UPDATE clientes SET col_3 = @P0, fecha_mod = GETDATE() WHERE id = @P1",
+        "main_table": "clientes", "query_type": "UPDATE", "tables": ["clientes"],
+    },
+    {
+        "sql": "UPDATE [dbo].[inventario] SET stock = stock - 1 WHERE id = @P0",
+        "main_table": "inventario", "query_type": "UPDATE", "tables": ["inventario"],
+    },
+    {
+        "sql": "UPDATE f SET f.estado = 2 FROM facturas f INNER JOIN clientes c ON c.id = f.cliente WHERE c.bloqueado = 1",
+        "main_table": "facturas", "query_type": "UPDATE", "tables": ["clientes", "facturas"],
+    },
+    {
+        "sql": "UPDATE TOP (500) colas SET tomado = 1 WHERE tomado = 0",
+        "main_table": "colas", "query_type": "UPDATE", "tables": ["colas"],
+    },
+    # ------------------- INSERT -------------------
+    {
+        "sql": "INSERT INTO dbo.auditoria (col_0, col_1) VALUES (@P0, @P1)",
+        "main_table": "auditoria", "query_type": "INSERT", "tables": ["auditoria"],
+    },
+    {
+        "sql": "INSERT historico (id, valor) SELECT id, valor FROM actual WHERE fecha < @P0",
+        "main_table": "historico", "query_type": "INSERT", "tables": ["actual", "historico"],
+    },
+    {
+        "sql": "(@P0 nvarchar(50))INSERT INTO [eventos] ([tipo]) VALUES (@P0)",
+        "main_table": "eventos", "query_type": "INSERT", "tables": ["eventos"],
+    },
+    {
+        "sql": "INSERT INTO #staging SELECT * FROM OPENQUERY(remoto, 'SELECT * FROM origen')",
+        "main_table": "#staging", "query_type": "INSERT", "tables": ["#staging"],
+    },
+    # ------------------- DELETE -------------------
+    {
+        "sql": "DELETE FROM sesiones WHERE expira < GETDATE()",
+        "main_table": "sesiones", "query_type": "DELETE", "tables": ["sesiones"],
+    },
+    {
+        "sql": "DELETE TOP (1000) FROM dbo.logs WHERE fecha < @P0",
+        "main_table": "logs", "query_type": "DELETE", "tables": ["logs"],
+    },
+    {
+        "sql": "DELETE d FROM detalle d JOIN cabecera c ON c.id = d.cab WHERE c.anulada = 1",
+        "main_table": "detalle", "query_type": "DELETE", "tables": ["cabecera", "detalle"],
+    },
+    {
+        "sql": "DELETE tokens WHERE usado = 1",
+        "main_table": "tokens", "query_type": "DELETE", "tables": ["tokens"],
+    },
+    # ------------------- DDL y otros -------------------
+    {
+        "sql": "CREATE TABLE #trabajo (id int, valor decimal(18, 2))",
+        "main_table": "#trabajo", "query_type": "DDL", "tables": ["#trabajo"],
+    },
+    {
+        "sql": "ALTER TABLE dbo.clientes ADD email nvarchar(200) NULL",
+        "main_table": "clientes", "query_type": "DDL", "tables": ["clientes"],
+    },
+    {
+        "sql": "DROP TABLE IF EXISTS #temporal",
+        "main_table": "#temporal", "query_type": "DDL", "tables": ["#temporal"],
+    },
+    {
+        "sql": "MERGE INTO destino AS d USING origen AS o ON d.id = o.id WHEN MATCHED THEN UPDATE SET d.v = o.v;",
+        "main_table": "destino", "query_type": "MERGE", "tables": ["destino", "origen"],
+    },
+    {
+        "sql": "EXEC sp_accesos_guardar @P0, @P1",
+        "main_table": "unknown", "query_type": "UNKNOWN", "tables": [],
+    },
+    {
+        "sql": "",
+        "main_table": "unknown", "query_type": "UNKNOWN", "tables": [],
+    },
+]
@@ -0,0 +1,244 @@
+"""
+Suite de benchmarks del pipeline de recolección.
+
+- e2e: MetricsService.processRecord + ExpositionService.fetchRecords /
+  fetchExposition de punta a punta, con el plan cache sintético
+  (plan_cache_generator.FakeRepository en lugar de SQL Server) y el stand-in
+  de Redis en un hilo del mismo proceso. Modo completo (TOP 50 en SQL) e
+  incremental (PlanCacheService) a varios tamaños de plan cache.
+- micro: QueryDomain, MetricsDomain y PrometheusService por separado.
+
+Los resultados se escriben en JSON para compararlos entre commits:
+
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --sizes 1000 10000 --only micro
+    python -m benchmarks.suite --output new.json --baseline bench.json --tolerance 0.25
+
+Con --baseline sale con código 1 si algún caso empeora más que la tolerancia.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+SCHEMA_VERSION = 1
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure(func, repeat: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return {
+        "best_ms": min(samples) * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "repeat": repeat,
+    }
+
+
+# ------------------- Punta a punta -------------------
+def e2e_cases(sizes, repeat: int):
+    from benchmarks.plan_cache_generator import FakeRepository, PlanCacheGenerator
+    from src.Services.ExpositionService import ExpositionService
+    from src.Services.MetricsService import MetricsService
+    from src.Services.PlanCacheService import PlanCacheService
+    from src.Services.PrometheusService import PrometheusService
+    from src.Services.QueryAnalysisService import QueryAnalysisService
+    from src.Services.RedisService import RedisService
+    from src.Utils.ExpositionCache import ExpositionCache
+    from src.Utils.RedisConection import RedisConection
+
+    redis = RedisService(RedisConection())
+    prometheus = PrometheusService()
+
+    for size in sizes:
+        for mode in ("full", "incremental"):
+            target = f"bench_{mode}_{size}"
+            repo = FakeRepository(PlanCacheGenerator(statements=size))
+            plan_cache = PlanCacheService(database=repo) if mode == "incremental" else None
+            service = MetricsService(
+                redis=redis,
+                database=repo,
+                prometheus=prometheus,
+                analyzer=QueryAnalysisService(max_items=max(5000, size * 2)),
+                plan_cache=plan_cache,
+                target=target,
+            )
+            exposition = ExpositionService(redis, prometheus, [target])
+
+            # el primer ciclo solo guarda el snapshot; warmup=1 calienta el cache de análisis
+            service.processRecord("Baseconta")
+            yield f"e2e.processRecord.{mode}", size, measure(lambda: service.processRecord("Baseconta"), repeat)
+            yield f"e2e.fetchRecords.{mode}", size, measure(exposition.fetchRecords, repeat)
+
+            def cold_exposition():
+                exposition.response_cache = ExpositionCache()
+                exposition.fetchExposition()
+
+            yield f"e2e.fetchExposition_cold.{mode}", size, measure(cold_exposition, repeat)
+            yield f"e2e.fetchExposition_cached.{mode}", size, measure(exposition.fetchExposition, repeat)
+
+
+# ------------------- Micro -------------------
+def micro_cases(sizes, repeat: int):
+    from benchmarks.plan_cache_generator import PlanCacheGenerator
+    from src.Domain.MetricsDomain import MetricsDomain
+    from src.Domain.QueryDomain import QueryDomain
+    from src.Services.PrometheusService import PrometheusService
+
+    prometheus = PrometheusService()
+    labels = {"target": "bench"}
+
+    for size in sizes:
+        generator = PlanCacheGenerator(statements=size)
+        generator.advance()
+        rows = generator.rows()
+        texts = [row["query_text"] for row in rows]
+        MetricsDomain.normalize_queries(rows, "2024-01-01T00:00:00", QueryDomain.getMainTable)
+
+        yield "micro.QueryDomain.getMainTable", size, measure(
+            lambda: [QueryDomain.getMainTable(text) for text in texts], repeat
+        )
+        yield "micro.MetricsDomain.normalize_queries", size, measure(
+            lambda: MetricsDomain.normalize_queries(rows, "2024-01-01T00:00:00", QueryDomain.getMainTable), repeat
+        )
+        yield "micro.MetricsDomain.group_heavy_queries", size, measure(
+            lambda: MetricsDomain.group_heavy_queries(rows), repeat
+        )
+        yield "micro.MetricsDomain.group_frequent_queries", size, measure(
+            lambda: MetricsDomain.group_frequent_queries(rows), repeat
+        )
+
+        old = MetricsDomain.group_heavy_queries(rows)
+        generator.advance()
+        newer = generator.rows()
+        MetricsDomain.normalize_queries(newer, "2024-01-01T00:01:00", QueryDomain.getMainTable)
+        current = MetricsDomain.group_heavy_queries(newer)
+        new_tables = MetricsDomain.detect_new_tables(old, current)
+        deltas = MetricsDomain.calculate_deltas(old, current, new_tables)
+
+        yield "micro.MetricsDomain.calculate_deltas", size, measure(
+            lambda: MetricsDomain.calculate_deltas(old, current, new_tables), repeat
+        )
+        yield "micro.MetricsDomain.generate_texplain_top10", size, measure(
+            lambda: MetricsDomain.generate_texplain_top10(newer, QueryDomain.getMainTable, limit=None), repeat
+        )
+        yield "micro.PrometheusService.generate_text", size, measure(
+            lambda: prometheus.generate_text(deltas, "heavy", labels), repeat
+        )
+        top10 = MetricsDomain.generate_texplain_top10(newer, QueryDomain.getMainTable)
+        yield "micro.PrometheusService.generate_texplain_gauges", size, measure(
+            lambda: prometheus.generate_texplain_gauges(top10, labels), repeat
+        )
+        texts_by_target = [
+            prometheus.generate_text(deltas, "heavy", {"target": f"t{i}"}) for i in range(4)
+        ]
+        yield "micro.PrometheusService.merge_expositions", size, measure(
+            lambda: prometheus.merge_expositions(texts_by_target), repeat
+        )
+
+
+# ------------------- Resultados -------------------
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Casos cuyo best_ms empeoró más que `tolerance` (fracción) respecto al baseline."""
+    previous = {(r["name"], r["size"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get((result["name"], result["size"]))
+        if not before or before["best_ms"] <= 0:
+            continue
+        ratio = result["best_ms"] / before["best_ms"]
+        result["baseline_best_ms"] = before["best_ms"]
+        result["ratio"] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", choices=["e2e", "micro"])
+    parser.add_argument("--output", help="archivo JSON de resultados")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    if args.only != "micro":
+        # stand-in de Redis en un hilo de este proceso; settings se lee después
+        from benchmarks.redis_standin import start_in_thread
+
+        port = free_port()
+        os.environ["REDIS_SERVER"] = "127.0.0.1"
+        os.environ["REDIS_PORT"] = str(port)
+        start_in_thread(port)
+
+    suites = []
+    if args.only != "micro":
+        suites.append(e2e_cases(args.sizes, args.repeat))
+    if args.only != "e2e":
+        suites.append(micro_cases(args.sizes, args.repeat))
+
+    results = []
+    print(f"{'case':<50} {'size':>7} {'best_ms':>10} {'median_ms':>10}")
+    for suite in suites:
+        for name, size, timing in suite:
+            results.append({"name": name, "size": size, **timing})
+            print(f"{name:<50} {size:>7} {timing['best_ms']:>10.2f} {timing['median_ms']:>10.2f}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            regressions = compare(results, json.load(handle), args.tolerance)
+        for result in regressions:
+            print(
+                f"REGRESIÓN {result['name']} size={result['size']}: "
+                f"{result['baseline_best_ms']:.2f} -> {result['best_ms']:.2f} ms (x{result['ratio']:.2f})"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(
+                {"schema": SCHEMA_VERSION, "environment": environment(), "results": results},
+                handle,
+                indent=2,
+            )
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Rol recolector: lee los DMV de cada instancia y publica las generaciones de
+cada target (base) en Redis.
+
+    python collector.py        # solo recolector, sin servidor web
+
+Los targets de un mismo servidor se recolectan juntos (DATABASE_INSTANCES):
+un pool, una lectura de los DMV por ciclo y las series de toda la instancia
+(heavy, texplain, usuarios, memoria) publicadas una sola vez, con el primer
+target de la instancia; cada base publica su vista frequent.
+Se pueden correr varias réplicas: un lease en Redis por instancia
+(LeaderElectionService) deja un solo recolector activo por instancia y, si ese
+recolector cae, otra réplica lo toma cuando el lease vence.
+El servidor web (main.py / async_main.py con APP_ROLE=WEB) solo lee de Redis
+y puede escalar con varios workers.
+Con COLLECTORS_ENABLED las consultas en curso, los usuarios y la memoria se
+leen como colectores livianos (CollectorDomain), cada uno con su intervalo
+(COLLECTOR_INTERVALS="current_queries=5,memory=120"), separados del plan cache.
+Con CAPTURE_DIR cada ciclo del plan cache guarda además sus conjuntos de
+resultados crudos para reproducirlos después sin SQL Server (replay.py); los
+colectores livianos no se capturan.
+"""
+import atexit
+import logging
+import signal
+import sys
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+from pytz import timezone
+from src.Utils.RedisConection import RedisConection
+from src.Services.MetricsService import MetricsService
+from src.Services.DatabaseService import DatabaseService
+from src.Services.RedisService import RedisService
+from src.Utils.DatabaseConnection import DatabaseConnection
+from src.Repositories.BdRepository import BdRepository
+from settings.AppSettings import TIMEZONE
+from src.Services.PrometheusService import PrometheusService
+from src.Services.QueryAnalysisService import QueryAnalysisService
+from settings.AppSettings import ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL, ANALYSIS_CACHE_REDIS
+from src.Services.PlanCacheService import PlanCacheService
+from settings.AppSettings import INCREMENTAL_COLLECTION, INCREMENTAL_FULL_SCAN_EVERY
+from src.Utils.ConnectionPool import ConnectionPool
+from settings.AppSettings import DB_POOL_SIZE, DB_POOL_MAX_AGE, DB_POOL_TIMEOUT
+from src.Services.CollectionService import CollectionService
+from settings.AppSettings import COLLECTION_WORKERS
+from settings.DataBaseSetting import DATABASE_INSTANCES
+from src.Services.HistoryService import HistoryService
+from settings.AppSettings import HISTORY_ENABLED, HISTORY_RAW_POINTS, HISTORY_5M_POINTS, HISTORY_1H_POINTS
+from src.Services.LeaderElectionService import LeaderElectionService
+from settings.AppSettings import COLLECTOR_ID, LEADER_LEASE_TTL, LEADER_RENEW_EVERY
+from src.Domain.ScheduleDomain import ScheduleDomain
+from settings.AppSettings import (
+    SCHEDULE_TICK, SCHEDULE_INTERVAL, SCHEDULE_MIN_INTERVAL, SCHEDULE_MAX_INTERVAL, SCHEDULE_JITTER,
+    SCHEDULE_OVERLAP, SCHEDULE_COST_HIGH, SCHEDULE_COST_LOW, SCHEDULE_LOAD_HIGH, SCHEDULE_LOAD_LOW,
+)
+from settings.AppSettings import PLAN_CACHE_TIMEOUT
+from settings.AppSettings import LOG_LEVEL
+from src.Services.CaptureService import CaptureDatabaseService
+from src.Utils.CaptureFile import CaptureWriter
+from settings.AppSettings import CAPTURE_DIR, CAPTURE_MAX_MB
+from settings.AppSettings import AGGREGATE_BY_QUERY_HASH
+from src.Services.StatementTextService import StatementTextService
+from settings.AppSettings import STATEMENT_TEXT_CACHE, STATEMENT_TEXT_CACHE_SIZE, STATEMENT_TEXT_CACHE_TTL
+from src.Domain.CollectorDomain import CollectorDomain
+from settings.AppSettings import COLLECTORS_ENABLED, COLLECTOR_INTERVALS
+
+
+def build_collector(redis_service: RedisService, prometheus: PrometheusService, history_service) -> CollectionService:
+    """
+    Arma el CollectionService con un MetricsService por instancia (todas sus
+    bases monitoreadas en una sola lectura de los DMV) y el lease de cada una.
+    """
+    query_analyzer = QueryAnalysisService(
+        max_items=ANALYSIS_CACHE_SIZE,
+        ttl=ANALYSIS_CACHE_TTL,
+        redis=redis_service if ANALYSIS_CACHE_REDIS else None,
+    )
+    leader = LeaderElectionService(
+        redis=redis_service,
+        names=[instance["name"] for instance in DATABASE_INSTANCES],
+        owner=COLLECTOR_ID,
+        ttl=LEADER_LEASE_TTL,
+        renew_every=LEADER_RENEW_EVERY,
+    )
+
+    def build_instance(instance: dict) -> dict:
+        """Arma la cadena conexión → pool → repositorio → servicios de una instancia."""
+        databaseConnection = DatabaseConnection(instance["connection_string"])
+        connectionPool = ConnectionPool(
+            databaseConnection,
+            max_size=DB_POOL_SIZE,
+            max_age=DB_POOL_MAX_AGE,
+            timeout=DB_POOL_TIMEOUT,
+        )
+        bdRepo = BdRepository(
+            db_connection=databaseConnection,
+            pool=connectionPool,
+            aggregate_by_hash=AGGREGATE_BY_QUERY_HASH,
+            # el lote del plan cache también tiene tiempo máximo; si vence, el ciclo cuenta como error
+            batch_timeout=PLAN_CACHE_TIMEOUT,
+        )
+        # el texto de las sentencias se cachea por instancia (solo aplica a la lectura incremental)
+        statement_texts = StatementTextService(
+            target=instance["name"],
+            max_items=STATEMENT_TEXT_CACHE_SIZE,
+            ttl=STATEMENT_TEXT_CACHE_TTL,
+            redis=redis_service,
+        ) if STATEMENT_TEXT_CACHE and INCREMENTAL_COLLECTION else None
+        database_service = DatabaseService(repo=bdRepo, texts=statement_texts)
+        if CAPTURE_DIR:
+            # captura de los conjuntos crudos de cada ciclo para reproducirlos con replay.py
+            database_service = CaptureDatabaseService(
+                database_service,
+                CaptureWriter(CAPTURE_DIR, instance["name"], max_bytes=CAPTURE_MAX_MB * 1024 * 1024),
+            )
+        plan_cache = PlanCacheService(
+            database=database_service,
+            full_scan_every=INCREMENTAL_FULL_SCAN_EVERY,
+        ) if INCREMENTAL_COLLECTION else None
+        metrics_service = MetricsService(
+            redis=redis_service,
+            database=database_service,
+            prometheus=prometheus,
+            analyzer=query_analyzer,
+            plan_cache=plan_cache,
+            target=instance["name"],
+            history=history_service,
+            leader=leader,
+            # con los colectores livianos el ciclo del plan cache ya no lee consultas, usuarios ni memoria
+            live_sets=not COLLECTORS_ENABLED,
+            databases=[
+                {"name": target["name"], "database": target["database"]} for target in instance["targets"]
+            ],
+        )
+        return {
+            "name": instance["name"],
+            "database": instance["targets"][0]["database"],
+            "service": metrics_service,
+        }
+
+    return CollectionService(
+        redis=redis_service,
+        prometheus=prometheus,
+        analyzer=query_analyzer,
+        targets=[build_instance(instance) for instance in DATABASE_INSTANCES],
+        max_workers=COLLECTION_WORKERS,
+        leader=leader,
+        policy=ScheduleDomain.default_policy(
+            interval=SCHEDULE_INTERVAL,
+            min_interval=SCHEDULE_MIN_INTERVAL,
+            max_interval=SCHEDULE_MAX_INTERVAL,
+            jitter=SCHEDULE_JITTER,
+            overlap=SCHEDULE_OVERLAP,
+            cost_high=SCHEDULE_COST_HIGH,
+            cost_low=SCHEDULE_COST_LOW,
+            load_high=SCHEDULE_LOAD_HIGH,
+            load_low=SCHEDULE_LOAD_LOW,
+        ),
+        collectors=CollectorDomain.collectors(
+            CollectorDomain.parse_intervals(COLLECTOR_INTERVALS)
+        ) if COLLECTORS_ENABLED else None,
+    )
+
+
+def start_collector(collection_service: CollectionService, scheduler):
+    """
+    Toma los leases disponibles y programa un tick corto (SCHEDULE_TICK): en
+    cada tick CollectionService decide qué targets y colectores ya deben
+    recolectarse según su intervalo adaptativo. El tick solo despacha, nunca
+    se solapa consigo mismo (max_instances=1) y los ticks atrasados se juntan
+    en uno (coalesce).
+    Con BlockingScheduler esta llamada no vuelve hasta que se detiene el proceso.
+    """
+    def execute_metrics_job():
+        collection_service.collect_all()
+
+    # al salir se liberan los leases para que otra réplica tome los targets sin esperar el TTL
+    atexit.register(collection_service.leader.stop)
+    collection_service.leader.start()
+
+    scheduler.add_job(
+        execute_metrics_job,
+        trigger="interval",
+        seconds=SCHEDULE_TICK,
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=SCHEDULE_TICK,
+        timezone=timezone(TIMEZONE)
+    )
+    scheduler.start()
+
+
+if __name__ == "__main__":
+    redis_service = RedisService(RedisConection())
+    prometheus = PrometheusService()
+    history_service = HistoryService(
+        redis=redis_service,
+        raw_points=HISTORY_RAW_POINTS,
+        five_minute_points=HISTORY_5M_POINTS,
+        hour_points=HISTORY_1H_POINTS,
+        cycle=SCHEDULE_INTERVAL,
+    ) if HISTORY_ENABLED else None
+
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    # SIGTERM (docker stop, systemd) pasa por sys.exit para que corra atexit
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        start_collector(build_collector(redis_service, prometheus, history_service), BlockingScheduler())
+    except (KeyboardInterrupt, SystemExit):
+        pass
@@ -1,46 +1,97 @@
-from flask import Flask, Response
-from apscheduler.schedulers.background import BackgroundScheduler
-from pytz import timezone
-from src.Utils.RedisConection import RedisConection
-from src.Services.MetricsService import MetricsService
-from src.Services.DatabaseService import DatabaseService
-from src.Services.RedisService import RedisService
-from src.Utils.DatabaseConnection import DatabaseConnection
-from src.Repositories.BdRepository import BdRepository
-from settings.AppSettings import TIMEZONE
-from src.Services.PrometheusService import PrometheusService
+import time
+from flask import Flask, Response, request
+from web_services import build_web_services, configure_logging, start_embedded_collector
+from src.Services.ExpositionService import ExpositionService
 
+configure_logging()
 app = Flask(__name__)
 
 
-databaseConnection = DatabaseConnection()
-bdRepo = BdRepository(db_connection=databaseConnection)
-database_service = DatabaseService(repo=bdRepo)
-redis_service = RedisService(RedisConection())
-prometheus=PrometheusService()
-metrics_service = MetricsService(redis=redis_service, database=database_service,prometheus=prometheus)
+services = build_web_services()
+history_service = services["history"]
+exposition_service = services["exposition"]
+grafana_service = services["grafana"]
+targets = services["targets"]
 
+# con APP_ROLE=ALL el recolector corre en este mismo proceso (ver web_services)
+collection_service = start_embedded_collector(services)
 
-scheduler = BackgroundScheduler()
 
-def execute_metrics_job():
-    metrics_service.processRecord("Baseconta")
+@app.get("/metrics")
+def getmetrics():
+    """Exposición Prometheus (texto) de todos los targets y del exporter."""
+    etag, body, gzipped = exposition_service.fetchExposition()
+    # ETag fuerte por codificación: el cuerpo gzip y el plano son bytes distintos
+    gzip = request.accept_encodings.quality("gzip") > 0
+    etag = ExpositionService.encoded_etag(etag, gzip)
 
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif gzip:
+        response = Response(gzipped, mimetype="text/plain")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(body, mimetype="text/plain")
 
-scheduler.add_job(
-    execute_metrics_job,
-    trigger="interval",
-    minutes=1,
-    timezone=timezone(TIMEZONE)  
-)
-scheduler.start()
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    return response
 
+@app.get("/history")
+def gethistory():
+    """
+    Deltas por tabla de un target en una ventana de tiempo.
+    ?target=&from=&to= (epoch en segundos) [&tier=auto|raw|5m|1h][&table=a&table=b][&limit=n]
+    """
+    if not history_service:
+        return {"error": "historial deshabilitado"}, 404
 
-@app.get("/metrics")
-def getmetrics():
-    """Retorna datos listos para Grafana (JSON API datasource)."""
-    data = metrics_service.fetchRecords()   
-    return Response(data, mimetype="text/plain")
+    now = time.time()
+    try:
+        start = float(request.args.get("from", now - 3600))
+        end = float(request.args.get("to", now))
+        limit = request.args.get("limit", type=int)
+        return history_service.read(
+            target=request.args.get("target", targets[0]),
+            start=start,
+            end=end,
+            tier=request.args.get("tier", "auto"),
+            tables=request.args.getlist("table"),
+            limit=limit,
+        )
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+# ------------------- Grafana JSON API datasource -------------------
+# URL del datasource: http://<host>:5000/grafana
+
+@app.get("/grafana/")
+def grafana_health():
+    return "OK"
+
+@app.post("/grafana/search")
+def grafana_search():
+    return grafana_service.search(request.get_json(silent=True))
+
+@app.post("/grafana/metrics")
+def grafana_metrics():
+    """Lista de métricas para versiones nuevas del plugin (reemplaza a /search)."""
+    names = grafana_service.search(request.get_json(silent=True))
+    return [{"label": name, "value": name} for name in names]
+
+@app.post("/grafana/query")
+def grafana_query():
+    try:
+        return grafana_service.query(request.get_json(silent=True))
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+@app.post("/grafana/annotations")
+def grafana_annotations():
+    try:
+        return grafana_service.annotations(request.get_json(silent=True))
+    except ValueError as e:
+        return {"error": str(e)}, 400
 
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=5000,debug=True, use_reloader=False)
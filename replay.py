@@ -0,0 +1,134 @@
+"""
+Reproduce una captura (CAPTURE_DIR del recolector) a través de MetricsService,
+sin SQL Server, para perfilar y ajustar el pipeline con datos de producción.
+
+    python replay.py captures/prod01-20240315.ndjson.gz              # lo más rápido posible
+    python replay.py captura.ndjson.gz --speed 60                    # 60x el ritmo original
+    python replay.py captura.ndjson.gz --profile replay.prof         # cProfile de processRecord
+    python replay.py captura.ndjson.gz --standin                     # Redis en memoria
+
+Las generaciones se publican bajo el target "replay:<target>" (o --target),
+así reproducir contra el Redis de producción no pisa las claves reales.
+Solo se reproduce el ciclo del plan cache: los colectores livianos
+(COLLECTORS_ENABLED) no se capturan, y un ciclo capturado con ellos activos
+no trae consultas, usuarios ni memoria (se reproduce con live_sets=False).
+Sale con una tabla de duraciones por ciclo y el resumen (mediana, p95, máx).
+"""
+import argparse
+import cProfile
+import os
+import socket
+import statistics
+import time
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="archivo .ndjson.gz escrito por CaptureWriter")
+    parser.add_argument("--speed", type=float, default=0, help="factor sobre el ritmo capturado (0 = sin esperas)")
+    parser.add_argument("--target", help="target con el que se publica (por defecto replay:<target capturado>)")
+    parser.add_argument("--limit", type=int, help="ciclos a reproducir como máximo")
+    parser.add_argument("--profile", help="guarda un cProfile de los processRecord en este archivo")
+    parser.add_argument("--standin", action="store_true", help="usa el stand-in de Redis de benchmarks/ en memoria")
+    args = parser.parse_args()
+
+    if args.standin:
+        # settings lee REDIS_* al importarse: el stand-in se levanta antes
+        from benchmarks.redis_standin import start_in_thread
+
+        port = free_port()
+        os.environ["REDIS_SERVER"] = "127.0.0.1"
+        os.environ["REDIS_PORT"] = str(port)
+        start_in_thread(port)
+
+    from src.Services.CaptureService import ReplayDatabaseService
+    from src.Services.MetricsService import MetricsService
+    from src.Services.PlanCacheService import PlanCacheService
+    from src.Services.PrometheusService import PrometheusService
+    from src.Services.QueryAnalysisService import QueryAnalysisService
+    from src.Services.RedisService import RedisService
+    from src.Utils.CaptureFile import CaptureFile
+    from src.Utils.RedisConection import RedisConection
+    from settings.AppSettings import ANALYSIS_CACHE_SIZE, INCREMENTAL_FULL_SCAN_EVERY
+
+    redis_service = RedisService(RedisConection())
+    replay = ReplayDatabaseService()
+    profiler = cProfile.Profile() if args.profile else None
+    service = None
+    durations = []
+    previous = None
+
+    print(f"{'ciclo':>6} {'capturado':<26} {'filas':>7} {'sql_ms':>8} {'proceso_ms':>11}  resultado")
+    for record in CaptureFile.read(args.capture):
+        if args.limit and replay.cycles >= args.limit:
+            break
+        if service is None:
+            # el modo del pipeline sale de la captura (completa o incremental)
+            plan_cache = PlanCacheService(
+                database=replay, full_scan_every=INCREMENTAL_FULL_SCAN_EVERY
+            ) if record["incremental"] else None
+            target = args.target or f"replay:{record['target']}"
+            # captura de una instancia con varias bases: cada una en su propio espacio
+            databases = None
+            if not isinstance(record["db_name"], str):
+                databases = [
+                    {"name": target if idx == 0 else f"{target}:{db_name}", "database": db_name}
+                    for idx, db_name in enumerate(record["db_name"])
+                ]
+            service = MetricsService(
+                redis=redis_service,
+                database=replay,
+                prometheus=PrometheusService(),
+                analyzer=QueryAnalysisService(max_items=ANALYSIS_CACHE_SIZE),
+                plan_cache=plan_cache,
+                target=target,
+                live_sets=record["live"],
+                databases=databases,
+            )
+
+        if args.speed and previous is not None:
+            wait = (record["captured_at"] - previous).total_seconds() / args.speed
+            if wait > 0:
+                time.sleep(wait)
+        previous = record["captured_at"]
+
+        replay.load(record)
+        started = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        result = service.processRecord(record["db_name"])
+        if profiler:
+            profiler.disable()
+        elapsed = time.perf_counter() - started
+        durations.append(elapsed)
+
+        rows = sum(len(rows) for rows in record["batch"].values())
+        status = result if result in ("FIRST SNAPSHOT STORED", "NOT LEADER") else "publicado"
+        print(
+            f"{replay.cycles:>6} {record['captured_at'].isoformat(timespec='seconds'):<26} {rows:>7} "
+            f"{record['duration'] * 1000:>8.1f} {elapsed * 1000:>11.1f}  {status}"
+        )
+
+    if not durations:
+        print("La captura no tiene ciclos")
+        return
+
+    ordered = sorted(durations)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"\n{len(durations)} ciclos: mediana {statistics.median(ordered) * 1000:.1f} ms, "
+        f"p95 {p95 * 1000:.1f} ms, máx {ordered[-1] * 1000:.1f} ms, total {sum(ordered):.2f} s"
+    )
+    if profiler:
+        profiler.dump_stats(args.profile)
+        print(f"perfil en {args.profile} (python -m pstats {args.profile})")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,4 +10,47 @@ JWT_TTL=os.getenv("JWT_TTL")
 EMAIL_SENDER=os.getenv("MAIL_USERNAME")
 EMAIL_SENDER_PASSWORD=os.getenv("MAIL_PASSWORD")
 EMAIL_CITAS=os.getenv("MAIL_CITAS")
-EMAIL_SISTEMAS=os.getenv("MAIL_SISTEMAS")
\ No newline at end of file
+EMAIL_SISTEMAS=os.getenv("MAIL_SISTEMAS")
+ANALYSIS_CACHE_SIZE=int(os.getenv("ANALYSIS_CACHE_SIZE", "5000"))
+ANALYSIS_CACHE_TTL=int(os.getenv("ANALYSIS_CACHE_TTL", "86400"))
+ANALYSIS_CACHE_REDIS=os.getenv("ANALYSIS_CACHE_REDIS", "TRUE").upper()=="TRUE"
+INCREMENTAL_COLLECTION=os.getenv("INCREMENTAL_COLLECTION", "TRUE").upper()=="TRUE"
+INCREMENTAL_FULL_SCAN_EVERY=int(os.getenv("INCREMENTAL_FULL_SCAN_EVERY", "60"))
+DB_POOL_SIZE=int(os.getenv("DB_POOL_SIZE", "4"))
+DB_POOL_MAX_AGE=int(os.getenv("DB_POOL_MAX_AGE", "1800"))
+DB_POOL_TIMEOUT=int(os.getenv("DB_POOL_TIMEOUT", "10"))
+COLLECTION_WORKERS=int(os.getenv("COLLECTION_WORKERS", "4"))
+SNAPSHOT_FORMAT=os.getenv("SNAPSHOT_FORMAT", "BINARY").upper()
+SNAPSHOT_COMPRESSION=os.getenv("SNAPSHOT_COMPRESSION", "TRUE").upper()=="TRUE"
+HISTORY_ENABLED=os.getenv("HISTORY_ENABLED", "TRUE").upper()=="TRUE"
+HISTORY_RAW_POINTS=int(os.getenv("HISTORY_RAW_POINTS", "1440"))
+HISTORY_5M_POINTS=int(os.getenv("HISTORY_5M_POINTS", "2016"))
+HISTORY_1H_POINTS=int(os.getenv("HISTORY_1H_POINTS", "2160"))
+REDIS_ASYNC_POOL_SIZE=int(os.getenv("REDIS_ASYNC_POOL_SIZE", "50"))
+APP_ROLE=os.getenv("APP_ROLE", "ALL").upper()
+COLLECTOR_ID=os.getenv("COLLECTOR_ID")
+LEADER_LEASE_TTL=int(os.getenv("LEADER_LEASE_TTL", "30"))
+LEADER_RENEW_EVERY=int(os.getenv("LEADER_RENEW_EVERY", "10"))
+SCHEDULE_TICK=int(os.getenv("SCHEDULE_TICK", "5"))
+SCHEDULE_INTERVAL=float(os.getenv("SCHEDULE_INTERVAL", "60"))
+SCHEDULE_MIN_INTERVAL=float(os.getenv("SCHEDULE_MIN_INTERVAL", "30"))
+SCHEDULE_MAX_INTERVAL=float(os.getenv("SCHEDULE_MAX_INTERVAL", "300"))
+SCHEDULE_JITTER=float(os.getenv("SCHEDULE_JITTER", "0.1"))
+SCHEDULE_OVERLAP=os.getenv("SCHEDULE_OVERLAP", "SKIP").upper()
+SCHEDULE_COST_HIGH=float(os.getenv("SCHEDULE_COST_HIGH", "0.25"))
+SCHEDULE_COST_LOW=float(os.getenv("SCHEDULE_COST_LOW", "0.05"))
+SCHEDULE_LOAD_HIGH=int(os.getenv("SCHEDULE_LOAD_HIGH", "64"))
+SCHEDULE_LOAD_LOW=int(os.getenv("SCHEDULE_LOAD_LOW", "4"))
+PLAN_CACHE_TIMEOUT=int(os.getenv("PLAN_CACHE_TIMEOUT", "30"))
+LOG_LEVEL=os.getenv("LOG_LEVEL", "INFO").upper()
+CAPTURE_DIR=os.getenv("CAPTURE_DIR")
+CAPTURE_MAX_MB=int(os.getenv("CAPTURE_MAX_MB", "512"))
+AGGREGATE_BY_QUERY_HASH=os.getenv("AGGREGATE_BY_QUERY_HASH", "FALSE").upper()=="TRUE"
+STATEMENT_TEXT_CACHE=os.getenv("STATEMENT_TEXT_CACHE", "TRUE").upper()=="TRUE"
+STATEMENT_TEXT_CACHE_SIZE=int(os.getenv("STATEMENT_TEXT_CACHE_SIZE", "20000"))
+STATEMENT_TEXT_CACHE_TTL=int(os.getenv("STATEMENT_TEXT_CACHE_TTL", "86400"))
+TEXPLAIN_QUERY_MAX_LENGTH=int(os.getenv("TEXPLAIN_QUERY_MAX_LENGTH", "1024"))
+USERS_TOP_K=int(os.getenv("USERS_TOP_K", "20"))
+EXPOSITION_MAX_SERIES=int(os.getenv("EXPOSITION_MAX_SERIES", "20000"))
+COLLECTORS_ENABLED=os.getenv("COLLECTORS_ENABLED", "TRUE").upper()=="TRUE"
+COLLECTOR_INTERVALS=os.getenv("COLLECTOR_INTERVALS", "")
@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
  
@@ -17,10 +18,71 @@ REDIS_PORT = os.getenv('REDIS_PORT')
 
 
 
-DATABASE_CONNECTION_STRING = (
-    f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-    f'SERVER={DATABASE_URL};'
-    f'DATABASE={DATABASE_NAME};'
-    f'UID={DATABASE_USER};'
-    f'PWD={DATABASE_PASSWORD}'
-)
\ No newline at end of file
+def build_connection_string(server, database, user, password, port=None) -> str:
+    server = f"{server},{port}" if port else server
+    return (
+        f'DRIVER={{ODBC Driver 17 for SQL Server}};'
+        f'SERVER={server};'
+        f'DATABASE={database};'
+        f'UID={user};'
+        f'PWD={password}'
+    )
+
+
+DATABASE_CONNECTION_STRING = build_connection_string(
+    DATABASE_URL, DATABASE_NAME, DATABASE_USER, DATABASE_PASSWORD
+)
+
+
+# Clave de la instancia SQL Server de un target (servidor y puerto)
+def _instance_key(server, port=None) -> str:
+    return (f"{server},{port}" if port else str(server)).lower()
+
+
+# Targets monitoreados. DATABASE_TARGETS es una lista JSON, p. ej.:
+# [{"name": "conta", "server": "10.0.0.1", "database": "Baseconta", "user": "sa", "password": "..."}]
+# Los campos omitidos toman los valores DATABASE_* de arriba.
+# Sin DATABASE_TARGETS se monitorea solo DATABASE_NAME en DATABASE_URL.
+def _load_targets() -> list:
+    raw = os.getenv("DATABASE_TARGETS")
+    entries = json.loads(raw) if raw else [{}]
+
+    targets = []
+    for entry in entries:
+        server = entry.get("server", DATABASE_URL)
+        database = entry.get("database", DATABASE_NAME)
+        targets.append({
+            "name": entry.get("name", database),
+            "database": database,
+            "instance": _instance_key(server, entry.get("port")),
+            "connection_string": build_connection_string(
+                server,
+                database,
+                entry.get("user", DATABASE_USER),
+                entry.get("password", DATABASE_PASSWORD),
+                entry.get("port"),
+            ),
+        })
+    return targets
+
+
+# El plan cache, las sesiones y la memoria son de toda la instancia: los
+# targets de un mismo servidor se recolectan juntos, con una sola lectura de
+# los DMV por ciclo y la conexión del primero. El grupo se llama como su
+# primer target, que publica las series de toda la instancia; los demás solo
+# publican las de su base (frequent).
+def _group_instances(targets: list) -> list:
+    instances = {}
+    for target in targets:
+        instance = instances.setdefault(target["instance"], {
+            "name": target["name"],
+            "instance": target["instance"],
+            "connection_string": target["connection_string"],
+            "targets": [],
+        })
+        instance["targets"].append(target)
+    return list(instances.values())
+
+
+DATABASE_TARGETS = _load_targets()
+DATABASE_INSTANCES = _group_instances(DATABASE_TARGETS)
@@ -0,0 +1,34 @@
+# Lecturas livianas de los DMV: las usa el lote de recolección y, por separado,
+# cada colector del registro (ver CollectorDomain).
+
+CURRENT_QUERIES_SQL = """SELECT 
+            COUNT(*) AS queries_processing_now
+        FROM sys.dm_exec_requests
+        WHERE status = 'running'"""
+
+CURRENT_USERS_SQL = """SELECT 
+                s.host_name,
+                c.client_net_address,
+                s.program_name,
+                COUNT(r.session_id) AS requests_running_now
+            FROM sys.dm_exec_sessions s
+            LEFT JOIN sys.dm_exec_requests r
+                ON s.session_id = r.session_id
+            LEFT JOIN sys.dm_exec_connections c
+                ON s.session_id = c.session_id
+            WHERE s.is_user_process = 1
+            GROUP BY 
+                s.host_name,
+                c.client_net_address,
+                s.program_name
+            ORDER BY requests_running_now DESC;
+            """
+
+MEMORY_SQL = """SELECT 
+                physical_memory_in_use_kb / 1024 AS sqlserver_memory_used_mb,
+                virtual_address_space_reserved_kb / 1024 AS vas_reserved_mb,
+                virtual_address_space_committed_kb / 1024 AS vas_committed_mb,
+                locked_page_allocations_kb / 1024 AS locked_pages_mb
+            FROM sys.dm_os_process_memory;
+
+            """
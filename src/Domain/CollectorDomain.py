@@ -0,0 +1,124 @@
+from typing import Dict, List, Optional
+
+from src.Const.dmv import CURRENT_QUERIES_SQL, CURRENT_USERS_SQL, MEMORY_SQL
+from src.Domain.MetricsDomain import MetricsDomain
+from src.Domain.ScheduleDomain import ScheduleDomain
+
+
+class CollectorDomain:
+    """
+    Registro de colectores livianos: cada uno declara su SQL, su intervalo,
+    el tiempo máximo de la consulta (timeout) y un presupuesto de costo
+    (fracción del intervalo que puede ocupar la consulta; si se pasa, el
+    planificador alarga su intervalo). Se publican cada uno en su propio
+    espacio de Redis, independientes del ciclo del plan cache, que sigue
+    siendo el colector "plan_cache" (MetricsService).
+    """
+
+    PLAN_CACHE = "plan_cache"
+
+    REGISTRY = (
+        {
+            "name": "current_queries",
+            "sql": CURRENT_QUERIES_SQL,
+            "interval": 10,
+            "timeout": 5,
+            "budget": 0.05,
+        },
+        {
+            "name": "current_users",
+            "sql": CURRENT_USERS_SQL,
+            "interval": 30,
+            "timeout": 10,
+            "budget": 0.05,
+        },
+        {
+            "name": "memory",
+            "sql": MEMORY_SQL,
+            "interval": 60,
+            "timeout": 5,
+            "budget": 0.05,
+        },
+    )
+
+    # -------------------------------------------------------------
+    # 📋 Registro
+    # -------------------------------------------------------------
+    @staticmethod
+    def names() -> List[str]:
+        return [collector["name"] for collector in CollectorDomain.REGISTRY]
+
+    @staticmethod
+    def collectors(intervals: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """Copia del registro con los intervalos sobrescritos (ver parse_intervals)."""
+        intervals = intervals or {}
+        unknown = set(intervals) - set(CollectorDomain.names())
+        if unknown:
+            raise ValueError(f"colectores desconocidos: {', '.join(sorted(unknown))}")
+        return [
+            {**collector, "interval": float(intervals.get(collector["name"], collector["interval"]))}
+            for collector in CollectorDomain.REGISTRY
+        ]
+
+    @staticmethod
+    def parse_intervals(raw: Optional[str]) -> Dict[str, float]:
+        """ "current_queries=5,memory=120" -> {"current_queries": 5.0, "memory": 120.0} """
+        intervals = {}
+        for item in filter(None, (part.strip() for part in (raw or "").split(","))):
+            name, _, seconds = item.partition("=")
+            intervals[name.strip()] = float(seconds)
+        return intervals
+
+    @staticmethod
+    def policy(collector: Dict, jitter: float = 0.1) -> Dict:
+        """
+        Política de ScheduleDomain para un colector: nunca baja de su
+        intervalo declarado, se alarga hasta 8x si pasa el presupuesto o
+        falla, y vuelve al intervalo base cuando el costo baja.
+        """
+        return ScheduleDomain.default_policy(
+            interval=collector["interval"],
+            min_interval=collector["interval"],
+            max_interval=collector["interval"] * 8,
+            cost_high=collector["budget"],
+            cost_low=0.0,
+            jitter=jitter,
+            overlap="SKIP",
+        )
+
+    # -------------------------------------------------------------
+    # 📈 Texto de exposición de cada colector
+    # -------------------------------------------------------------
+    @staticmethod
+    def render(name: str, rows: List[Dict], prometheus, labels: Dict[str, str], users_top: Optional[int] = None) -> str:
+        """Mismas series que publicaba el ciclo del plan cache para estas lecturas."""
+        if name == "current_queries":
+            if not rows:
+                return ""
+            return prometheus.generate_simple_gauge(
+                "db_current_queries",
+                "Consultas ejecutándose ahora en SQL Server",
+                rows[0]["queries_processing_now"],
+                labels,
+            )
+        if name == "current_users":
+            users = MetricsDomain.generate_texplain_users(rows, top=users_top)
+            return prometheus.generate_texplain_users_gauges(texplain_users=users, labels=labels)
+        if name == "memory":
+            if not rows:
+                return ""
+            return prometheus.generate_gauges(
+                [
+                    (f"db_memory_{key}", f"Métrica de memoria SQL Server: {key}", value)
+                    for key, value in rows[0].items()
+                ],
+                labels,
+            )
+        raise ValueError(f"colector sin render: {name}")
+
+    @staticmethod
+    def load(name: str, rows: List[Dict]) -> Optional[float]:
+        """Señal de carga para el planificador del plan cache (consultas en ejecución)."""
+        if name == "current_queries" and rows:
+            return rows[0]["queries_processing_now"]
+        return None
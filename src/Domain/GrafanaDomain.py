@@ -0,0 +1,205 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class GrafanaDomain:
+    """
+    Reducciones del lado del servidor para el datasource JSON API de Grafana:
+    filtro de tablas, top-N, agrupación por tabla y buckets de tiempo sobre
+    los puntos del historial (HistoryDomain) y las sentencias del ciclo.
+    """
+
+    SECTIONS = ("heavy", "frequent")
+    HEAVY_FIELDS = (
+        "execution_count",
+        "cpu_time_total",
+        "logical_reads_total",
+        "logical_writes_total",
+        "physical_reads_total",
+        "duration_total",
+    )
+    FREQUENT_FIELDS = ("execution_count", "total_elapsed_time", "exec_per_second")
+    STATEMENTS = "statements"
+    # anchos de bucket (s): divisores de la hora y del día, mínimo un ciclo
+    BUCKET_WIDTHS = (60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200, 86400)
+    STATEMENT_COLUMNS = (
+        ("rank", "number"),
+        ("table", "string"),
+        ("fingerprint", "string"),
+        ("execution_count", "number"),
+        ("cpu_time_total", "number"),
+        ("duration_total", "number"),
+        ("logical_reads_total", "number"),
+        ("logical_writes_total", "number"),
+        ("physical_reads_total", "number"),
+        ("plan_reuse_count", "number"),
+        ("plan_count", "number"),
+        ("query_text", "string"),
+    )
+
+    # -------------------------------------------------------------
+    # 🔎 Métricas disponibles
+    # -------------------------------------------------------------
+    @staticmethod
+    def metric_names() -> List[str]:
+        names = [f"heavy.{field}" for field in GrafanaDomain.HEAVY_FIELDS]
+        names += [f"frequent.{field}" for field in GrafanaDomain.FREQUENT_FIELDS]
+        names.append(GrafanaDomain.STATEMENTS)
+        return names
+
+    @staticmethod
+    def search(term: str = "") -> List[str]:
+        term = (term or "").lower()
+        return [name for name in GrafanaDomain.metric_names() if term in name.lower()]
+
+    @staticmethod
+    def parse_metric(name: str) -> Tuple[str, str]:
+        """"heavy.cpu_time_total" -> ("heavy", "cpu_time_total")."""
+        section, _, field = (name or "").partition(".")
+        fields = GrafanaDomain.HEAVY_FIELDS if section == "heavy" else GrafanaDomain.FREQUENT_FIELDS
+        if section not in GrafanaDomain.SECTIONS or field not in fields:
+            raise ValueError(f"métrica desconocida: {name}")
+        return section, field
+
+    # -------------------------------------------------------------
+    # 🕒 Tiempo
+    # -------------------------------------------------------------
+    @staticmethod
+    def parse_time(value) -> float:
+        """ISO 8601 (como lo manda Grafana) o epoch en ms/s -> epoch en segundos."""
+        if isinstance(value, (int, float)):
+            return value / 1000 if value > 1e11 else float(value)
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+    @staticmethod
+    def bucket_width(start: float, end: float, interval_ms: Optional[int], max_points: Optional[int]) -> int:
+        """
+        Ancho del bucket en segundos: el intervalo del panel, pero nunca tan
+        fino como para pasar de maxDataPoints puntos. Se redondea al siguiente
+        ancho de BUCKET_WIDTHS para que los buckets caigan alineados con los
+        niveles de 5 minutos y 1 hora del historial.
+        """
+        width = (interval_ms or 0) / 1000
+        if max_points:
+            width = max(width, (end - start) / max_points)
+        return GrafanaDomain.align_width(width)
+
+    @staticmethod
+    def align_width(width: float) -> int:
+        for candidate in GrafanaDomain.BUCKET_WIDTHS:
+            if candidate >= width:
+                return candidate
+        day = GrafanaDomain.BUCKET_WIDTHS[-1]
+        return int(-(-width // day) * day)
+
+    # -------------------------------------------------------------
+    # 📈 Series
+    # -------------------------------------------------------------
+    @staticmethod
+    def table_totals(points: Iterable[Dict], section: str, field: str) -> Dict:
+        totals: Dict = {}
+        for point in points:
+            for table, values in (point.get(section) or {}).items():
+                if field in values:
+                    totals[table] = totals.get(table, 0) + values[field]
+        return totals
+
+    @staticmethod
+    def select_tables(
+        totals: Dict,
+        tables: Optional[Iterable[str]] = None,
+        top: Optional[int] = None,
+    ) -> List[str]:
+        """Tablas filtradas y, si hay top, las N de mayor total en la ventana."""
+        wanted = set(tables) if tables else None
+        selected = [t for t in totals if wanted is None or t in wanted]
+        selected.sort(key=lambda t: totals[t], reverse=True)
+        return selected[:top] if top else selected
+
+    @staticmethod
+    def timeseries(
+        points: Iterable[Dict],
+        section: str,
+        field: str,
+        width: int,
+        tables: List[str],
+        group_by: str = "table",
+    ) -> Dict[str, List[List]]:
+        """
+        {serie: [[valor, ts_ms], ...]} sumando los deltas de cada bucket.
+        group_by="table": una serie por tabla; "total": una sola serie.
+        """
+        wanted = set(tables)
+        buckets: Dict[str, Dict[int, float]] = {}
+        for point in points:
+            bucket = int(point["ts"] // width * width)
+            for table, values in (point.get(section) or {}).items():
+                if table not in wanted or field not in values:
+                    continue
+                name = table if group_by == "table" else "total"
+                series = buckets.setdefault(name, {})
+                series[bucket] = series.get(bucket, 0) + values[field]
+
+        order = tables if group_by == "table" else ["total"]
+        return {
+            name: [[value, ts * 1000] for ts, value in sorted(buckets[name].items())]
+            for name in order
+            if name in buckets
+        }
+
+    # -------------------------------------------------------------
+    # 🧾 Tablas
+    # -------------------------------------------------------------
+    @staticmethod
+    def totals_table(totals: Dict, tables: List[str], field: str) -> Dict:
+        return {
+            "type": "table",
+            "columns": [{"text": "table", "type": "string"}, {"text": field, "type": "number"}],
+            "rows": [[table, totals[table]] for table in tables],
+        }
+
+    @staticmethod
+    def statements_table(
+        statements: List[Dict],
+        tables: Optional[Iterable[str]] = None,
+        top: Optional[int] = None,
+        sort_by: str = "cpu_time_total",
+    ) -> Dict:
+        columns = GrafanaDomain.STATEMENT_COLUMNS
+        if (sort_by, "number") not in columns:
+            raise ValueError(f"no se puede ordenar por: {sort_by}")
+
+        wanted = set(tables) if tables else None
+        rows = [s for s in statements if wanted is None or s.get("table") in wanted]
+        if sort_by != "rank":
+            rows.sort(key=lambda s: s.get(sort_by) or 0, reverse=True)
+        if top:
+            rows = rows[:top]
+        return {
+            "type": "table",
+            "columns": [{"text": name, "type": kind} for name, kind in columns],
+            "rows": [[row.get(name) for name, _ in columns] for row in rows],
+        }
+
+    # -------------------------------------------------------------
+    # 📌 Anotaciones
+    # -------------------------------------------------------------
+    @staticmethod
+    def new_table_annotations(points: Iterable[Dict], target: str, tables: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Una anotación por ciclo en que aparecieron tablas nuevas."""
+        wanted = set(tables) if tables else None
+        result = []
+        for point in points:
+            new = [t for t in point.get("new", ()) if wanted is None or t in wanted]
+            if not new:
+                continue
+            result.append({
+                "time": int(point["ts"] * 1000),
+                "title": f"Tablas nuevas en {target}",
+                "text": ", ".join(new),
+                "tags": [target, "new_table"],
+            })
+        return result
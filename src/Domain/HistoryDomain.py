@@ -0,0 +1,95 @@
+from typing import Dict, Iterable, List, Optional
+
+
+class HistoryDomain:
+    """
+    Puntos del historial de deltas por tabla y su agregación en niveles
+    (5 minutos, 1 hora). Un punto es:
+        {"ts": epoch, "snapshot": iso, "points": n, "new": [tablas nuevas],
+         "heavy": {tabla: {campo: delta}}, "frequent": {tabla: {campo: delta}}}
+    """
+
+    SECTIONS = ("heavy", "frequent")
+    # el delta de la lista de queries de frequent siempre es 0: no se guarda
+    IGNORED_FIELDS = ("queries",)
+
+    @staticmethod
+    def build_point(ts: float, snapshot: str, heavy_deltas: Dict, freq_deltas: Dict) -> Dict:
+        """
+        A partir de los deltas de calculate_deltas: quita el sufijo _delta y
+        descarta is_new_table y los campos sin valor numérico real.
+        Las tablas nuevas solo quedan en "new": su *_delta es el acumulado
+        completo, no lo ocurrido en el ciclo, y no se suma al historial.
+        """
+        return {
+            "ts": ts,
+            "snapshot": snapshot,
+            "points": 1,
+            "new": sorted({
+                str(table)
+                for deltas in (heavy_deltas, freq_deltas)
+                for table, values in deltas.items()
+                if values.get("is_new_table")
+            }),
+            "heavy": HistoryDomain._strip(heavy_deltas),
+            "frequent": HistoryDomain._strip(freq_deltas),
+        }
+
+    @staticmethod
+    def _strip(deltas: Dict) -> Dict:
+        result = {}
+        for table, values in deltas.items():
+            if values.get("is_new_table"):
+                continue
+            row = {}
+            for key, value in values.items():
+                if not key.endswith("_delta") or isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                field = key[:-len("_delta")]
+                if field not in HistoryDomain.IGNORED_FIELDS:
+                    row[field] = value
+            result[table] = row
+        return result
+
+    @staticmethod
+    def bucket_start(ts: float, width: int) -> int:
+        return int(ts // width * width)
+
+    @staticmethod
+    def rollup(points: Iterable[Dict], ts: int) -> Optional[Dict]:
+        """
+        Suma los deltas de varios puntos (crudos o ya agregados) en uno solo
+        con marca de tiempo ts. "points" acumula cuántos ciclos representa.
+        """
+        result = {"ts": ts, "snapshot": None, "points": 0, "new": [], "heavy": {}, "frequent": {}}
+        new_tables = set()
+        for point in points:
+            result["points"] += point.get("points", 1)
+            new_tables.update(point.get("new", ()))
+            # el snapshot del agregado es el del último ciclo incluido
+            result["snapshot"] = point.get("snapshot")
+            for section in HistoryDomain.SECTIONS:
+                totals = result[section]
+                for table, values in (point.get(section) or {}).items():
+                    row = totals.setdefault(table, {})
+                    for key, value in values.items():
+                        row[key] = row.get(key, 0) + value
+        result["new"] = sorted(new_tables)
+        return result if result["points"] else None
+
+    @staticmethod
+    def filter_tables(points: List[Dict], tables: Optional[Iterable[str]]) -> List[Dict]:
+        """Deja en cada punto solo las tablas pedidas (None = todas)."""
+        if not tables:
+            return points
+        wanted = set(tables)
+        return [
+            {
+                **point,
+                **{
+                    section: {t: v for t, v in (point.get(section) or {}).items() if t in wanted}
+                    for section in HistoryDomain.SECTIONS
+                },
+            }
+            for point in points
+        ]
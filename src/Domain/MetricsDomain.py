@@ -1,4 +1,5 @@
-from typing import List, Dict, Callable
+import hashlib
+from typing import List, Dict, Callable, Optional
 
 
 class MetricsDomain:
@@ -11,22 +12,35 @@ class MetricsDomain:
         queries: List[Dict],
         snapshot: str,
         main_table_func: Callable[[str], str],
+        analyze_func: Optional[Callable[[Dict], Dict]] = None,
     ) -> List[Dict]:
         """
         Enriquecer cada query con:
         - tabla principal detectada
         - snapshot timestamp
         - query normalizada
+        Si se pasa analyze_func (análisis cacheado por huella de la sentencia)
+        se usa en lugar de normalizar y parsear el texto de nuevo.
+        Las filas se anotan en el lugar (sin copiarlas).
         """
         normalized = []
 
         for q in queries:
-            q = q.copy()
-            text = q.get("query_text", "") or ""
-            clean = " ".join(text.split()).lower()
 
-            q["query_normalized"] = clean
-            q["main_table"] = main_table_func(clean)
+            if analyze_func:
+                analysis = analyze_func(q)
+                q["query_normalized"] = analysis["query_normalized"]
+                q["main_table"] = analysis["main_table"]
+                q["query_type"] = analysis["query_type"]
+                q["tables"] = analysis["tables"]
+                # los análisis restaurados de un checkpoint anterior no la traen
+                q["query_fingerprint"] = analysis.get("query_fingerprint")
+            else:
+                text = q.get("query_text", "") or ""
+                clean = " ".join(text.split()).lower()
+                q["query_normalized"] = clean
+                q["main_table"] = main_table_func(text)
+
             q["snapshot"] = snapshot
 
             normalized.append(q)
@@ -127,11 +141,15 @@ class MetricsDomain:
     # 🧱 Construcción final de snapshot
     # -------------------------------------------------------------
     @staticmethod
-    def build_snapshot(heavy: Dict, frequent: Dict, snapshot: str) -> Dict:
+    def build_snapshot(heavy: Dict, frequent: Dict, snapshot: str, watermark: Optional[str] = None) -> Dict:
+        """
+        watermark: mayor last_completion_time leído del plan cache (modo incremental).
+        """
         return {
             "snapshot": snapshot,
             "heavy": heavy,
-            "frequent": frequent
+            "frequent": frequent,
+            "watermark": watermark
         }
     @staticmethod
     def _normalize_number(value):
@@ -153,40 +171,69 @@ class MetricsDomain:
         return 0
     
     @staticmethod
-    def generate_texplain_top10(heavy_raw, table_resolver):
+    def generate_texplain_top10(heavy_raw, table_resolver, limit: Optional[int] = 10):
         """
         Construye un TOP 10 para tabla en Grafana.
         heavy_raw: lista de queries con métricas.
-        table_resolver: función para extraer nombre de tabla principal.
+        table_resolver: función para extraer nombre de tabla principal
+        (solo se usa si la fila no trae ya main_table).
+        limit: cuántas sentencias incluir (None = todas las de heavy_raw).
         """
-        top10 = heavy_raw[:10]  # ya viene ordenado por total_worker_time DESC
+        top10 = heavy_raw[:limit]  # ya viene ordenado por total_worker_time DESC
 
         result = []
 
         for idx, row in enumerate(top10, start=1):
-            table = table_resolver(row["query_text"])
-            safe_query = row["query_text"].replace('"', '\\"').replace("\n", " ")
+            table = row.get("main_table") or table_resolver(row["query_text"])
+            # el escapado de comillas y barras lo hace el writer de exposición
+            safe_query = row["query_text"].replace("\n", " ")
 
             result.append({
                 "rank": idx,
                 "table": table,
+                "fingerprint": MetricsDomain.statement_fingerprint(row),
                 "cpu_time_total": row["cpu_time_total"],
                 "duration_total": row["duration_total"],
                 "logical_reads_total": row["logical_reads_total"],
                 "logical_writes_total": row["logical_writes_total"],
                 "physical_reads_total": row["physical_reads_total"],
                 "plan_reuse_count": row["plan_reuse_count"],
+                # planes juntados por query_hash (1 si la lectura no agrupa)
+                "plan_count": row.get("plan_count", 1),
+                "execution_count": row.get("execution_count", 0),
                 "query_text": safe_query  # <-- agregado
             })
 
         return result
+    # -------------------------------------------------------------
+    # 🔖 Huella corta de una sentencia (valor de etiqueta estable)
+    # -------------------------------------------------------------
     @staticmethod
-    def generate_texplain_users(current_users_raw):
+    def statement_fingerprint(row: Dict) -> str:
+        """
+        query_hash de SQL Server si viene (misma plantilla = misma huella,
+        sin importar literales ni planes); si no, la huella sin literales del
+        análisis (QueryDomain.analyze) y, si la fila no se analizó, 16 hex del
+        SHA1 del texto normalizado. Se usa como etiqueta en lugar del texto completo.
+        """
+        query_hash = row.get("query_hash")
+        if query_hash:
+            return str(query_hash).lower()
+        if row.get("query_fingerprint"):
+            return row["query_fingerprint"]
+        text = row.get("query_normalized") or " ".join((row.get("query_text") or "").split()).lower()
+        return "t" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def generate_texplain_users(current_users_raw, top: Optional[int] = None):
         """
         Construye un 'texplain' para usuarios conectados.
         current_users_raw: resultado de getCurrentUsers()
+        top: cuántas combinaciones host/IP/programa se exponen por separado
+        (por requests en curso); el resto se suma en una sola fila "other".
         """
-        top_users = current_users_raw
+        users = sorted(current_users_raw, key=lambda row: row["requests_running_now"] or 0, reverse=True)
+        top_users = users[:top] if top else users
 
         result = []
         for idx, row in enumerate(top_users, start=1):
@@ -198,4 +245,14 @@ class MetricsDomain:
                 "requests_running_now": row["requests_running_now"]
             })
 
+        rest = users[len(top_users):]
+        if rest:
+            result.append({
+                "rank": len(top_users) + 1,
+                "host_name": "other",
+                "client_net_address": "other",
+                "program_name": "other",
+                "requests_running_now": sum(row["requests_running_now"] or 0 for row in rest),
+            })
+
         return result
\ No newline at end of file
@@ -0,0 +1,83 @@
+import heapq
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+
+class PlanCacheDomain:
+
+    # -------------------------------------------------------------
+    # 🔑 Identidad de una fila de sys.dm_exec_query_stats
+    # -------------------------------------------------------------
+    @staticmethod
+    def entry_key(row: Dict) -> str:
+        """
+        Una fila del plan cache es única por plan_handle + offsets de la sentencia.
+        Las filas agrupadas en el servidor (traen plan_count) son únicas por
+        query_hash: el plan representante puede cambiar de un ciclo a otro.
+        """
+        if "plan_count" in row:
+            return f"hash:{row.get('query_hash')}"
+        return (
+            f"{row.get('plan_handle') or row.get('sql_handle')}:"
+            f"{row.get('statement_start_offset', 0)}:{row.get('statement_end_offset', -1)}"
+        )
+
+    # -------------------------------------------------------------
+    # 🔀 Mezcla de filas incrementales sobre el estado local
+    # -------------------------------------------------------------
+    @staticmethod
+    def merge(entries: Dict[str, Dict], rows: List[Dict], watermark: Optional[datetime]) -> Optional[datetime]:
+        """
+        Reemplaza en `entries` cada sentencia recibida (los totales del DMV son
+        acumulados, así que la fila más reciente es la correcta).
+        Devuelve el nuevo watermark: el mayor last_completion_time visto (fin
+        de la última ejecución; el inicio dejaría afuera a las sentencias que
+        empezaron antes del watermark y terminaron después). Las filas sin esa
+        columna usan last_execution_time.
+        """
+        for row in rows:
+            entries[PlanCacheDomain.entry_key(row)] = row
+
+            completed = row.get("last_completion_time") or row.get("last_execution_time")
+            if isinstance(completed, datetime) and (watermark is None or completed > watermark):
+                watermark = completed
+
+        return watermark
+
+    # -------------------------------------------------------------
+    # 🏆 Vistas TOP N equivalentes a las consultas originales
+    # -------------------------------------------------------------
+    @staticmethod
+    def top_heavy(entries: Iterable[Dict], limit: int = 50) -> List[Dict]:
+        """Equivalente a getHeaviesQuerys(): TOP N por total_worker_time."""
+        return heapq.nlargest(limit, entries, key=lambda r: r.get("cpu_time_total") or 0)
+
+    @staticmethod
+    def top_frequent(entries: Iterable[Dict], db_name: str, limit: int = 50) -> List[Dict]:
+        """
+        Equivalente a getMostRequestedQuery(): solo la base indicada,
+        sin sentencias internas, TOP N por total_worker_time.
+        """
+        candidates = (
+            r for r in entries
+            if r.get("database_name") == db_name and not r.get("is_internal")
+        )
+        return heapq.nlargest(limit, candidates, key=lambda r: r.get("cpu_time_total") or 0)
+
+    # -------------------------------------------------------------
+    # 🗂️ Vista frequent por base (varias bases de una misma instancia)
+    # -------------------------------------------------------------
+    @staticmethod
+    def by_database(rows: Iterable[Dict], db_names: Sequence[str]) -> Dict[str, List[Dict]]:
+        """
+        Reparte las filas frequent de una lectura de la instancia entre las
+        bases monitoreadas, por database_name (sin distinguir mayúsculas, como
+        la comparación de SQL Server). Conserva el orden de las filas.
+        """
+        result = {name: [] for name in db_names}
+        lookup = {name.lower(): result[name] for name in db_names if name}
+        for row in rows:
+            target_rows = lookup.get((row.get("database_name") or "").lower())
+            if target_rows is not None:
+                target_rows.append(row)
+        return result
@@ -1,157 +1,458 @@
+import hashlib
 import re
-from typing import Optional
+import time
+from itertools import compress
+from typing import Dict, List, Optional, Tuple
 from src.Const.tables import TABLES
+from src.Utils.Instrumentation import instruments
 
 
+# Índice de tablas conocidas construido una sola vez al importar el módulo.
+# Todos los nombres de TABLES son identificadores \w+: basta con recorrer las
+# palabras del SQL una vez y quedarse con la de menor posición en TABLES.
+_TABLES_ORDER = {}
+for _idx, _name in enumerate(TABLES):
+    _TABLES_ORDER.setdefault(_name.lower(), (_idx, _name))
+
+# Un solo patrón para todo el léxico de T-SQL: findall recorre el texto una vez
+# en C y devuelve los tokens crudos (los espacios no coinciden con ninguna
+# alternativa y se saltan solos). Por el primer carácter se distingue cada tipo:
+# palabra, [identificador] / "identificador", 'cadena' / N'cadena', número,
+# comentario o puntuación. Las alternativas van de la más frecuente a la menos.
+_TOKEN_PATTERN = re.compile(
+    r"(?!n')[^\W\d][\w@#$]*|[@#][\w@#$]*"
+    r"|[(),=*;<>+%&|^~{}:]"
+    r"|--[^\n]*|/\*[\s\S]*?(?:\*/|\Z)"
+    r"|n?'[^']*(?:''[^']*)*(?:'|\Z)"
+    r"|\[[^\]]*(?:\]\][^\]]*)*(?:\]|\Z)|\"[^\"]*(?:\"\"[^\"]*)*(?:\"|\Z)"
+    r"|0x[0-9a-f]*|(?:\d+(?:\.\d*)?|\.\d+)(?:e[+-]?\d+)?"
+    r"|[^\s\w]"
+)
+# Primer carácter de un literal (las cadenas N'...' y los números .5 se revisan aparte)
+_LITERAL_START = frozenset("'0123456789")
+
+# Palabras que nunca son nombre de tabla ni alias
+_RESERVED = frozenset((
+    "select", "from", "where", "join", "inner", "left", "right", "full", "outer", "cross",
+    "apply", "on", "group", "order", "by", "having", "union", "all", "except", "intersect",
+    "option", "with", "set", "values", "into", "output", "pivot", "unpivot", "for", "when",
+    "then", "else", "end", "and", "or", "not", "as", "top", "distinct", "update", "delete",
+    "insert", "merge", "using", "exec", "execute", "declare", "begin", "return", "if",
+    "while", "tablesample", "matched", "default", "table", "offset", "fetch", "case", "is",
+    "null", "in", "exists", "like", "between", "create", "alter", "drop", "truncate", "go",
+))
+# Hints que pueden ir entre paréntesis tras la tabla sin WITH: "FROM t (NOLOCK)"
+_TABLE_HINTS = frozenset((
+    "nolock", "readuncommitted", "readcommitted", "readpast", "repeatableread", "serializable",
+    "updlock", "xlock", "rowlock", "paglock", "tablock", "tablockx", "holdlock", "nowait",
+    "index", "forceseek", "forcescan", "noexpand",
+))
+_QUERY_TYPES = {
+    "select": "SELECT",
+    "update": "UPDATE",
+    "insert": "INSERT",
+    "delete": "DELETE",
+    "merge": "MERGE",
+    "create": "DDL",
+    "alter": "DDL",
+    "drop": "DDL",
+}
+# Palabras tras las que viene una referencia a tabla. Tras las de FROM un
+# nombre seguido de "(" es una función (FROM fn(...)); tras las de destino es
+# la lista de columnas (INSERT INTO t (...), CREATE TABLE t (...))
+_FROM_CONTEXTS = frozenset(("from", "join", "apply", "using"))
+_TARGET_CONTEXTS = frozenset(("update", "delete", "insert", "into", "merge", "table"))
+_DDL_WORDS = frozenset(("create", "alter", "drop", "truncate"))
+# Sentencias cuya tabla principal es su destino y no la del FROM
+_TARGET_KEYWORDS = frozenset(("update", "delete", "insert", "merge")) | _DDL_WORDS
+# Lo único que mira el recorrido de referencias (valores no nulos: compress
+# filtra en C y el bucle en Python solo ve paréntesis y palabras clave)
+_OPEN, _CLOSE, _FROM, _TARGET = range(1, 5)
+_ACTIONS = {"(": _OPEN, ")": _CLOSE}
+_ACTIONS.update(dict.fromkeys(_FROM_CONTEXTS, _FROM))
+_ACTIONS.update(dict.fromkeys(_TARGET_CONTEXTS, _TARGET))
+
+# Series de instrumentación resueltas una vez: el análisis corre por sentencia
+_PARSE_SECONDS = instruments.histogram("exporter_parse_seconds")
+_PARSE_PATHS = {
+    path: instruments.counter("exporter_parse_path_total", path=path)
+    for path in ("pattern", "tables_fallback", "unknown", "empty")
+}
+
 
 class QueryDomain:
+    """
+    Análisis de sentencias T-SQL con un lexer de una sola pasada: separa
+    comentarios (también anidados), literales e identificadores entre
+    corchetes o comillas, y sobre esos tokens resuelve en un solo recorrido
+    la tabla principal, el tipo de sentencia, todas las tablas referenciadas
+    y una huella sin literales.
+    """
+
+    @staticmethod
+    def analyze(sql: str) -> Dict:
+        """
+        {"main_table", "query_type", "tables", "query_fingerprint"} de una sentencia.
+        query_fingerprint: "t" + 16 hex del SHA1 de los tokens sin comentarios
+        ni literales (misma plantilla con otros valores = misma huella).
+        """
+        return QueryDomain._timed(sql, True)
 
     @staticmethod
     def getMainTable(sql: str) -> str:
         """
         Extrae la tabla principal de una consulta SQL de manera robusta.
         Maneja diferentes tipos de consultas y escenarios complejos.
+        Sin huella ni lista de tablas, y en un SELECT el recorrido se corta en
+        la primera tabla del FROM de nivel superior.
+        """
+        return QueryDomain._timed(sql, False)["main_table"]
+
+    @staticmethod
+    def get_query_type(sql: str) -> str:
+        """Determina el tipo de consulta"""
+        return QueryDomain.analyze(sql)["query_type"]
+
+    @staticmethod
+    def extract_all_tables(sql: str) -> list:
+        """Extrae todas las tablas mencionadas en la consulta"""
+        return QueryDomain.analyze(sql)["tables"]
+
+    @staticmethod
+    def _timed(sql: str, full: bool) -> Dict:
+        started = time.perf_counter()
+        analysis, path = QueryDomain._analyze(sql, full)
+        _PARSE_SECONDS.observe(time.perf_counter() - started)
+        _PARSE_PATHS[path].inc()
+        return analysis
+
+    # -------------------------------------------------------------
+    # 🔤 Lexer
+    # -------------------------------------------------------------
+    @staticmethod
+    def tokenize(sql: str) -> List[str]:
+        """
+        Tokens crudos en minúsculas, sin comentarios. Los literales y los
+        identificadores delimitados conservan sus comillas o corchetes, así
+        "[from]" o 'from' nunca se confunden con la palabra clave.
         """
-        if not sql or not sql.strip():
-            return "unknown"
-        
         sql = sql.lower()
-        # Limpiar y normalizar el SQL
-        clean_sql = QueryDomain._normalize_sql(sql)
-        
-        # Intentar diferentes patrones en orden de prioridad
-        table = (
-            QueryDomain._extract_from_update(clean_sql) or
-            QueryDomain._extract_from_delete(clean_sql) or
-            QueryDomain._extract_from_insert(clean_sql) or
-            QueryDomain._extract_from_select(clean_sql) or
-            QueryDomain._extract_from_join(clean_sql) or
-            None
-        )
-        
-        # Si no se encontró nada, buscar la primera concordancia con TABLES
-        if not table:
-            for t in TABLES:
-                pattern = r'\b' + re.escape(t.lower()) + r'\b'
-                if re.search(pattern, clean_sql):
-                    table = t
+        tokens = _TOKEN_PATTERN.findall(sql)
+        if "--" not in sql and "/*" not in sql:
+            return tokens
+        kept = []
+        for token in tokens:
+            prefix = token[:2]
+            if prefix == "/*":
+                if token.find("/*", 2) >= 0:
+                    # comentario anidado: el patrón cortó en el primer */
+                    return QueryDomain._tokenize_nested(sql)
+            elif prefix != "--":
+                kept.append(token)
+        return kept
+
+    @staticmethod
+    def _tokenize_nested(sql: str) -> List[str]:
+        """Camino lento para /* ... /* ... */ ... */: cada comentario se salta entero."""
+        tokens = []
+        pos = 0
+        while True:
+            for match in _TOKEN_PATTERN.finditer(sql, pos):
+                token = match.group()
+                if token[:2] == "/*":
+                    pos = QueryDomain._block_comment_end(sql, match.start() + 2)
                     break
-        
-        if not table:
-            print('aqui en la execion')
-            print(sql)
-            table = "unknown"
-        
-        return QueryDomain._clean_table_name(table)
-
-
-    @staticmethod
-    def _normalize_sql(sql: str) -> str:
-        """Normaliza el SQL para hacer el parsing más fácil"""
-        # Reemplazar múltiples espacios y newlines con un solo espacio
-        sql = re.sub(r'\s+', ' ', sql)
-        # Remover comentarios
-        sql = re.sub(r'--.*?$', '', sql, flags=re.MULTILINE)
-        sql = re.sub(r'/\*.*?\*/', '', sql, flags=re.DOTALL)
-        sql = sql.replace('[', '').replace(']', '').replace('dbo','').replace('.',' ')
-        return sql.strip()
-
-    @staticmethod
-    def _extract_from_select(sql: str) -> Optional[str]:
-        """Extrae tabla de consultas SELECT"""
-        # Patrón para SELECT ... FROM table
-        patterns = [
-            r'\bFROM\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?(?:\s+AS\s+\w+)?)(?:\s|$)',  # FROM table
-            r'\bJOIN\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)(?:\s|$)',  # JOIN table
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, sql, re.IGNORECASE)
-            if match:
-                return match.group(1)
+                if token[:2] != "--":
+                    tokens.append(token)
+            else:
+                return tokens
+
+    @staticmethod
+    def _block_comment_end(sql: str, pos: int) -> int:
+        """Posición tras el */ que cierra el comentario abierto antes de pos (admite anidados)."""
+        depth = 1
+        while depth:
+            close = sql.find("*/", pos)
+            if close < 0:
+                return len(sql)
+            opening = sql.find("/*", pos, close)
+            if opening >= 0:
+                depth += 1
+                pos = opening + 2
+            else:
+                depth -= 1
+                pos = close + 2
+        return pos
+
+    @staticmethod
+    def _name(token: str) -> Optional[str]:
+        """Nombre de tabla o alias del token (sin delimitadores), o None si no puede serlo."""
+        first = token[0]
+        if first == "[" or first == '"':
+            close = "]" if first == "[" else '"'
+            end = -1 if len(token) > 1 and token.endswith(close) else None
+            return token[1:end].replace(close * 2, close)
+        if (first.isalpha() or first in "_@#") and token not in _RESERVED and token[:2] != "n'":
+            return token
         return None
 
+    # -------------------------------------------------------------
+    # 🧭 Análisis sobre los tokens
+    # -------------------------------------------------------------
     @staticmethod
-    def _extract_from_update(sql: str) -> Optional[str]:
-        """Extrae tabla de consultas UPDATE"""
-        match = re.search(r'\bUPDATE\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)', sql, re.IGNORECASE)
-        return match.group(1) if match else None
+    def _analyze(sql: str, full: bool = True) -> Tuple[Dict, str]:
+        """
+        full=False (getMainTable): solo la tabla principal; "tables" queda
+        vacío y "query_fingerprint" en None.
+        """
+        tokens = QueryDomain.tokenize(sql or "")
+        fingerprint = QueryDomain.fingerprint(tokens) if full else None
+        if not tokens:
+            return QueryDomain._result("unknown", "UNKNOWN", [], fingerprint), "empty"
+
+        start = QueryDomain._statement_start(tokens)
+        ctes = QueryDomain._cte_names(tokens, start)
+        if ctes:
+            start = ctes.pop("")
+        keyword = tokens[start] if start < len(tokens) else ""
+        query_type = _QUERY_TYPES.get(keyword, "UNKNOWN")
+
+        # en un SELECT la primera tabla del FROM de nivel 0 ya es la principal
+        until = None if full or keyword in _TARGET_KEYWORDS else start
+        references, aliases = QueryDomain._references(tokens, until, ctes)
+        # el destino de UPDATE a ... FROM t a / DELETE a FROM t a es un alias
+        tables = sorted({
+            aliases.get(name, name) if context in _TARGET_CONTEXTS else name
+            for name, context, _, _ in references
+        } - set(ctes)) if full else []
+        table = QueryDomain._main_table(references, aliases, ctes, start, keyword)
+        path = "pattern"
+        if not table:
+            table = QueryDomain._match_known_table(filter(None, map(QueryDomain._name, tokens)))
+            path = "tables_fallback"
+        if not table:
+            table, path = "unknown", "unknown"
+        return QueryDomain._result(table, query_type, tables, fingerprint), path
 
     @staticmethod
-    def _extract_from_delete(sql: str) -> Optional[str]:
-        """Extrae tabla de consultas DELETE"""
-        match = re.search(r'\bDELETE\s+(?:\w+\s+)?FROM\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)', sql, re.IGNORECASE)
-        return match.group(1) if match else None
+    def fingerprint(tokens: List[str]) -> str:
+        """Huella de los tokens con cada literal (cadena, número) reemplazado por "?"."""
+        normalized = " ".join([
+            "?" if token[0] in _LITERAL_START or token[:2] == "n'" or (token[0] == "." and token != ".") else token
+            for token in tokens
+        ])
+        return "t" + hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
 
     @staticmethod
-    def _extract_from_insert(sql: str) -> Optional[str]:
-        """Extrae tabla de consultas INSERT"""
-        match = re.search(r'\bINSERT\s+(?:\w+\s+)?INTO\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)', sql, re.IGNORECASE)
-        return match.group(1) if match else None
+    def _result(table: str, query_type: str, tables: List[str], fingerprint: str) -> Dict:
+        return {"main_table": table, "query_type": query_type, "tables": tables, "query_fingerprint": fingerprint}
 
     @staticmethod
-    def _extract_from_join(sql: str) -> Optional[str]:
-        """Extrae la primera tabla en JOINs complejos"""
-        # Buscar el primer FROM que no sea subquery
-        from_match = re.search(r'\bFROM\s+([a-zA-Z0-9_#@]+)', sql, re.IGNORECASE)
-        return from_match.group(1) if from_match else None
+    def _statement_start(tokens: List[str]) -> int:
+        """
+        Índice de la palabra que abre la sentencia: se saltan los ";" y la
+        declaración de parámetros que SQL Server antepone a las sentencias
+        parametrizadas, "(@P0 int,@P1 nvarchar(20))SELECT ...".
+        """
+        i = 0
+        count = len(tokens)
+        while i < count and tokens[i] == ";":
+            i += 1
+        if i + 1 < count and tokens[i] == "(" and tokens[i + 1][0] == "@":
+            i = QueryDomain._skip_parens(tokens, i)
+        while i < count and (tokens[i] == "(" or tokens[i] == ";"):
+            i += 1
+        return i
 
     @staticmethod
-    def _clean_table_name(table_name: str) -> str:
-        """Limpia el nombre de tabla removiendo alias y espacios"""
-        if table_name == "unknown":
-            return table_name
-            
-        # Remover alias (AS alias)
-        table_name = re.sub(r'\s+AS\s+\w+$', '', table_name, flags=re.IGNORECASE)
-        # Remover espacios extras
-        table_name = table_name.strip()
-        # Remover comillas si existen
-        table_name = re.sub(r'^\[|\]$|^"|"$|^`|`$', '', table_name)
-        
-        return table_name.lower() if table_name else "unknown"
+    def _cte_names(tokens: List[str], start: int) -> Dict[str, int]:
+        """
+        Nombres de las CTE de "WITH a AS (...), b (cols) AS (...) SELECT ..."
+        (valor: su posición); la clave "" guarda dónde empieza la sentencia
+        principal. Vacío si la sentencia no empieza con WITH.
+        """
+        count = len(tokens)
+        if start >= count or tokens[start] != "with":
+            return {}
+        names = {}
+        i = start + 1
+        while i < count:
+            name = QueryDomain._name(tokens[i])
+            if name is None:
+                return {}
+            names[name] = i
+            i += 1
+            if i < count and tokens[i] == "(":
+                i = QueryDomain._skip_parens(tokens, i)
+            if i + 1 >= count or tokens[i] != "as" or tokens[i + 1] != "(":
+                return {}
+            i = QueryDomain._skip_parens(tokens, i + 1)
+            if i < count and tokens[i] == ",":
+                i += 1
+                continue
+            break
+        names[""] = i
+        return names
 
     @staticmethod
-    def get_query_type(sql: str) -> str:
-        """Determina el tipo de consulta"""
-        clean_sql = QueryDomain._normalize_sql(sql)
-        
-        if re.search(r'^\s*SELECT', clean_sql, re.IGNORECASE):
-            return "SELECT"
-        elif re.search(r'^\s*UPDATE', clean_sql, re.IGNORECASE):
-            return "UPDATE"
-        elif re.search(r'^\s*INSERT', clean_sql, re.IGNORECASE):
-            return "INSERT"
-        elif re.search(r'^\s*DELETE', clean_sql, re.IGNORECASE):
-            return "DELETE"
-        elif re.search(r'^\s*CREATE', clean_sql, re.IGNORECASE):
-            return "DDL"
-        elif re.search(r'^\s*ALTER', clean_sql, re.IGNORECASE):
-            return "DDL"
-        elif re.search(r'^\s*DROP', clean_sql, re.IGNORECASE):
-            return "DDL"
-        else:
-            return "UNKNOWN"
+    def _skip_parens(tokens: List[str], i: int) -> int:
+        """Índice tras el ")" que cierra el "(" de la posición i."""
+        depth = 0
+        count = len(tokens)
+        while i < count:
+            token = tokens[i]
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            i += 1
+        return count
 
     @staticmethod
-    def extract_all_tables(sql: str) -> list:
-        """Extrae todas las tablas mencionadas en la consulta"""
-        clean_sql = QueryDomain._normalize_sql(sql)
-        tables = set()
-        
-        # Patrones para encontrar tablas
-        patterns = [
-            r'\bFROM\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)',
-            r'\bJOIN\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)',
-            r'\bUPDATE\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)',
-            r'\bINSERT\s+(?:\w+\s+)?INTO\s+([a-zA-Z0-9_#@]+(?:\.[a-zA-Z0-9_#@]+)?)',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, clean_sql, re.IGNORECASE)
-            for match in matches:
-                clean_table = QueryDomain._clean_table_name(match)
-                if clean_table and clean_table != "unknown":
-                    tables.add(clean_table)
-        
-        return sorted(list(tables))
\ No newline at end of file
+    def _references(
+        tokens: List[str], until: Optional[int] = None, ctes: Dict[str, int] = None
+    ) -> Tuple[List[tuple], Dict[str, str]]:
+        """
+        Un recorrido por los tokens: cada referencia a tabla como
+        (nombre, contexto, profundidad de paréntesis, posición de la palabra
+        clave) y los alias declarados en FROM/JOIN (alias -> tabla).
+        Con until, termina en la primera referencia de FROM/JOIN sin
+        paréntesis abiertos, desde esa posición y que no sea una CTE: con
+        paréntesis balanceados ninguna otra puede ganarle en _main_table.
+        """
+        references = []
+        aliases: Dict[str, str] = {}
+        count = len(tokens)
+        depth = 0
+        for i in compress(range(count), map(_ACTIONS.get, tokens)):
+            token = tokens[i]
+            action = _ACTIONS[token]
+            if action == _OPEN:
+                depth += 1
+            elif action == _CLOSE:
+                depth -= 1
+            elif action == _FROM:
+                j = i + 1
+                while True:
+                    name, j = QueryDomain._read_name(tokens, j)
+                    if name is None:
+                        break
+                    if j < count and tokens[j] == "(" and not QueryDomain._is_hint(tokens, j):
+                        break  # función con valores de tabla: FROM fn(...)
+                    references.append((name, token, depth, i))
+                    if until is not None and depth == 0 and i >= until and name not in ctes:
+                        return references, aliases
+                    j = QueryDomain._read_alias(tokens, j, name, aliases)
+                    if token != "from" or j >= count or tokens[j] != ",":
+                        break
+                    j += 1  # FROM a, b
+            else:
+                if token == "table" and (i == 0 or tokens[i - 1] not in _DDL_WORDS):
+                    continue  # DECLARE @t TABLE (...), RETURNS TABLE
+                name, _ = QueryDomain._read_name(tokens, QueryDomain._skip_target_prefix(tokens, i + 1, token))
+                if name is not None:
+                    references.append((name, token, depth, i))
+        return references, aliases
+
+    @staticmethod
+    def _skip_target_prefix(tokens: List[str], j: int, keyword: str) -> int:
+        """Salta TOP (n) [PERCENT], el INTO/FROM opcional y el IF EXISTS de DROP TABLE."""
+        count = len(tokens)
+        if j < count and tokens[j] == "top":
+            j += 1
+            if j < count and tokens[j] == "(":
+                j = QueryDomain._skip_parens(tokens, j)
+            elif j < count:
+                j += 1
+            if j < count and tokens[j] == "percent":
+                j += 1
+        if j < count:
+            if (keyword == "insert" or keyword == "merge") and tokens[j] == "into":
+                j += 1
+            elif keyword == "delete" and tokens[j] == "from":
+                j += 1
+            elif keyword == "table" and tokens[j] == "if" and j + 1 < count and tokens[j + 1] == "exists":
+                j += 2
+        return j
+
+    @staticmethod
+    def _read_name(tokens: List[str], j: int) -> Tuple[Optional[str], int]:
+        """Nombre de varias partes (servidor.base.esquema.tabla, base..tabla): devuelve la última."""
+        name = None
+        count = len(tokens)
+        while j < count:
+            part = QueryDomain._name(tokens[j])
+            if part is not None:
+                name = part
+                j += 1
+            if j < count and tokens[j] == ".":
+                while j < count and tokens[j] == ".":
+                    j += 1
+                continue
+            break
+        return name, j
+
+    @staticmethod
+    def _read_alias(tokens: List[str], j: int, table: str, aliases: Dict[str, str]) -> int:
+        """Salta [AS] alias y los hints (WITH (NOLOCK) o (NOLOCK)) tras una tabla."""
+        count = len(tokens)
+        if j < count and tokens[j] == "as":
+            j += 1
+        alias = QueryDomain._name(tokens[j]) if j < count else None
+        if alias is not None:
+            aliases[alias] = table
+            j += 1
+        if j + 1 < count and tokens[j] == "with" and tokens[j + 1] == "(":
+            j = QueryDomain._skip_parens(tokens, j + 1)
+        elif j < count and tokens[j] == "(" and QueryDomain._is_hint(tokens, j):
+            j = QueryDomain._skip_parens(tokens, j)
+        return j
+
+    @staticmethod
+    def _is_hint(tokens: List[str], j: int) -> bool:
+        return j + 1 < len(tokens) and tokens[j + 1] in _TABLE_HINTS
+
+    @staticmethod
+    def _main_table(
+        references: List[tuple], aliases: Dict[str, str], ctes: Dict[str, int], start: int, keyword: str
+    ) -> Optional[str]:
+        """
+        - UPDATE / DELETE / INSERT / MERGE / DDL: el destino de la sentencia
+          (si es un alias, la tabla del FROM a la que apunta).
+        - SELECT y el resto: la primera tabla del FROM/JOIN menos anidado de
+          la sentencia que no sea una CTE; si no hay (solo CTE o tablas
+          derivadas), la primera tabla real del texto.
+        """
+        if keyword in _TARGET_KEYWORDS:
+            for name, context, _, position in references:
+                if position >= start and context in _TARGET_CONTEXTS:
+                    table = aliases.get(name, name)
+                    if table not in ctes:
+                        return table
+                    break
+
+        real = [reference for reference in references if reference[0] not in ctes]
+        if not real:
+            return None
+        sources = [reference for reference in real if reference[3] >= start and reference[1] in _FROM_CONTEXTS]
+        if sources:
+            top_level = min(depth for _, _, depth, _ in sources)
+            return next(name for name, _, depth, _ in sources if depth == top_level)
+        return real[0][0]
+
+    @staticmethod
+    def _match_known_table(words) -> Optional[str]:
+        """
+        Devuelve la tabla de TABLES que aparece entre las palabras del SQL,
+        respetando el orden de TABLES (gana la primera de la lista).
+        """
+        best = None
+        for word in words:
+            found = _TABLES_ORDER.get(word)
+            if found is not None and (best is None or found[0] < best[0]):
+                best = found
+                if best[0] == 0:
+                    break
+        return best[1] if best else None
@@ -0,0 +1,99 @@
+import random
+from typing import Callable, Dict, Optional, Tuple
+
+
+class ScheduleDomain:
+    """
+    Decisiones del planificador adaptativo: cada cuánto recolectar un target
+    según lo que costó el último ciclo y la carga que reporta el servidor.
+    """
+
+    # -------------------------------------------------------------
+    # ⚙️ Política por defecto
+    # -------------------------------------------------------------
+    @staticmethod
+    def default_policy(**overrides) -> Dict:
+        """
+        interval / min_interval / max_interval: segundos entre ciclos.
+        cost_high / cost_low: duración del ciclo como fracción del intervalo.
+        load_high / load_low: consultas ejecutándose en el servidor.
+        overlap: "SKIP" (se descarta el turno) o "COALESCE" (los turnos perdidos
+        se juntan en una sola corrida apenas termina la anterior).
+        """
+        policy = {
+            "interval": 60.0,
+            "min_interval": 30.0,
+            "max_interval": 300.0,
+            "backoff_factor": 2.0,
+            "tighten_factor": 0.75,
+            "cost_high": 0.25,
+            "cost_low": 0.05,
+            "load_high": 64,
+            "load_low": 4,
+            "jitter": 0.1,
+            "overlap": "SKIP",
+        }
+        policy.update({key: value for key, value in overrides.items() if value is not None})
+        return policy
+
+    # -------------------------------------------------------------
+    # 📈 Intervalo siguiente
+    # -------------------------------------------------------------
+    @staticmethod
+    def next_interval(
+        interval: float,
+        duration: float,
+        load: Optional[float],
+        failed: bool,
+        policy: Dict,
+    ) -> Tuple[float, str]:
+        """
+        Devuelve (nuevo_intervalo, decisión). Decisiones:
+        - backoff_error / backoff_cost / backoff_load: se alarga el intervalo
+        - tighten: servidor ocioso y ciclo barato, se acorta
+        - recover: condiciones normales, vuelve un paso hacia el intervalo base
+        - hold: se mantiene
+        """
+        base = policy["interval"]
+        cost = duration / interval if interval > 0 else 0
+        # acortar solo si con el intervalo más corto el costo seguiría bajo
+        # cost_high; si no, backoff y recover se alternarían ciclo a ciclo
+        shorter_fits = duration / (interval * policy["tighten_factor"]) < policy["cost_high"]
+
+        if failed:
+            decision = "backoff_error"
+        elif cost >= policy["cost_high"]:
+            decision = "backoff_cost"
+        elif load is not None and load >= policy["load_high"]:
+            decision = "backoff_load"
+        elif cost <= policy["cost_low"] and load is not None and load <= policy["load_low"]:
+            decision = "tighten"
+        elif interval < base or (interval > base and shorter_fits):
+            decision = "recover"
+        else:
+            decision = "hold"
+
+        if decision.startswith("backoff"):
+            interval = interval * policy["backoff_factor"]
+        elif decision == "tighten":
+            interval = interval * policy["tighten_factor"]
+        elif decision == "recover":
+            # un paso hacia el base sin pasarse
+            if interval > base:
+                interval = max(base, interval * policy["tighten_factor"])
+            else:
+                interval = min(base, interval / policy["tighten_factor"])
+
+        interval = min(policy["max_interval"], max(policy["min_interval"], interval))
+        return interval, decision
+
+    # -------------------------------------------------------------
+    # 🎲 Jitter
+    # -------------------------------------------------------------
+    @staticmethod
+    def jitter(interval: float, fraction: float, rand: Callable[[], float] = random.random) -> float:
+        """
+        Desfase aleatorio en [0, fraction * intervalo) para que los targets (y
+        las réplicas) no consulten todos los servidores en el mismo segundo.
+        """
+        return interval * fraction * rand()
@@ -1,13 +1,203 @@
 from src.Utils.DatabaseConnection import DatabaseConnection
-from pyodbc import Connection
+from src.Utils.ConnectionPool import ConnectionPool
 from settings.AppSettings import TIMEZONE
+from src.Utils.CompactRow import CompactRow
+from src.Utils.Instrumentation import instruments
+from src.Const.dmv import CURRENT_QUERIES_SQL, CURRENT_USERS_SQL, MEMORY_SQL
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+import logging
 import pytz
+import time
 
+logger = logging.getLogger(__name__)
+
+# Filas pedidas al driver en cada fetchmany
+FETCH_BATCH_SIZE = 1000
+
+# Sentencias reutilizadas por las lecturas individuales y por el lote de recolección.
+# Contadores de cada entrada del plan cache (todo lo que no sale de dm_exec_sql_text).
+QUERY_COUNTER_COLUMNS = """
+                qs.execution_count,
+                qs.total_worker_time AS cpu_time_total,
+                qs.total_worker_time / qs.execution_count AS cpu_time_avg,
+                qs.total_elapsed_time AS duration_total,
+                qs.total_elapsed_time / qs.execution_count AS duration_avg,
+                qs.total_logical_reads AS logical_reads_total,
+                qs.total_logical_reads / qs.execution_count AS logical_reads_avg,
+                qs.total_logical_writes AS logical_writes_total,
+                qs.total_logical_writes / qs.execution_count AS logical_writes_avg,
+                qs.total_physical_reads AS physical_reads_total,
+                qs.total_physical_reads / qs.execution_count AS physical_reads_avg,
+                qs.plan_generation_num AS plan_reuse_count,
+                qs.creation_time,
+                qs.last_execution_time,
+                qs.last_completion_time,
+                CONVERT(VARCHAR(130), qs.query_hash, 1) AS query_hash,
+                CONVERT(VARCHAR(130), qs.sql_handle, 1) AS sql_handle,
+                CONVERT(VARCHAR(130), qs.plan_handle, 1) AS plan_handle,
+                qs.statement_start_offset,
+                qs.statement_end_offset"""
+
+# last_execution_time es el inicio de la última ejecución: una sentencia que
+# empezó antes del watermark y terminó después actualiza sus contadores sin
+# cumplir `last_execution_time >= watermark`. El watermark y el filtro
+# incremental usan el fin de la última ejecución (last_elapsed_time está en
+# microsegundos; DATEADD recibe int, por eso se suma en milisegundos).
+LAST_COMPLETION_TIME = "DATEADD(MILLISECOND, qs.last_elapsed_time / 1000, qs.last_execution_time)"
+
+# Columnas que salen del texto (sql_handle + offsets de `qs`, texto de `st`)
+QUERY_TEXT_COLUMNS = """
+                DB_NAME(st.dbid) AS database_name,
+                CASE
+                    WHEN st.text LIKE '%sys.%'
+                      OR st.text LIKE '%INTERNAL%'
+                      OR st.text LIKE '%dm_exec%' THEN 1
+                    ELSE 0
+                END AS is_internal,
+                SUBSTRING(
+                    st.text,
+                    (qs.statement_start_offset / 2) + 1,
+                    (
+                        (CASE qs.statement_end_offset
+                            WHEN -1 THEN DATALENGTH(st.text)
+                            ELSE qs.statement_end_offset
+                        END - qs.statement_start_offset
+                        ) / 2
+                    ) + 1
+                ) AS query_text"""
+
+# dm_exec_query_stats con el fin de la última ejecución como columna
+QUERY_STATS_SOURCE = f"""
+            FROM (
+                SELECT *, {LAST_COMPLETION_TIME} AS last_completion_time
+                FROM sys.dm_exec_query_stats qs
+            ) qs"""
+
+# Lectura del plan cache sin TOP: base de la lectura incremental y del ranking en lote.
+QUERY_STATS_SQL = f"""
+            SELECT{QUERY_COUNTER_COLUMNS},{QUERY_TEXT_COLUMNS}{QUERY_STATS_SOURCE}
+            CROSS APPLY sys.dm_exec_sql_text(qs.sql_handle) st
+        """
+
+# Los mismos contadores sin dm_exec_sql_text: el texto lo completa
+# StatementTextService solo para las sentencias que no tiene en cache.
+QUERY_COUNTERS_SQL = f"""
+            SELECT{QUERY_COUNTER_COLUMNS}{QUERY_STATS_SOURCE}
+        """
+
+# Nombre de cada conjunto de resultados del lote de recolección (etiqueta `query`)
+BATCH_SETS = ("plan_cache", "current_queries", "current_users", "memory")
+
+# Una fila por query_hash: los contadores se suman sobre todos los planes de la
+# sentencia (recompilaciones, planes por parámetros o por opciones SET) y el
+# texto se lee una sola vez, con el sql_handle y los offsets del plan de mayor
+# CPU como representante. plan_count dice cuántas entradas se juntaron.
+# Es una tabla derivada (sin CTE propia) para poder ir dentro de PLAN_CACHE_TOP_TEMPLATE.
+QUERY_STATS_BY_HASH_SOURCE = f"""
+            FROM (
+                SELECT
+                    qs.sql_handle,
+                    qs.plan_handle,
+                    qs.query_hash,
+                    qs.statement_start_offset,
+                    qs.statement_end_offset,
+                    SUM(qs.execution_count) OVER (PARTITION BY qs.query_hash) AS execution_count,
+                    SUM(qs.total_worker_time) OVER (PARTITION BY qs.query_hash) AS total_worker_time,
+                    SUM(qs.total_elapsed_time) OVER (PARTITION BY qs.query_hash) AS total_elapsed_time,
+                    SUM(qs.total_logical_reads) OVER (PARTITION BY qs.query_hash) AS total_logical_reads,
+                    SUM(qs.total_logical_writes) OVER (PARTITION BY qs.query_hash) AS total_logical_writes,
+                    SUM(qs.total_physical_reads) OVER (PARTITION BY qs.query_hash) AS total_physical_reads,
+                    MAX(qs.plan_generation_num) OVER (PARTITION BY qs.query_hash) AS plan_generation_num,
+                    MIN(qs.creation_time) OVER (PARTITION BY qs.query_hash) AS creation_time,
+                    MAX(qs.last_execution_time) OVER (PARTITION BY qs.query_hash) AS last_execution_time,
+                    MAX({LAST_COMPLETION_TIME}) OVER (PARTITION BY qs.query_hash) AS last_completion_time,
+                    COUNT(*) OVER (PARTITION BY qs.query_hash) AS plan_count,
+                    ROW_NUMBER() OVER (PARTITION BY qs.query_hash ORDER BY qs.total_worker_time DESC) AS hash_rank
+                FROM sys.dm_exec_query_stats qs
+            ) qs"""
+
+QUERY_STATS_BY_HASH_SQL = f"""
+            SELECT{QUERY_COUNTER_COLUMNS},{QUERY_TEXT_COLUMNS},
+                qs.plan_count{QUERY_STATS_BY_HASH_SOURCE}
+            CROSS APPLY sys.dm_exec_sql_text(qs.sql_handle) st
+            WHERE qs.hash_rank = 1
+        """
+
+QUERY_COUNTERS_BY_HASH_SQL = f"""
+            SELECT{QUERY_COUNTER_COLUMNS},
+                qs.plan_count{QUERY_STATS_BY_HASH_SOURCE}
+            WHERE qs.hash_rank = 1
+        """
+
+# Filtro incremental de cada forma (se agrega al final de la sentencia)
+QUERY_STATS_SINCE = " WHERE qs.last_completion_time >= ?"
+QUERY_STATS_BY_HASH_SINCE = " AND qs.last_completion_time >= ?"
+
+# Texto de un lote de sentencias conocidas: una fila VALUES (?, ?, ?) por
+# sql_handle + offsets. Se lee en bloques de TEXT_LOOKUP_CHUNK (3 parámetros
+# por sentencia, SQL Server admite hasta 2100 por llamada).
+STATEMENT_TEXT_SQL = f"""
+            SELECT
+                qs.sql_handle,
+                qs.statement_start_offset,
+                qs.statement_end_offset,{QUERY_TEXT_COLUMNS}
+            FROM (VALUES {{values}}) AS qs(sql_handle, statement_start_offset, statement_end_offset)
+            CROSS APPLY sys.dm_exec_sql_text(CONVERT(VARBINARY(64), qs.sql_handle, 1)) st
+        """
+TEXT_LOOKUP_CHUNK = 500
+
+# Una sola pasada sobre el plan cache produce las dos vistas TOP 50:
+# heavy (todas las sentencias de la instancia) y frequent (TOP 50 de cada una
+# de las bases indicadas, sin internas). {databases} son los "?" de las bases.
+PLAN_CACHE_TOP_TEMPLATE = """
+    WITH plan_cache AS ({stats}),
+    candidates AS (
+        SELECT
+            *,
+            CASE WHEN database_name IN ({{databases}}) AND is_internal = 0 THEN 1 ELSE 0 END AS is_frequent_candidate
+        FROM plan_cache
+    ),
+    ranked AS (
+        SELECT
+            *,
+            ROW_NUMBER() OVER (ORDER BY cpu_time_total DESC) AS heavy_rank,
+            ROW_NUMBER() OVER (
+                PARTITION BY is_frequent_candidate, database_name ORDER BY cpu_time_total DESC
+            ) AS frequent_rank
+        FROM candidates
+    )
+    SELECT *
+    FROM ranked
+    WHERE heavy_rank <= 50
+       OR (is_frequent_candidate = 1 AND frequent_rank <= 50)
+    ORDER BY cpu_time_total DESC;
+"""
+PLAN_CACHE_TOP_SQL = PLAN_CACHE_TOP_TEMPLATE.format(stats=QUERY_STATS_SQL)
+PLAN_CACHE_TOP_BY_HASH_SQL = PLAN_CACHE_TOP_TEMPLATE.format(stats=QUERY_STATS_BY_HASH_SQL)
 
 class BdRepository:
-    def __init__(self, db_connection: DatabaseConnection):
-        self.con:Connection=db_connection.connection()
+    def __init__(
+        self,
+        db_connection: DatabaseConnection,
+        pool: Optional[ConnectionPool] = None,
+        aggregate_by_hash: bool = False,
+        batch_timeout: Optional[int] = None,
+    ):
+        # Cada consulta toma prestada una conexión del pool y la devuelve al terminar
+        self.pool:ConnectionPool = pool or ConnectionPool(db_connection)
+        # Tiempo máximo (segundos) del lote de recolección; pasado, el driver lo cancela
+        self.batch_timeout = batch_timeout
         self.timezone:str = pytz.timezone(TIMEZONE)
+        # Con aggregate_by_hash el plan cache se lee agrupado por query_hash en el servidor
+        self.aggregate_by_hash = aggregate_by_hash
+        if aggregate_by_hash:
+            self.query_stats_sql, self.query_stats_since = QUERY_STATS_BY_HASH_SQL, QUERY_STATS_BY_HASH_SINCE
+            self.query_counters_sql = QUERY_COUNTERS_BY_HASH_SQL
+            self.plan_cache_top_sql = PLAN_CACHE_TOP_BY_HASH_SQL
+        else:
+            self.query_stats_sql, self.query_stats_since = QUERY_STATS_SQL, QUERY_STATS_SINCE
+            self.query_counters_sql = QUERY_COUNTERS_SQL
+            self.plan_cache_top_sql = PLAN_CACHE_TOP_SQL
 
     def getHeaviesQuerys(self)->list:
         query = """SELECT TOP 50
@@ -25,6 +215,10 @@ class BdRepository:
                     qs.plan_generation_num AS plan_reuse_count,
                     qs.creation_time,
                     qs.last_execution_time,
+                    CONVERT(VARCHAR(130), qs.query_hash, 1) AS query_hash,
+                    CONVERT(VARCHAR(130), qs.sql_handle, 1) AS sql_handle,
+                    qs.statement_start_offset,
+                    qs.statement_end_offset,
                     SUBSTRING(
                         st.text,
                         (qs.statement_start_offset / 2) + 1,
@@ -40,8 +234,8 @@ class BdRepository:
                 CROSS APPLY sys.dm_exec_sql_text(qs.sql_handle) st       
                 ORDER BY qs.total_worker_time DESC;
         """
-        return self.__fetchQuery(query=query)
-    def getMostRequestedQuery(self):
+        return self.__fetchQuery(query=query, name="heavy")
+    def getMostRequestedQuery(self, db_name: str = "Baseconta"):
         query="""
             SELECT TOP 50
                 qs.execution_count,
@@ -58,6 +252,10 @@ class BdRepository:
                 qs.plan_generation_num AS plan_reuse_count,
                 qs.creation_time,
                 qs.last_execution_time,
+                CONVERT(VARCHAR(130), qs.query_hash, 1) AS query_hash,
+                CONVERT(VARCHAR(130), qs.sql_handle, 1) AS sql_handle,
+                qs.statement_start_offset,
+                qs.statement_end_offset,
                 SUBSTRING(
                     st.text,
                     (qs.statement_start_offset / 2) + 1,
@@ -72,61 +270,202 @@ class BdRepository:
             FROM sys.dm_exec_query_stats qs
             CROSS APPLY sys.dm_exec_sql_text(qs.sql_handle) st
             WHERE 
-                DB_NAME(st.dbid) = 'Baseconta'            
+                DB_NAME(st.dbid) = ?
                 AND st.text NOT LIKE '%sys.%'           
                 AND st.text NOT LIKE '%INTERNAL%'     
                 AND st.text NOT LIKE '%dm_exec%'         
             ORDER BY qs.total_worker_time DESC;
         """
-        return self.__fetchQuery(query=query)
+        return self.__fetchQuery(query=query, params=(db_name,), name="frequent")
+    def getQueryStatsSince(self, since=None, with_text: bool = True):
+        """
+        Lectura incremental del plan cache: todas las sentencias (sin TOP 50)
+        cuya última ejecución terminó desde el watermark `since`. Con
+        since=None es un escaneo completo.
+        Con with_text=False no se lee dm_exec_sql_text (ver getStatementTexts).
+        """
+        query, params = self.__queryStatsSql(since, with_text)
+        return self.__fetchQuery(query=query, params=params, name="query_stats")
+    def getStatementTexts(self, keys: List[Tuple[str, int, int]]) -> list:
+        """
+        database_name, is_internal y query_text de cada (sql_handle, start, end),
+        en bloques de TEXT_LOOKUP_CHUNK sentencias por viaje. Las que ya no
+        están en el plan cache no vuelven.
+        """
+        rows = []
+        for start in range(0, len(keys), TEXT_LOOKUP_CHUNK):
+            chunk = keys[start:start + TEXT_LOOKUP_CHUNK]
+            query = STATEMENT_TEXT_SQL.format(values=", ".join(["(?, ?, ?)"] * len(chunk)))
+            params = tuple(value for key in chunk for value in key)
+            rows.extend(self.__fetchQuery(query=query, params=params, name="statement_text"))
+        return rows
     def getCurrentQuerys(self):
-        query="""SELECT 
-            COUNT(*) AS queries_processing_now
-        FROM sys.dm_exec_requests
-        WHERE status = 'running'"""
-        return self.__fetchQuery(query=query)
+        return self.__fetchQuery(query=CURRENT_QUERIES_SQL, name="current_queries")
     def getCurrentUsers(self):
-        query="""SELECT 
-                s.host_name,
-                c.client_net_address,
-                s.program_name,
-                COUNT(r.session_id) AS requests_running_now
-            FROM sys.dm_exec_sessions s
-            LEFT JOIN sys.dm_exec_requests r
-                ON s.session_id = r.session_id
-            LEFT JOIN sys.dm_exec_connections c
-                ON s.session_id = c.session_id
-            WHERE s.is_user_process = 1
-            GROUP BY 
-                s.host_name,
-                c.client_net_address,
-                s.program_name
-            ORDER BY requests_running_now DESC;
-            """
-        return self.__fetchQuery(query=query)
+        return self.__fetchQuery(query=CURRENT_USERS_SQL, name="current_users")
 
     def getMemoryData(self):
-        return self.__fetchQuery(
-            """SELECT 
-                physical_memory_in_use_kb / 1024 AS sqlserver_memory_used_mb,
-                virtual_address_space_reserved_kb / 1024 AS vas_reserved_mb,
-                virtual_address_space_committed_kb / 1024 AS vas_committed_mb,
-                locked_page_allocations_kb / 1024 AS locked_pages_mb
-            FROM sys.dm_os_process_memory;
-
-            """
-        )
-
-    def __fetchQuery(self, query: str, params: tuple = ()) -> list:
+        return self.__fetchQuery(MEMORY_SQL, name="memory")
+
+    def getCollectionBatch(
+        self,
+        db_name: Union[str, Sequence[str]],
+        incremental: bool = False,
+        since=None,
+        with_text: bool = True,
+        live: bool = True,
+    ) -> dict:
+        """
+        Todas las lecturas de un ciclo en un solo viaje a SQL Server.
+        db_name: una base o todas las bases monitoreadas de la instancia.
+        - incremental=False: heavy y frequent salen de una misma pasada sobre el
+          plan cache; frequent trae el TOP 50 de cada base (ver database_name).
+        - incremental=True: se devuelven las filas crudas del plan cache desde `since`
+          (con with_text=False, solo los contadores).
+        - live=False: solo el plan cache; consultas, usuarios y memoria vuelven
+          vacíos porque los leen los colectores del registro con su propio intervalo.
+        """
+        if incremental:
+            plan_cache_sql, params = self.__queryStatsSql(since, with_text)
+        else:
+            params = (db_name,) if isinstance(db_name, str) else tuple(db_name)
+            plan_cache_sql = self.plan_cache_top_sql.format(databases=", ".join("?" * len(params)))
+
+        live_sql = [CURRENT_QUERIES_SQL + ";", CURRENT_USERS_SQL, MEMORY_SQL] if live else []
+        batch = "\n".join(["SET NOCOUNT ON;", plan_cache_sql] + live_sql)
+        names = BATCH_SETS if live else BATCH_SETS[:1]
+        result_sets = self.__fetchBatch(batch, params, names) + [[] for _ in BATCH_SETS[len(names):]]
+        plan_cache, queries, users, memory = result_sets
+
+        result = {"queries": queries, "users": users, "memory": memory}
+        if incremental:
+            result["plan_cache"] = plan_cache
+        else:
+            result["heavy"] = [r for r in plan_cache if r["heavy_rank"] <= 50]
+            result["frequent"] = [
+                r for r in plan_cache
+                if r["is_frequent_candidate"] == 1 and r["frequent_rank"] <= 50
+            ]
+        return result
+
+    def runCollector(self, name: str, query: str, timeout: Optional[int] = None) -> list:
+        """
+        Una lectura de un colector del registro (CollectorDomain), con tiempo
+        máximo de ejecución: pasado `timeout` segundos el driver cancela la
+        consulta. A diferencia de las demás lecturas, un error se propaga para
+        que el planificador lo cuente y aplique backoff.
+        """
+        started = time.perf_counter()
+        rows = []
+        try:
+            with self.pool.connection() as con:
+                con.timeout = timeout or 0
+                cursor = con.cursor()
+                try:
+                    cursor.execute(query)
+                    if cursor.description:
+                        rows = list(self.__readSet(cursor))
+                finally:
+                    cursor.close()
+                    con.timeout = 0
+        except Exception as e:
+            instruments.inc("exporter_dmv_errors_total", query=name)
+            self.__countTimeout(e, name)
+            raise
+        finally:
+            instruments.observe("exporter_dmv_query_seconds", time.perf_counter() - started, query=name, mode="collector")
+            instruments.inc("exporter_dmv_rows_total", len(rows), query=name)
+        return rows
+
+    def __queryStatsSql(self, since, with_text: bool) -> Tuple[str, tuple]:
+        """Lectura del plan cache completa o desde `since`, con o sin texto."""
+        query = self.query_stats_sql if with_text else self.query_counters_sql
+        if since is None:
+            return query + ";", ()
+        return query + self.query_stats_since + ";", (since,)
+
+    def __fetchQuery(self, query: str, params: tuple = (), name: str = "query") -> list:
+        """
+        Lee el resultado con fetchmany en filas compactas (CompactRow), sin un
+        dict por fila. Devuelve el conjunto completo o, si la lectura falla en
+        cualquier punto (también a mitad de las filas), una lista vacía: nunca
+        un resultado truncado. La latencia va desde la ejecución hasta la última fila.
+        """
+        started = time.perf_counter()
+        rows = []
         try:
-            cursor = self.con.cursor()
-            cursor.execute(query, params)
-            results = cursor.fetchall()
+            with self.pool.connection() as con:
+                cursor = con.cursor()
+                try:
+                    cursor.execute(query, params)
+                    if cursor.description:
+                        rows = list(self.__readSet(cursor))
+                finally:
+                    cursor.close()
+        except Exception as e:
+            instruments.inc("exporter_dmv_errors_total", query=name)
+            logger.error("[%s] lectura fallida: %s", name, e)
+            rows = []
+        finally:
+            instruments.observe("exporter_dmv_query_seconds", time.perf_counter() - started, query=name, mode="single")
+            instruments.inc("exporter_dmv_rows_total", len(rows), query=name)
+        return rows
 
-            if not results:
-                return []
+    @staticmethod
+    def __readSet(cursor) -> Iterator[CompactRow]:
+        build = CompactRow.builder(cursor.description)
+        while True:
+            chunk = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not chunk:
+                break
+            for row in chunk:
+                yield build(row)
 
-            column_names = [column[0] for column in cursor.description]
-            return [dict(zip(column_names, row)) for row in results]
+    def __fetchBatch(self, query: str, params: tuple, names: tuple) -> list:
+        """
+        Ejecuta un lote con varios SELECT y lee cada conjunto con cursor.nextset().
+        Devuelve una lista por nombre en `names`. Con batch_timeout el driver
+        cancela el lote pasado ese tiempo. Si el lote falla (o vence) el error
+        se propaga, como en runCollector: el ciclo no publica conjuntos vacíos
+        y el planificador lo cuenta como error y aplica backoff.
+        Cada conjunto se mide desde el final del anterior (el primero incluye la ejecución).
+        """
+        result_sets = []
+        mark = time.perf_counter()
+        try:
+            with self.pool.connection() as con:
+                con.timeout = self.batch_timeout or 0
+                cursor = con.cursor()
+                try:
+                    cursor.execute(query, params)
+                    while True:
+                        if cursor.description:
+                            rows = list(self.__readSet(cursor))
+                            name = names[len(result_sets)] if len(result_sets) < len(names) else "extra"
+                            now = time.perf_counter()
+                            instruments.observe("exporter_dmv_query_seconds", now - mark, query=name, mode="batch")
+                            instruments.inc("exporter_dmv_rows_total", len(rows), query=name)
+                            mark = now
+                            result_sets.append(rows)
+                        if not cursor.nextset():
+                            break
+                finally:
+                    cursor.close()
+                    con.timeout = 0
         except Exception as e:
-            return []
\ No newline at end of file
+            instruments.inc("exporter_dmv_errors_total", query="batch")
+            self.__countTimeout(e, "batch")
+            logger.error("[batch] lectura del lote fallida: %s", e)
+            raise
+
+        result_sets += [[] for _ in range(len(names) - len(result_sets))]
+        return result_sets[:len(names)]
+
+    @staticmethod
+    def __countTimeout(error: Exception, name: str):
+        # pyodbc informa la cancelación por timeout con SQLSTATE HYT00 / HYT01
+        if error.args and error.args[0] in ("HYT00", "HYT01"):
+            instruments.inc("exporter_events_total", event="dmv_timeout", query=name)
+
+    def getPoolStats(self) -> dict:
+        return self.pool.stats()
\ No newline at end of file
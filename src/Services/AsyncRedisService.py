@@ -0,0 +1,45 @@
+from typing import Dict, List, Optional, Tuple
+
+from redis.exceptions import NoScriptError
+
+from src.Services.RedisService import READ_GENERATION_LUA, RedisService
+from src.Utils.RedisConection import RedisConection
+
+
+class AsyncRedisService:
+    """
+    Lecturas de generaciones con redis.asyncio para el servidor asíncrono.
+    Mismos resultados que RedisService.current_generations / read_generations,
+    sin bloquear el event loop mientras Redis responde.
+    """
+
+    def __init__(self, con: RedisConection, max_connections: int = 50):
+        self.redis = con.getAsyncConn(max_connections)
+        self._read_generation = self.redis.register_script(READ_GENERATION_LUA)
+
+    async def current_generations(self, namespaces: List[str]) -> List[Optional[str]]:
+        if not namespaces:
+            return []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for namespace in namespaces:
+                pipe.get(RedisService.namespace_key(namespace, "current"))
+            raw = await pipe.execute()
+        return [item.decode("utf-8") if isinstance(item, bytes) else item for item in raw]
+
+    async def read_generations(self, namespaces: List[str]) -> List[Tuple[Optional[str], Dict[str, str]]]:
+        if not namespaces:
+            return []
+        try:
+            return RedisService.decode_generations(await self._read_pipeline(namespaces))
+        except NoScriptError:
+            await self.redis.script_load(READ_GENERATION_LUA)
+            return RedisService.decode_generations(await self._read_pipeline(namespaces))
+
+    async def _read_pipeline(self, namespaces: List[str]) -> list:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for namespace in namespaces:
+                pipe.evalsha(self._read_generation.sha, *RedisService.read_generation_args(namespace))
+            return await pipe.execute()
+
+    async def close(self):
+        await self.redis.aclose()
@@ -0,0 +1,90 @@
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from src.Services.DatabaseService import DatabaseService
+from src.Utils.CaptureFile import CaptureWriter
+from src.Utils.Instrumentation import instruments
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureDatabaseService:
+    """
+    Envuelve un DatabaseService y guarda en disco (CaptureWriter) los conjuntos
+    de resultados crudos de cada getCollectionBatch, sin cambiarlos.
+    MetricsService lo usa igual que al DatabaseService: activar la captura en
+    producción no toca el resto del pipeline. Si escribir falla, el ciclo
+    sigue con los datos leídos y solo se cuenta el error.
+    Solo se captura el ciclo del plan cache: con los colectores livianos
+    (COLLECTORS_ENABLED) ese ciclo no lee consultas, usuarios ni memoria
+    (live=False, queda anotado en cada ciclo) y runCollector no se captura.
+    """
+
+    def __init__(self, database: DatabaseService, writer: CaptureWriter):
+        self.database = database
+        self.writer = writer
+
+    def getCollectionBatch(self, db_name: str, incremental: bool = False, since=None, live: bool = True):
+        started = time.perf_counter()
+        batch = self.database.getCollectionBatch(db_name, incremental=incremental, since=since, live=live)
+        duration = time.perf_counter() - started
+        try:
+            written = self.writer.write(
+                db_name, batch, datetime.now().astimezone(), duration,
+                since=since, pool=self.database.getPoolStats(), live=live,
+            )
+            instruments.inc("exporter_events_total", event="capture_cycle" if written else "capture_dropped")
+        except Exception as e:
+            instruments.inc("exporter_events_total", event="capture_error")
+            logger.warning("no se pudo escribir la captura del ciclo: %s", e)
+        return batch
+
+    def runCollector(self, name: str, query: str, timeout=None):
+        # los colectores livianos no se capturan: ver docstring de la clase
+        return self.database.runCollector(name, query, timeout)
+
+    def __getattr__(self, name):
+        # el resto de las lecturas (pool, consultas individuales) pasa tal cual
+        return getattr(self.database, name)
+
+
+class ReplayDatabaseService:
+    """
+    Sustituye al DatabaseService con los ciclos de una captura, sin SQL Server:
+    el runner carga cada ciclo con load() y getCollectionBatch lo devuelve.
+    El modo pedido (completo/incremental) debe ser el de la captura; en modo
+    incremental el `since` que calcule PlanCacheService se ignora y se
+    devuelven las filas que se leyeron en producción.
+    Lo mismo con `live`: un ciclo capturado con los colectores livianos no
+    trae consultas, usuarios ni memoria y se reproduce con live_sets=False.
+    Las capturas no incluyen los colectores livianos (runCollector).
+    """
+
+    def __init__(self):
+        self.current: Optional[Dict] = None
+        self.cycles = 0
+
+    def load(self, record: Dict):
+        self.current = record
+        self.cycles += 1
+
+    def getCollectionBatch(self, db_name: str, incremental: bool = False, since=None, live: bool = True):
+        record = self.current
+        if record is None:
+            raise ValueError("No hay ciclo cargado: llamar a load() antes de processRecord")
+        if record["incremental"] != incremental:
+            raise ValueError(
+                f"Captura {'incremental' if record['incremental'] else 'completa'}: "
+                f"reproducir con incremental={record['incremental']}"
+            )
+        if record["live"] != live:
+            raise ValueError(f"Captura con live={record['live']}: reproducir con live_sets={record['live']}")
+        return record["batch"]
+
+    def runCollector(self, name: str, query: str, timeout=None):
+        raise ValueError(f"Las capturas no incluyen el colector {name}: solo el ciclo del plan cache")
+
+    def getPoolStats(self) -> dict:
+        return dict(self.current["pool"]) if self.current else {}
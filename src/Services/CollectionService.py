@@ -0,0 +1,370 @@
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, List, Optional
+
+from settings.AppSettings import USERS_TOP_K
+from src.Domain.CollectorDomain import CollectorDomain
+from src.Domain.ScheduleDomain import ScheduleDomain
+from src.Services.ExpositionService import ExpositionService
+from src.Services.LeaderElectionService import LeaderElectionService
+from src.Services.PrometheusService import PrometheusService
+from src.Services.QueryAnalysisService import QueryAnalysisService
+from src.Services.RedisService import RedisService
+from src.Utils.Instrumentation import instruments
+from src.Utils.LruCache import LruCache
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionService:
+    """
+    Recolecta todas las instancias configuradas en paralelo sobre un pool
+    acotado de hilos. Cada "target" de este servicio es una instancia de SQL
+    Server con todas sus bases monitoreadas (DATABASE_INSTANCES): los DMV de
+    la instancia se leen una sola vez por ciclo.
+    Cada target tiene su propio intervalo adaptativo (ScheduleDomain): se
+    alarga cuando el ciclo sale caro o el servidor está cargado y se acorta
+    cuando está ocioso; el inicio lleva jitter. collect_all se llama en cada
+    tick corto del scheduler y solo lanza los targets a los que les toca.
+    Si el ciclo anterior de un target sigue en curso, su turno se salta o se
+    junta con los siguientes (policy["overlap"]), así un servidor lento no
+    acumula corridas ni retrasa a los demás.
+    Con leader, solo se recolectan los targets cuyo lease tiene este proceso;
+    el resto queda en espera por si el líder actual cae.
+    Además del ciclo del plan cache (MetricsService), cada target corre los
+    colectores livianos de CollectorDomain (consultas en curso, usuarios,
+    memoria) como trabajos independientes: cada uno con su intervalo, su
+    timeout y su presupuesto de costo, y publicado en su propio espacio.
+    """
+
+    EXPORTER_TTL = 1200
+    # Respaldo del cache de análisis en Redis como mucho cada tantos segundos
+    CHECKPOINT_EVERY = 300
+    # Claves de _timings que solo crecen: se exponen como counter, el resto como gauge
+    TIMING_COUNTERS = ("errors", "skipped")
+
+    def __init__(
+        self,
+        redis: RedisService,
+        prometheus: PrometheusService,
+        analyzer: QueryAnalysisService,
+        targets: List[Dict],
+        max_workers: int = 4,
+        leader: Optional[LeaderElectionService] = None,
+        policy: Optional[Dict] = None,
+        collectors: Optional[List[Dict]] = None,
+    ):
+        """
+        targets: lista de {"name", "database", "service": MetricsService}, una
+        por instancia (name es el primer target de la instancia)
+        policy: ver ScheduleDomain.default_policy (ciclo del plan cache)
+        collectors: colectores livianos de CollectorDomain.collectors(); cada
+        uno corre por target con su propia política (CollectorDomain.policy)
+        """
+        self.redis = redis
+        self.prometheus = prometheus
+        self.analyzer = analyzer
+        self.targets = targets
+        self.leader = leader
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="collector")
+        self.policy = policy or ScheduleDomain.default_policy()
+        # Un trabajo por target y colector: "<target>:<colector>"
+        self.jobs: List[Dict] = []
+        for target in targets:
+            self.jobs.append(self._job(target, CollectorDomain.PLAN_CACHE, self.policy))
+            for collector in collectors or []:
+                self.jobs.append(
+                    self._job(target, collector["name"], CollectorDomain.policy(collector, self.policy["jitter"]), collector)
+                )
+        self._running: Dict[str, Future] = {}
+        self._timings: Dict[str, Dict[str, float]] = {
+            job["key"]: {
+                "duration_seconds": 0,
+                "last_success_timestamp": 0,
+                "errors": 0,
+                "skipped": 0,
+            }
+            for job in self.jobs
+        }
+        # next_run es time.monotonic(); None hasta el primer tick (ahí se aplica el jitter inicial)
+        self._schedule: Dict[str, Dict] = {
+            job["key"]: {
+                "interval": job["policy"]["interval"],
+                "next_run": None,
+                "jitter": 0.0,
+                "cost_ratio": 0.0,
+                "load": 0,
+                "pending": False,
+                "decisions": {},
+            }
+            for job in self.jobs
+        }
+        # Consultas en ejecución por target, según el último current_queries
+        # (señal de carga del plan cache cuando su ciclo ya no las lee)
+        self._loads: Dict[str, float] = {}
+        self._lock = Lock()
+        self._checkpoint: Optional[Future] = None
+        self._last_checkpoint = time.monotonic()
+
+    @staticmethod
+    def _job(target: Dict, collector: str, policy: Dict, spec: Optional[Dict] = None) -> Dict:
+        return {
+            "key": f"{target['name']}:{collector}",
+            "target": target,
+            "collector": collector,
+            "policy": policy,
+            "spec": spec,
+        }
+
+    # ------------------- Recolección -------------------
+    def collect_all(self):
+        """
+        Lanza sin esperar cada trabajo (target + colector) al que ya le toca.
+        """
+        now = time.monotonic()
+        submitted = False
+        for job in self.jobs:
+            key, name, policy = job["key"], job["target"]["name"], job["policy"]
+            if self.leader and not self.leader.is_leader(name):
+                continue
+
+            with self._lock:
+                state = self._schedule[key]
+                if state["next_run"] is None:
+                    state["jitter"] = ScheduleDomain.jitter(state["interval"], policy["jitter"])
+                    state["next_run"] = now + state["jitter"]
+                if now < state["next_run"]:
+                    continue
+
+                running = self._running.get(key)
+                overlapped = running is not None and not running.done()
+                if overlapped:
+                    self._timings[key]["skipped"] += 1
+                    if policy["overlap"] == "COALESCE":
+                        # una sola corrida extra apenas termine la actual, no una por turno perdido
+                        decision = "coalesce"
+                        state["pending"] = True
+                    else:
+                        decision = "skip"
+                    self._count_decision(state, decision)
+                # el próximo turno se planifica ya al lanzar; al terminar se
+                # vuelve a planificar con el intervalo recalculado
+                self._plan_next(state, policy, now)
+
+            if overlapped:
+                self._store_exporter_metrics(name)
+                continue
+            self._running[key] = self.executor.submit(self._run_job, job)
+            submitted = job["collector"] == CollectorDomain.PLAN_CACHE or submitted
+
+        if submitted:
+            self._schedule_checkpoint(now)
+
+    def _schedule_checkpoint(self, now: float):
+        """
+        El respaldo serializa todo el cache de análisis: corre en el pool de
+        hilos y no en el tick, como mucho cada CHECKPOINT_EVERY segundos y
+        nunca dos a la vez.
+        """
+        if now - self._last_checkpoint < self.CHECKPOINT_EVERY:
+            return
+        if self._checkpoint is not None and not self._checkpoint.done():
+            return
+        self._last_checkpoint = now
+        self._checkpoint = self.executor.submit(self._run_checkpoint)
+
+    def _run_checkpoint(self):
+        try:
+            self.analyzer.checkpoint()
+        except Exception as e:
+            instruments.inc("exporter_events_total", event="checkpoint_error")
+            logger.warning("no se pudo respaldar el cache de análisis: %s", e)
+
+    def _run_job(self, job: Dict):
+        target = job["target"]
+        started = time.monotonic()
+        ok = True
+        load = None
+        try:
+            if job["spec"] is None:
+                target["service"].processRecord(target["database"])
+                load = getattr(target["service"], "last_load", None)
+                if load is None:
+                    load = self._loads.get(target["name"])
+            else:
+                self._collect_dmv(job)
+        except Exception as e:
+            ok = False
+            instruments.inc("exporter_events_total", event="collection_error", job=job["collector"])
+            logger.error("[%s] recolección fallida: %s", job["key"], e)
+        duration = time.monotonic() - started
+
+        with self._lock:
+            timing = self._timings[job["key"]]
+            timing["duration_seconds"] = duration
+            if ok:
+                timing["last_success_timestamp"] = time.time()
+            else:
+                timing["errors"] += 1
+
+            state = self._schedule[job["key"]]
+            state["cost_ratio"] = duration / state["interval"]
+            state["load"] = load or 0
+            state["interval"], decision = ScheduleDomain.next_interval(
+                state["interval"], duration, load, not ok, job["policy"]
+            )
+            self._count_decision(state, decision)
+            if state["pending"]:
+                # turnos juntados mientras corría: se recolecta en el próximo tick
+                state["pending"] = False
+                state["next_run"] = time.monotonic()
+            else:
+                self._plan_next(state, job["policy"], started)
+
+        self._store_exporter_metrics(target["name"])
+
+    def _collect_dmv(self, job: Dict):
+        """
+        Un colector liviano: su consulta (con timeout propio), su texto de
+        exposición y una generación en su propio espacio de Redis.
+        """
+        name, spec = job["target"]["name"], job["spec"]
+        fence = self.leader.fence(name) if self.leader else None
+        rows = job["target"]["service"].database.runCollector(spec["name"], spec["sql"], spec["timeout"])
+        text = CollectorDomain.render(spec["name"], rows, self.prometheus, {"target": name}, USERS_TOP_K)
+        load = CollectorDomain.load(spec["name"], rows)
+        if load is not None:
+            self._loads[name] = load
+        # vence recién si el colector lleva dos turnos seguidos sin publicar con su intervalo más largo
+        generation = self.redis.publish_generation(
+            ExpositionService.collector_namespace(name, spec["name"]),
+            {"exposition": text},
+            int(job["policy"]["max_interval"] * 2),
+            fence=fence,
+        )
+        if generation is None:
+            self._fenced_out(name, spec["name"])
+
+    @staticmethod
+    def _count_decision(state: Dict, decision: str):
+        state["decisions"][decision] = state["decisions"].get(decision, 0) + 1
+        state["last_decision"] = decision
+
+    def _plan_next(self, state: Dict, policy: Dict, since: float):
+        state["jitter"] = ScheduleDomain.jitter(state["interval"], policy["jitter"])
+        state["next_run"] = since + state["interval"] + state["jitter"]
+
+    def _store_exporter_metrics(self, name: str):
+        """
+        Métricas propias del exporter para un target, en su propio espacio de
+        nombres: las publica solo el recolector que lo tiene asignado.
+        """
+        with self._lock:
+            jobs = [
+                (
+                    job["collector"],
+                    dict(self._timings[job["key"]]),
+                    {**self._schedule[job["key"]], "decisions": dict(self._schedule[job["key"]]["decisions"])},
+                )
+                for job in self.jobs
+                if job["target"]["name"] == name
+            ]
+
+        labels = {"target": name}
+        gauges, counters = [], []
+        for collector, timing, schedule in jobs:
+            job_labels = {**labels, "job": collector}
+            gauges += [
+                (f"exporter_collection_{key}", f"Recolección por target y colector: {key}", value, job_labels)
+                for key, value in timing.items()
+                if key not in self.TIMING_COUNTERS
+            ]
+            counters += [
+                (f"exporter_collection_{key}_total", f"Recolección por target y colector: {key}", value, job_labels)
+                for key, value in timing.items()
+                if key in self.TIMING_COUNTERS
+            ]
+            gauges += self._schedule_gauges(schedule, job_labels)
+            counters += [
+                (
+                    "exporter_schedule_decisions_total", "Decisiones del planificador por tipo", count,
+                    {**job_labels, "decision": decision},
+                )
+                for decision, count in sorted(schedule["decisions"].items())
+            ]
+        analysis_stats = self.analyzer.stats()
+        gauges += [
+            (f"exporter_analysis_cache_{key}", f"Cache de análisis de sentencias: {key}", value, labels)
+            for key, value in analysis_stats.items()
+            if key not in LruCache.COUNTERS
+        ]
+        counters += [
+            (f"exporter_analysis_cache_{key}_total", f"Cache de análisis de sentencias: {key}", value, labels)
+            for key, value in analysis_stats.items()
+            if key in LruCache.COUNTERS
+        ]
+        fence = None
+        if self.leader:
+            fence = self.leader.fence(name)
+            gauges.append((
+                "exporter_collector_info", "Recolector que tiene el lease del target", 1,
+                {**labels, "collector": self.leader.owner},
+            ))
+            # acquired, lost y errors solo crecen
+            counters += [
+                (f"exporter_leader_{key}_total", f"Leases del recolector: {key}", value, labels)
+                for key, value in self.leader.stats().items()
+            ]
+        sections = {"exposition": self.prometheus.generate_gauges(gauges) + self.prometheus.generate_counters(counters)}
+        if name == self._instrumented_target():
+            # histogramas y contadores del proceso: una sola vez por recolector
+            sections["instrumentation"] = instruments.render(
+                {"collector": self.leader.owner} if self.leader else None
+            )
+        generation = self.redis.publish_generation(
+            ExpositionService.exporter_namespace(name),
+            sections,
+            self.EXPORTER_TTL,
+            fence=fence,
+        )
+        if generation is None:
+            self._fenced_out(name, "exporter")
+
+    def _fenced_out(self, name: str, job: str):
+        """Publicación rechazada por fence: otro recolector ya tiene el lease de la instancia."""
+        instruments.inc("exporter_events_total", event="fenced_write_rejected", job=job)
+        if self.leader:
+            self.leader.fenced_out(name)
+
+    def _instrumented_target(self) -> Optional[str]:
+        """
+        La instrumentación es del proceso, no de un target: se publica en el
+        espacio del primer target que este recolector tiene asignado, así dos
+        recolectores nunca exponen la misma serie.
+        """
+        for target in self.targets:
+            if not self.leader or self.leader.is_leader(target["name"]):
+                return target["name"]
+        return None
+
+    @staticmethod
+    def _schedule_gauges(schedule: Dict, labels: Dict[str, str]) -> List:
+        next_run = schedule["next_run"]
+        gauges = [
+            ("exporter_schedule_interval_seconds", "Intervalo adaptativo actual del target", schedule["interval"], labels),
+            ("exporter_schedule_jitter_seconds", "Jitter aplicado al próximo inicio", schedule["jitter"], labels),
+            ("exporter_schedule_cost_ratio", "Duración del último ciclo / intervalo", schedule["cost_ratio"], labels),
+            ("exporter_schedule_load", "Consultas en ejecución vistas en el último ciclo", schedule["load"], labels),
+            (
+                "exporter_schedule_next_run_timestamp", "Próximo inicio programado (epoch)",
+                time.time() + (next_run - time.monotonic()) if next_run is not None else 0, labels,
+            ),
+        ]
+        if schedule.get("last_decision"):
+            gauges.append((
+                "exporter_schedule_last_decision", "Última decisión del planificador", 1,
+                {**labels, "decision": schedule["last_decision"]},
+            ))
+        return gauges
@@ -1,16 +1,33 @@
+from typing import Optional
+
 from src.Repositories.BdRepository import BdRepository
+from src.Services.StatementTextService import StatementTextService
 
 class DatabaseService:
-    def __init__(self, repo: BdRepository):
+    def __init__(self, repo: BdRepository, texts: Optional[StatementTextService] = None):
         self.repo = repo
+        # Con texts el plan cache se lee sin dm_exec_sql_text y el texto sale del cache
+        self.texts = texts
 
     # Consultas más pesadas (TOP 50 por CPU)
     def getHeaviesQueries(self):
         return self.repo.getHeaviesQuerys()
 
     # Consultas más ejecutadas (TOP 50 por execution_count)
-    def getMostRequestedQueries(self):
-        return self.repo.getMostRequestedQuery()
+    def getMostRequestedQueries(self, db_name: str = "Baseconta"):
+        return self.repo.getMostRequestedQuery(db_name)
+
+    # Todas las lecturas del ciclo en un solo viaje (conjuntos leídos con nextset; los errores se propagan)
+    def getCollectionBatch(self, db_name: str, incremental: bool = False, since=None, live: bool = True):
+        if incremental and self.texts:
+            batch = self.repo.getCollectionBatch(db_name, incremental=True, since=since, with_text=False, live=live)
+            batch["plan_cache"] = self.texts.attach(batch["plan_cache"], self.repo.getStatementTexts)
+            return batch
+        return self.repo.getCollectionBatch(db_name, incremental=incremental, since=since, live=live)
+
+    # Lectura de un colector del registro, con timeout (los errores se propagan)
+    def runCollector(self, name: str, query: str, timeout=None):
+        return self.repo.runCollector(name, query, timeout)
 
     # Consultas que están corriendo justo ahora
     def getCurrentQueries(self):
@@ -23,3 +40,7 @@ class DatabaseService:
     # Información de memoria del proceso de SQL Server
     def getMemoryUsage(self):
         return self.repo.getMemoryData()
+
+    # Estado del pool de conexiones (checkouts, espera, reconexiones)
+    def getPoolStats(self):
+        return self.repo.getPoolStats()
@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from src.Services.PrometheusService import PrometheusService
+from src.Services.RedisService import RedisService
+from src.Utils.ExpositionCache import ExpositionCache
+from src.Utils.ExpositionWriter import ExpositionWriter
+
+
+class ExpositionService:
+    """
+    Lado de lectura de /metrics: toma de Redis la generación vigente de cada
+    target y la de las métricas del exporter de cada instancia, las une en un
+    solo texto y lo guarda ya comprimido mientras ninguna generación cambie.
+    Con collectors se suman las generaciones de los colectores livianos
+    (CollectorDomain) de cada instancia, que se publican con su propio ritmo.
+    No depende de la conexión a SQL Server, así el servidor web solo lee.
+    """
+
+    # Secciones de la generación de un target, en el orden en que se exponen
+    SECTIONS = ("metrics", "QueriesProcessing", "MemoryUsage", "TexplainTop10", "TexplainUsers", "DbPool")
+    # Sección JSON con las sentencias del ciclo (no se expone en /metrics)
+    STATEMENTS_SECTION = "Statements"
+    # Métricas del exporter: un espacio por instancia, lo escribe el recolector líder de esa instancia
+    EXPORTER_NAMESPACE = "Exporter"
+    # Colectores livianos: un espacio por instancia y colector, con la sección "exposition"
+    COLLECTOR_NAMESPACE = "Collector"
+    # Familias de alta cardinalidad que se recortan primero si se pasa el presupuesto de series
+    SHED_PREFIXES = ("texplain_", "user_")
+    # La respuesta cacheada se vuelve a armar al menos con esta frecuencia (segundos),
+    # para que las secciones en vivo vencidas en Redis no se sigan sirviendo
+    RESPONSE_MAX_AGE = 60
+
+    def __init__(
+        self,
+        redis: RedisService,
+        prometheus: PrometheusService,
+        targets: List[str],
+        max_series: Optional[int] = None,
+        collectors: Optional[List[str]] = None,
+        instances: Optional[List[str]] = None,
+        instance_of: Optional[Dict[str, str]] = None,
+    ):
+        """
+        instances: nombre de cada instancia (su primer target); las métricas
+        del exporter y los colectores livianos se publican por instancia.
+        Por defecto, una instancia por target.
+        instance_of: target -> instancia, para los targets que no son el
+        primero de su instancia (ver target_namespace).
+        """
+        self.redis = redis
+        self.prometheus = prometheus
+        self.targets = targets
+        self.instances = instances or targets
+        self.instance_of = instance_of or {}
+        self.collectors = collectors or []
+        # Presupuesto de series por scrape (None/0 = sin límite)
+        self.max_series = max_series
+        # Respuesta de /metrics ya comprimida, válida mientras no cambie ninguna generación
+        self.response_cache = ExpositionCache(max_age=self.RESPONSE_MAX_AGE)
+        self._async_lock: Optional[asyncio.Lock] = None
+
+    @classmethod
+    def render_generation(cls, sections: dict) -> str:
+        """Une las secciones de una generación en el orden de exposición."""
+        return "\n".join(filter(None, (sections.get(name) for name in cls.SECTIONS)))
+
+    @staticmethod
+    def encoded_etag(etag: str, gzip: bool) -> str:
+        """ETag de la representación servida: la comprimida lleva el sufijo -gz."""
+        return f"{etag}-gz" if gzip else etag
+
+    # Espacios de claves de las generaciones. Los que publica el recolector de
+    # una instancia llevan el hash tag de la instancia, el mismo de su lease
+    # (LeaderElectionService.lease_key): la publicación con fence toca ambos
+    # en un solo script y en Redis Cluster tienen que estar en el mismo slot.
+    @staticmethod
+    def target_namespace(target: str, instance: Optional[str] = None) -> str:
+        """El primer target de una instancia es su propio tag; los demás, `{<instancia>}:<target>`."""
+        return target if instance in (None, target) else f"{{{instance}}}:{target}"
+
+    @classmethod
+    def exporter_namespace(cls, target: str) -> str:
+        return f"{cls.EXPORTER_NAMESPACE}:{{{target}}}"
+
+    @classmethod
+    def collector_namespace(cls, target: str, collector: str) -> str:
+        return f"{cls.COLLECTOR_NAMESPACE}:{{{target}}}:{collector}"
+
+    def _namespaces(self) -> List[str]:
+        return (
+            [self.target_namespace(target, self.instance_of.get(target)) for target in self.targets]
+            + [self.exporter_namespace(instance) for instance in self.instances]
+            + [
+                self.collector_namespace(instance, collector)
+                for instance in self.instances
+                for collector in self.collectors
+            ]
+        )
+
+    @staticmethod
+    def _cache_key(generation_ids: List[Optional[str]]) -> str:
+        joined = "|".join(generation or "-" for generation in generation_ids)
+        return hashlib.sha1(joined.encode("utf-8")).hexdigest()[:20]
+
+    def _render(self, generations: List[Tuple[Optional[str], Dict[str, str]]]) -> str:
+        count = len(self.targets)
+        texts = [self.render_generation(sections) for _, sections in generations[:count]]
+        for _, sections in generations[count:]:
+            texts += [sections.get("exposition"), sections.get("instrumentation")]
+        if not self.max_series:
+            return self.prometheus.merge_expositions(texts)
+
+        text, dropped = self.prometheus.merge_expositions_limited(texts, self.max_series, self.SHED_PREFIXES)
+        return text + self._budget_metrics(dropped)
+
+    def _budget_metrics(self, dropped: int) -> str:
+        """
+        Solo gauges: _render corre por cada respuesta armada (invalidaciones
+        del cache, cada worker), así que un acumulado de descartes dependería
+        de eso y no de lo publicado.
+        """
+        writer = ExpositionWriter()
+        writer.gauge(
+            "exporter_series_budget", "Series máximas por scrape (EXPOSITION_MAX_SERIES)", self.max_series
+        )
+        writer.gauge(
+            "exporter_series_dropped", "Series texplain/usuarios descartadas en la exposición actual", dropped
+        )
+        return writer.render()
+
+    # ------------------- Lectura síncrona -------------------
+    def fetchRecords(self) -> str:
+        """
+        Las generaciones vigentes de cada target y de las métricas del
+        exporter, en un solo viaje a Redis.
+        """
+        return self._render(self.redis.read_generations(self._namespaces()))
+
+    def fetchExposition(self) -> Tuple[str, bytes, bytes]:
+        """
+        Devuelve (etag, cuerpo, cuerpo_gzip) para /metrics.
+        Solo se leen los punteros de generación; el contenido se vuelve a leer,
+        unir y comprimir únicamente cuando alguna generación cambió (o la
+        respuesta guardada superó RESPONSE_MAX_AGE).
+        """
+        namespaces = self._namespaces()
+        cached = self.response_cache.get(self._cache_key(self.redis.current_generations(namespaces)))
+        if cached:
+            return cached
+
+        return self._render_and_store(self.redis.read_generations(namespaces))
+
+    def _render_and_store(self, generations: List[Tuple[Optional[str], Dict[str, str]]]) -> Tuple[str, bytes, bytes]:
+        """Une, recorta y comprime las generaciones leídas y guarda la respuesta."""
+        key = self._cache_key([generation for generation, _ in generations])
+        return self.response_cache.store(key, self._render(generations))
+
+    # ------------------- Lectura asíncrona -------------------
+    async def fetchExpositionAsync(self, redis) -> Tuple[str, bytes, bytes]:
+        """
+        Igual que fetchExposition pero con AsyncRedisService.
+        Si varios scrapes encuentran el cache vencido a la vez, solo uno
+        vuelve a leer y comprimir; los demás esperan y reutilizan el resultado.
+        En el event loop solo quedan las lecturas de Redis y la respuesta ya
+        armada: unir, recortar y comprimir (lo caro con muchas series) corre
+        en un hilo.
+        """
+        namespaces = self._namespaces()
+        key = self._cache_key(await redis.current_generations(namespaces))
+        cached = self.response_cache.get(key)
+        if cached:
+            return cached
+
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            cached = self.response_cache.get(key)
+            if cached:
+                return cached
+
+            generations = await redis.read_generations(namespaces)
+            return await asyncio.to_thread(self._render_and_store, generations)
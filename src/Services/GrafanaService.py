@@ -0,0 +1,132 @@
+import json
+from typing import Dict, List, Optional
+
+from src.Domain.GrafanaDomain import GrafanaDomain
+from src.Services.HistoryService import HistoryService
+from src.Services.ExpositionService import ExpositionService
+from src.Services.RedisService import RedisService
+
+
+class GrafanaService:
+    """
+    Endpoints del datasource JSON API de Grafana (/search, /query, /annotations).
+    Las series salen del historial por tabla y la tabla de sentencias de la
+    generación vigente; el filtrado, top-N, agrupación y buckets se hacen aquí
+    para devolver solo los puntos que el panel va a dibujar.
+
+    Opciones por consulta (payload del target en Grafana):
+        target    target de base de datos (por defecto el primero)
+        tables    lista de tablas a incluir
+        top       N tablas (o sentencias) de mayor total en la ventana
+        group_by  "table" (una serie por tabla) o "total"
+        bucket    ancho del bucket en segundos (por defecto según el panel)
+        sort_by   columna de orden para "statements"
+    """
+
+    def __init__(
+        self,
+        redis: RedisService,
+        history: Optional[HistoryService],
+        targets: List[str],
+        instance_of: Optional[Dict[str, str]] = None,
+    ):
+        self.redis = redis
+        self.history = history
+        self.targets = targets
+        # instancia de cada target: las sentencias (heavy) son de toda la
+        # instancia y se publican solo en la generación de su primer target
+        self.instance_of = instance_of or {}
+
+    # ------------------- /search -------------------
+    def search(self, body: Dict) -> List[str]:
+        return GrafanaDomain.search((body or {}).get("target", ""))
+
+    # ------------------- /query -------------------
+    def query(self, body: Dict) -> List[Dict]:
+        body = body or {}
+        start, end = self._range(body)
+        width = GrafanaDomain.bucket_width(start, end, body.get("intervalMs"), body.get("maxDataPoints"))
+
+        # puntos leídos por (target, ancho): varias consultas del panel comparten lectura
+        windows: Dict = {}
+        result = []
+        for item in body.get("targets", []):
+            if item.get("hide") or not item.get("target"):
+                continue
+            options = self._options(item)
+            target = options.get("target") or self.targets[0]
+            if target not in self.targets:
+                raise ValueError(f"target desconocido: {target}")
+            metric = item["target"]
+
+            if metric == GrafanaDomain.STATEMENTS:
+                result.append(GrafanaDomain.statements_table(
+                    self._statements(target),
+                    tables=options.get("tables"),
+                    top=options.get("top"),
+                    sort_by=options.get("sort_by", "cpu_time_total"),
+                ))
+                continue
+
+            section, field = GrafanaDomain.parse_metric(metric)
+            bucket = GrafanaDomain.align_width(float(options.get("bucket") or width))
+            key = (target, bucket)
+            if key not in windows:
+                windows[key] = self._points(target, start, end, bucket)
+            points = windows[key]
+
+            totals = GrafanaDomain.table_totals(points, section, field)
+            tables = GrafanaDomain.select_tables(totals, options.get("tables"), options.get("top"))
+
+            if item.get("type") == "table":
+                result.append(GrafanaDomain.totals_table(totals, tables, field))
+                continue
+
+            group_by = options.get("group_by", "table")
+            series = GrafanaDomain.timeseries(points, section, field, bucket, tables, group_by)
+            for name, datapoints in series.items():
+                label = name if group_by == "table" else f"{target} {metric}"
+                result.append({"target": label, "datapoints": datapoints})
+        return result
+
+    # ------------------- /annotations -------------------
+    def annotations(self, body: Dict) -> List[Dict]:
+        body = body or {}
+        start, end = self._range(body)
+        annotation = body.get("annotation") or {}
+        query = (annotation.get("query") or "").strip()
+        targets = [query] if query in self.targets else self.targets
+
+        # las tablas nuevas se conservan al agregar: un nivel grueso basta
+        width = GrafanaDomain.bucket_width(start, end, None, 500)
+        result = []
+        for target in targets:
+            for item in GrafanaDomain.new_table_annotations(self._points(target, start, end, width), target):
+                result.append({**item, "annotation": annotation})
+        return result
+
+    # ------------------- Auxiliares -------------------
+    @staticmethod
+    def _range(body: Dict):
+        time_range = body.get("range") or {}
+        if "from" not in time_range or "to" not in time_range:
+            raise ValueError("falta range.from / range.to")
+        return GrafanaDomain.parse_time(time_range["from"]), GrafanaDomain.parse_time(time_range["to"])
+
+    @staticmethod
+    def _options(item: Dict) -> Dict:
+        # versiones nuevas del plugin usan "payload"; las anteriores "data"
+        options = item.get("payload") or item.get("data") or {}
+        if isinstance(options, str):
+            options = json.loads(options) if options.strip() else {}
+        return options
+
+    def _points(self, target: str, start: float, end: float, width: int) -> List[Dict]:
+        if not self.history:
+            return []
+        return self.history.read_window(target, start, end, width)
+
+    def _statements(self, target: str) -> List[Dict]:
+        _, sections = self.redis.read_generations([self.instance_of.get(target, target)])[0]
+        raw = sections.get(ExpositionService.STATEMENTS_SECTION)
+        return json.loads(raw) if raw else []
@@ -0,0 +1,156 @@
+import json
+import time
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.Domain.HistoryDomain import HistoryDomain
+from src.Services.RedisService import RedisService
+
+
+class HistoryService:
+    """
+    Historial de deltas por tabla en Redis, en tres niveles acotados:
+    crudo (un punto por ciclo), 5 minutos y 1 hora.
+    Cada nivel es un sorted set `<target>:history:<nivel>` con el epoch como
+    score, así una ventana se lee con ZRANGEBYSCORE sin traer todo el historial.
+    Al cerrarse un intervalo de 5 minutos (llega un punto del siguiente) se
+    agrega en el nivel 5m, y al cerrarse una hora los 5m se agregan en 1h.
+    """
+
+    # nivel -> ancho del intervalo en segundos (0 = crudo)
+    TIERS = {"raw": 0, "5m": 300, "1h": 3600}
+
+    def __init__(
+        self,
+        redis: RedisService,
+        raw_points: int = 1440,
+        five_minute_points: int = 2016,
+        hour_points: int = 2160,
+        cycle: float = 60,
+    ):
+        self.redis = redis
+        # puntos máximos por nivel: por defecto 24 h crudo (con ciclos de 60 s), 7 días en 5m, 90 días en 1h
+        self.max_points = {"raw": raw_points, "5m": five_minute_points, "1h": hour_points}
+        # segundos entre ciclos (SCHEDULE_INTERVAL): lo que abarca un punto crudo
+        self.cycle = cycle
+        # último ts crudo guardado por target (se lee de Redis al arrancar)
+        self._last_ts: Dict[str, Optional[float]] = {}
+        self._lock = Lock()
+
+    # ------------------- Escritura -------------------
+    def append(
+        self,
+        target: str,
+        heavy_deltas: Dict,
+        freq_deltas: Dict,
+        snapshot: str,
+        ts: Optional[float] = None,
+        fence: Optional[Tuple[str, str]] = None,
+    ) -> bool:
+        """
+        Guarda el punto del ciclo y agrega los intervalos que se cerraron.
+        fence: (clave_lease, dueño); si el lease ya no es de ese dueño no se
+        escribe nada y se devuelve False.
+        """
+        ts = time.time() if ts is None else ts
+        point = HistoryDomain.build_point(ts, snapshot, heavy_deltas, freq_deltas)
+
+        previous = self._previous_ts(target)
+        if not self._put(target, "raw", point, fence):
+            return False
+        with self._lock:
+            self._last_ts[target] = ts
+
+        if previous is not None:
+            self._close_buckets(target, previous, ts, fence)
+        return True
+
+    def _close_buckets(self, target: str, previous: float, ts: float, fence: Optional[Tuple[str, str]] = None):
+        """Agrega los intervalos del punto anterior si el nuevo ya cae en otro."""
+        lower = "raw"
+        for tier in ("5m", "1h"):
+            width = self.TIERS[tier]
+            closed = HistoryDomain.bucket_start(previous, width)
+            if closed == HistoryDomain.bucket_start(ts, width):
+                return
+            points = self._read(target, lower, closed, f"({closed + width}")
+            rolled = HistoryDomain.rollup(points, closed)
+            if rolled and not self._put(target, tier, rolled, fence):
+                return
+            lower = tier
+
+    def _previous_ts(self, target: str) -> Optional[float]:
+        with self._lock:
+            if target in self._last_ts:
+                return self._last_ts[target]
+        last = self.redis.zset_last(self._key(target, "raw"))
+        return last[1] if last else None
+
+    def _put(self, target: str, tier: str, point: Dict, fence: Optional[Tuple[str, str]] = None) -> bool:
+        return self.redis.zset_put(
+            self._key(target, tier),
+            json.dumps(point, separators=(",", ":")),
+            point["ts"],
+            self.max_points[tier],
+            fence=fence,
+        )
+
+    # ------------------- Lectura -------------------
+    def read(
+        self,
+        target: str,
+        start: float,
+        end: float,
+        tier: str = "auto",
+        tables: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None,
+    ) -> Dict:
+        """
+        Puntos de [start, end] (epoch). tier="auto" elige el nivel más fino
+        que aún conserva start. tables filtra las tablas de cada punto.
+        """
+        if tier == "auto":
+            tier = self.resolve_tier(start)
+        if tier not in self.TIERS:
+            raise ValueError(f"nivel de historial desconocido: {tier}")
+
+        points = HistoryDomain.filter_tables(self._read(target, tier, start, end, limit), tables)
+        return {"target": target, "tier": tier, "points": points}
+
+    def read_window(self, target: str, start: float, end: float, width: int = 0) -> List[Dict]:
+        """
+        Puntos de [start, end] del nivel más grueso cuyo intervalo no supera
+        width (o el que exija la antigüedad de start). El tramo reciente que
+        ese nivel aún no agregó se completa con los niveles más finos.
+        """
+        order = list(self.TIERS)  # de fino a grueso
+        wanted = max(i for i, tier in enumerate(order) if self.TIERS[tier] <= max(width, 0))
+        chosen = max(wanted, order.index(self.resolve_tier(start)))
+
+        points: List[Dict] = []
+        cursor = start
+        for tier in reversed(order[:chosen + 1]):
+            found = self._read(target, tier, cursor, end)
+            if found:
+                points.extend(found)
+                # el último punto agregado cubre hasta ts + ancho del nivel
+                cursor = found[-1]["ts"] + (self.TIERS[tier] or 0.001)
+        return points
+
+    def resolve_tier(self, start: float, now: Optional[float] = None) -> str:
+        now = time.time() if now is None else now
+        age = now - start
+        # el crudo tiene un punto por ciclo del scheduler
+        if age <= self.max_points["raw"] * self.cycle:
+            return "raw"
+        if age <= self.max_points["5m"] * self.TIERS["5m"]:
+            return "5m"
+        return "1h"
+
+    def _read(self, target: str, tier: str, start, end, limit: Optional[int] = None) -> List[Dict]:
+        raw = self.redis.zset_range_by_score(self._key(target, tier), start, end, limit)
+        return [json.loads(item) for item in raw]
+
+    @staticmethod
+    def _key(target: str, tier: str) -> str:
+        return f"{target}:history:{tier}"
@@ -0,0 +1,139 @@
+import logging
+import os
+import socket
+import time
+import uuid
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional, Tuple
+
+from src.Services.RedisService import RedisService
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElectionService:
+    """
+    Un lease en Redis por instancia (`{<instancia>}:collector:leader`) decide qué
+    recolector la procesa: se toma con SET NX PX y el dueño lo renueva en
+    segundo plano cada `renew_every` segundos.
+    Si el líder cae, el lease vence a los `ttl` segundos y otra réplica lo
+    toma en su siguiente ronda; las escrituras llevan el lease como fence,
+    así un líder que lo perdió (pausa larga, red caída) no pisa al nuevo.
+    """
+
+    # Margen por deriva de reloj: localmente el lease se da por perdido un poco antes
+    DRIFT_FACTOR = 0.1
+
+    def __init__(
+        self,
+        redis: RedisService,
+        names: List[str],
+        owner: Optional[str] = None,
+        ttl: int = 30,
+        renew_every: int = 10,
+    ):
+        if renew_every >= ttl:
+            raise ValueError("renew_every debe ser menor que ttl")
+        self.redis = redis
+        self.names = list(names)
+        self.owner = owner or self.default_owner()
+        self.ttl_ms = ttl * 1000
+        self.renew_every = renew_every
+        # target -> instante (monotonic) hasta el que el lease se considera propio
+        self._deadlines: Dict[str, float] = {}
+        self._counters = {"acquired": 0, "lost": 0, "errors": 0}
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    @staticmethod
+    def default_owner() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @staticmethod
+    def lease_key(name: str) -> str:
+        """Con el hash tag de la instancia: mismo slot que sus generaciones (ExpositionService)."""
+        return f"{{{name}}}:collector:leader"
+
+    # ------------------- Consulta -------------------
+    def is_leader(self, name: str) -> bool:
+        with self._lock:
+            return time.monotonic() < self._deadlines.get(name, 0)
+
+    def fence(self, name: str) -> Tuple[str, str]:
+        """(clave del lease, dueño) para publicar solo si el lease sigue siendo propio."""
+        return self.lease_key(name), self.owner
+
+    def fenced_out(self, name: str):
+        """
+        Una escritura con fence fue rechazada: el lease ya es de otro
+        recolector. Se da por perdido localmente sin esperar a que venza, así
+        no se siguen intentando escrituras hasta la próxima campaña.
+        """
+        with self._lock:
+            if self._deadlines.pop(name, None) is None:
+                return
+            self._counters["lost"] += 1
+        logger.warning("[leader:%s] escritura rechazada por fence: lease perdido por %s", name, self.owner)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    # ------------------- Campaña -------------------
+    def campaign(self):
+        """Renueva los leases propios e intenta tomar los que estén libres."""
+        for name in self.names:
+            started = time.monotonic()
+            held = self.is_leader(name)
+            try:
+                # renovar primero: el lease puede seguir siendo propio en Redis
+                # aunque localmente se haya dado por vencido
+                key = self.lease_key(name)
+                ok = (
+                    self.redis.renew_lease(key, self.owner, self.ttl_ms)
+                    or self.redis.acquire_lease(key, self.owner, self.ttl_ms)
+                )
+            except Exception as e:
+                # sin Redis no se renueva: el lease local vence solo
+                logger.warning("[leader:%s] no se pudo renovar el lease: %s", name, e)
+                with self._lock:
+                    self._counters["errors"] += 1
+                continue
+
+            with self._lock:
+                if ok:
+                    validity = self.ttl_ms / 1000 * (1 - self.DRIFT_FACTOR)
+                    self._deadlines[name] = started + validity
+                    if not held:
+                        self._counters["acquired"] += 1
+                        logger.info("[leader:%s] lease tomado por %s", name, self.owner)
+                elif held:
+                    self._deadlines.pop(name, None)
+                    self._counters["lost"] += 1
+                    logger.warning("[leader:%s] lease perdido por %s", name, self.owner)
+
+    def start(self):
+        """Primera campaña en línea (para que el primer tick ya sepa qué le toca) y luego en un hilo."""
+        self.campaign()
+        self._thread = Thread(target=self._run, name="leader-election", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.renew_every):
+            self.campaign()
+
+    def stop(self):
+        """Detiene la renovación y libera los leases propios para un failover inmediato."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.renew_every)
+        for name in self.names:
+            if not self.is_leader(name):
+                continue
+            with self._lock:
+                self._deadlines.pop(name, None)
+            try:
+                self.redis.release_lease(self.lease_key(name), self.owner)
+            except Exception as e:
+                logger.warning("[leader:%s] no se pudo liberar el lease: %s", name, e)
@@ -3,106 +3,299 @@ from src.Services.DatabaseService import DatabaseService
 from src.Services.RedisService import RedisService
 from src.Domain.QueryDomain import QueryDomain
 from src.Domain.MetricsDomain import MetricsDomain
+from src.Domain.CollectorDomain import CollectorDomain
+from src.Domain.PlanCacheDomain import PlanCacheDomain
+from src.Domain.EnhancedJSONEncoder import EnhancedJSONEncoder
 import pytz
-from settings.AppSettings import TIMEZONE
+from settings.AppSettings import TIMEZONE, SNAPSHOT_FORMAT, SNAPSHOT_COMPRESSION
+from settings.AppSettings import TEXPLAIN_QUERY_MAX_LENGTH, USERS_TOP_K
 from src.Services.PrometheusService import PrometheusService
+from src.Services.QueryAnalysisService import QueryAnalysisService
+from src.Services.PlanCacheService import PlanCacheService
+from src.Services.HistoryService import HistoryService
+from src.Services.ExpositionService import ExpositionService
+from src.Services.LeaderElectionService import LeaderElectionService
+from src.Utils.SnapshotCodec import SnapshotCodec
+from src.Utils.ConnectionPool import ConnectionPool
+from src.Utils.Instrumentation import instruments
+from typing import Dict, List, Optional
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class MetricsService:
-    def __init__(self, redis: RedisService, database: DatabaseService, prometheus: PrometheusService):
+    def __init__(
+        self,
+        redis: RedisService,
+        database: DatabaseService,
+        prometheus: PrometheusService,
+        analyzer: Optional[QueryAnalysisService] = None,
+        plan_cache: Optional[PlanCacheService] = None,
+        target: str = "Baseconta",
+        history: Optional[HistoryService] = None,
+        leader: Optional[LeaderElectionService] = None,
+        live_sets: bool = True,
+        databases: Optional[List[Dict]] = None,
+    ):
         self.redis = redis
         self.database = database
         self.prometheus = prometheus
+        self.analyzer = analyzer or QueryAnalysisService()
+        # Si hay plan_cache la lectura de dm_exec_query_stats es incremental
+        self.plan_cache = plan_cache
+        # Nombre del target: espacio de claves en Redis y etiqueta de cada serie
+        self.target = target
+        self.labels = {"target": target}
+        # Bases de la instancia ({"name", "database"}), la primera es `target`: se
+        # leen en un solo viaje y cada una publica en su propio espacio. Sin
+        # databases, el target es solo la base que se pasa a processRecord.
+        self.databases = databases
+        # Si hay history, los deltas de cada ciclo se guardan en el historial
+        self.history = history
+        # Con leader solo se recolecta (y se escribe) mientras se tenga el lease de la instancia
+        self.leader = leader
+        # Sin live_sets el ciclo solo lee el plan cache: consultas en curso, usuarios
+        # y memoria los publican los colectores livianos (CollectorDomain) con su ritmo
+        self.live_sets = live_sets
+        # Consultas en ejecución vistas en el último ciclo (señal de carga para el planificador)
+        self.last_load = None
         self.timezone = pytz.timezone(TIMEZONE)
 
+    GENERATION_TTL = 3600
+    # Consultas en curso, memoria y pool: si el recolector deja de publicar
+    # vencen antes que el resto de la generación
+    LIVE_SECTIONS = ("QueriesProcessing", "MemoryUsage", "DbPool")
+    LIVE_TTL = 1200
+    STATEMENTS_SECTION = ExpositionService.STATEMENTS_SECTION
+
     # ------------------- Procesamiento principal -------------------
-    def processRecord(self, db_name: str):
+    def processRecord(self, db_name: Optional[str] = None):
+        with instruments.timer("exporter_process_record_seconds", target=self.target):
+            return self._process_record(db_name)
+
+    def _process_record(self, db_name: Optional[str] = None):
+        if self.leader and not self.leader.is_leader(self.target):
+            return "NOT LEADER"
+        fence = self.leader.fence(self.target) if self.leader else None
+        databases = self.databases or [{"name": self.target, "database": db_name}]
+
         snapshot = self._get_current_snapshot()
+        last_snapshots = {database["name"]: self._get_last_snapshot(database["name"]) for database in databases}
+
+        # una sola lectura de los DMV para todas las bases de la instancia
+        self.last_load = None
+        db_names = [database["database"] for database in databases]
+        heavy_raw, freq_raw, queries, users, memory, watermark = self._fetch_db_data(
+            db_names[0] if len(db_names) == 1 else db_names, last_snapshots[self.target]
+        )
+        self.last_load = queries[0]["queries_processing_now"] if queries else None
+        frequent = PlanCacheDomain.by_database(freq_raw, db_names)
+
+        results = {}
+        for database in databases:
+            name = database["name"]
+            if name == self.target:
+                results[name] = self._process_database(
+                    name, heavy_raw, frequent[database["database"]], snapshot, last_snapshots[name],
+                    watermark, fence, (queries, users, memory),
+                )
+            else:
+                results[name] = self._process_database(
+                    name, [], frequent[database["database"]], snapshot, last_snapshots[name], None, fence
+                )
+        return results[self.target]
 
-        heavy_raw, freq_raw, queries, users, memory = self._fetch_db_data()
-        grouped_heavy, grouped_freq = self._normalize_and_group(heavy_raw, freq_raw, snapshot)
+    def _process_database(
+        self, name, heavy_raw, freq_raw, snapshot, last_snapshot, watermark, fence, live_rows=None
+    ):
+        """
+        Un target del ciclo. Solo el de la instancia (live_rows) lleva heavy,
+        texplain, conjuntos en vivo y pool; los demás, la vista frequent de su base.
+        """
+        heavy, grouped_heavy, grouped_freq = self._normalize_and_group(heavy_raw, freq_raw, snapshot)
 
-        current_snapshot = MetricsDomain.build_snapshot(grouped_heavy, grouped_freq, snapshot)
-        last_snapshot = self._get_last_snapshot()
+        current_snapshot = MetricsDomain.build_snapshot(grouped_heavy, grouped_freq, snapshot, watermark)
         if not last_snapshot:
-            self.redis.set("BaseContaLastMetrics", json.dumps(current_snapshot))
+            if not self.redis.set_fenced(self._snapshot_key(name), self._encode_snapshot(current_snapshot), fence):
+                return self._fenced_out()
             return "FIRST SNAPSHOT STORED"
-        combined_text = self._process_deltas(grouped_heavy, grouped_freq, last_snapshot, db_name)
+        heavy_deltas, freq_deltas = self._calculate_deltas(grouped_heavy, grouped_freq, last_snapshot)
+        combined_text = self._render_deltas(heavy_deltas, freq_deltas, {"target": name})
 
-        self._store_simple_metrics(queries, memory)
-        self._store_texplain_metrics(heavy_raw, users)
-        self.redis.set("BaseContaLastMetrics", json.dumps(current_snapshot))
+        sections = {"metrics": combined_text}
+        if live_rows is not None:
+            queries, users, memory = live_rows
+            if self.live_sets:
+                sections.update(self._build_simple_metrics(queries, memory))
+            sections.update(self._build_texplain_metrics(heavy, users))
+            sections["DbPool"] = self._build_pool_metrics()
+
+        # Todo el ciclo del target se publica en una sola escritura atómica
+        # (y solo si el lease de la instancia sigue siendo de este recolector)
+        live_sections = {
+            section: sections.pop(section) for section in self.LIVE_SECTIONS if section in sections
+        }
+        generation = self.redis.publish_generation(
+            self._namespace(name),
+            sections,
+            self.GENERATION_TTL,
+            extra_values={self._snapshot_key(name): self._encode_snapshot(current_snapshot)},
+            fence=fence,
+            live_sections=live_sections,
+            live_ttl=self.LIVE_TTL,
+        )
+        if generation is None:
+            return self._fenced_out()
+        # el historial también va con fence: un líder depuesto no agrega puntos
+        if self.history and not self.history.append(name, heavy_deltas, freq_deltas, snapshot, fence=fence):
+            return self._fenced_out()
 
         return combined_text
 
     # ------------------- Funciones auxiliares -------------------
+    def _fenced_out(self) -> str:
+        """Una escritura con fence fue rechazada: el lease de la instancia ya es de otro."""
+        instruments.inc("exporter_events_total", event="fenced_write_rejected", job="plan_cache")
+        if self.leader:
+            self.leader.fenced_out(self.target)
+        return "NOT LEADER"
+
+    def _namespace(self, name: str) -> str:
+        """Espacio de las generaciones de un target de la instancia (mismo slot que su lease)."""
+        return ExpositionService.target_namespace(name, self.target)
+
+    def _snapshot_key(self, name: Optional[str] = None) -> str:
+        """Último snapshot del target, en el slot de su espacio: va como clave extra de la generación."""
+        return RedisService.namespace_key(self._namespace(name or self.target), "LastMetrics")
+
     def _get_current_snapshot(self):
         return datetime.now(tz=self.timezone).isoformat()
 
-    def _fetch_db_data(self):
-        heavy_raw = self.database.getHeaviesQueries()
-        freq_raw = self.database.getMostRequestedQueries()
-        queries = self.database.getCurrentQueries()
-        users = self.database.getCurrentUsers()
-        memory = self.database.getMemoryUsage()
-        return heavy_raw, freq_raw, queries, users, memory
+    def _fetch_db_data(self, db_name, last_snapshot):
+        """Un solo viaje a SQL Server con todos los conjuntos de resultados del ciclo."""
+        watermark = None
+        if self.plan_cache:
+            stored_watermark = last_snapshot.get("watermark") if last_snapshot else None
+            since = self.plan_cache.resolve_since(stored_watermark)
+            batch = self.database.getCollectionBatch(db_name, incremental=True, since=since, live=self.live_sets)
+            heavy_raw, freq_raw, watermark = self.plan_cache.apply(batch["plan_cache"], since, db_name)
+        else:
+            batch = self.database.getCollectionBatch(db_name, live=self.live_sets)
+            heavy_raw = batch["heavy"]
+            freq_raw = batch["frequent"]
+        return heavy_raw, freq_raw, batch["queries"], batch["users"], batch["memory"], watermark
 
     def _normalize_and_group(self, heavy_raw, freq_raw, snapshot):
-        heavy = MetricsDomain.normalize_queries(heavy_raw, snapshot, QueryDomain.getMainTable)
-        freq = MetricsDomain.normalize_queries(freq_raw, snapshot, QueryDomain.getMainTable)
-        grouped_heavy = MetricsDomain.group_heavy_queries(heavy)
-        grouped_freq = MetricsDomain.group_frequent_queries(freq)
-        return grouped_heavy, grouped_freq
-
-    def _get_last_snapshot(self):
-        last_snapshot_raw = self.redis.get_value("BaseContaLastMetrics")
-        return json.loads(last_snapshot_raw) if last_snapshot_raw else None
-
-    def _process_deltas(self, grouped_heavy, grouped_freq, last_snapshot, db_name):
-        new_heavy = MetricsDomain.detect_new_tables(last_snapshot["heavy"], grouped_heavy)
-        new_freq = MetricsDomain.detect_new_tables(last_snapshot["frequent"], grouped_freq)
-        heavy_deltas = MetricsDomain.calculate_deltas(last_snapshot["heavy"], grouped_heavy, new_heavy)
-        freq_deltas = MetricsDomain.calculate_deltas(last_snapshot["frequent"], grouped_freq, new_freq)
-
-        main_text = self.prometheus.generate_text(heavy_deltas, "heavy")
-        freq_text = self.prometheus.generate_text(freq_deltas, "freq")
-        combined_text = main_text + "\n" + freq_text
-
-        self.redis.set(f"metrics:{db_name}", combined_text, ttl=86400)
-        return combined_text
+        with instruments.timer("exporter_stage_seconds", stage="normalize"):
+            heavy = MetricsDomain.normalize_queries(
+                heavy_raw, snapshot, QueryDomain.getMainTable, self.analyzer.analyze
+            )
+            freq = MetricsDomain.normalize_queries(
+                freq_raw, snapshot, QueryDomain.getMainTable, self.analyzer.analyze
+            )
+        with instruments.timer("exporter_stage_seconds", stage="group"):
+            grouped_heavy = MetricsDomain.group_heavy_queries(heavy)
+            grouped_freq = MetricsDomain.group_frequent_queries(freq)
+        return heavy, grouped_heavy, grouped_freq
+
+    def _get_last_snapshot(self, target: Optional[str] = None):
+        # Acepta tanto el formato binario como el JSON de versiones anteriores.
+        # Un snapshot ilegible cuenta como ausente: el ciclo guarda uno nuevo
+        # en lugar de fallar en cada ciclo. SnapshotCodec.decode informa todo
+        # error de formato (también JSON inválido) como ValueError.
+        key = self._snapshot_key(target)
+        try:
+            snapshot = SnapshotCodec.decode(self.redis.get_bytes(key))
+        except ValueError as e:
+            instruments.inc("exporter_events_total", event="snapshot_corrupt")
+            logger.warning("[%s] snapshot ilegible, se reemplaza: %s", key, e)
+            return None
+        if snapshot is not None and not (
+            isinstance(snapshot, dict)
+            and isinstance(snapshot.get("heavy"), dict)
+            and isinstance(snapshot.get("frequent"), dict)
+        ):
+            instruments.inc("exporter_events_total", event="snapshot_corrupt")
+            logger.warning("[%s] snapshot sin secciones heavy/frequent, se reemplaza", key)
+            return None
+        return snapshot
 
-    def _store_simple_metrics(self, queries, memory):
-        queries_text = self.prometheus.generate_simple_gauge(
-            "db_current_queries",
-            "Consultas ejecutándose ahora en SQL Server",
-            queries[0]["queries_processing_now"]
+    def _encode_snapshot(self, snapshot):
+        return SnapshotCodec.encode(
+            snapshot,
+            binary=SNAPSHOT_FORMAT == "BINARY",
+            compress=SNAPSHOT_COMPRESSION,
         )
-        self.redis.set("BaseContaQueriesProcessing", queries_text, 1200)
-
-        memory_text = ""
-        for key, value in memory[0].items():
-            memory_text += self.prometheus.generate_simple_gauge(
-                f"db_memory_{key}",
-                f"Métrica de memoria SQL Server: {key}",
-                value
-            )
-        self.redis.set("BaseContaMemoryUsage", memory_text, 1200)
 
-    def _store_texplain_metrics(self, heavy_raw, users):
-        texplain = MetricsDomain.generate_texplain_top10(heavy_raw, QueryDomain.getMainTable)
-        texplain_text = self.prometheus.generate_texplain_gauges(texplain)
-        self.redis.set("BaseContaTexplainTop10", texplain_text, 3600)
+    def _calculate_deltas(self, grouped_heavy, grouped_freq, last_snapshot):
+        with instruments.timer("exporter_stage_seconds", stage="deltas"):
+            new_heavy = MetricsDomain.detect_new_tables(last_snapshot["heavy"], grouped_heavy)
+            new_freq = MetricsDomain.detect_new_tables(last_snapshot["frequent"], grouped_freq)
+            heavy_deltas = MetricsDomain.calculate_deltas(last_snapshot["heavy"], grouped_heavy, new_heavy)
+            freq_deltas = MetricsDomain.calculate_deltas(last_snapshot["frequent"], grouped_freq, new_freq)
+        return heavy_deltas, freq_deltas
+
+    def _render_deltas(self, heavy_deltas, freq_deltas, labels):
+        main_text = self.prometheus.generate_text(heavy_deltas, "heavy", labels)
+        freq_text = self.prometheus.generate_text(freq_deltas, "freq", labels)
+        return main_text + "\n" + freq_text
+
+    def _build_simple_metrics(self, queries, memory):
+        # vacíos si el lote viene sin conjuntos en vivo (p. ej. capturas con colectores)
+        return {
+            "QueriesProcessing": CollectorDomain.render("current_queries", queries, self.prometheus, self.labels),
+            "MemoryUsage": CollectorDomain.render("memory", memory, self.prometheus, self.labels),
+        }
 
-        texplain_users = MetricsDomain.generate_texplain_users(users)
-        text_pain_users = self.prometheus.generate_texplain_users_gauges(texplain_users=texplain_users)
-        self.redis.set("BaseContaTexplainUsers", json.dumps(text_pain_users), 3600)
+    def _build_texplain_metrics(self, heavy, users):
+        # todas las sentencias del ciclo: el TOP 10 va a Prometheus y la lista
+        # completa queda en la generación para las consultas de Grafana
+        statements = MetricsDomain.generate_texplain_top10(heavy, QueryDomain.getMainTable, limit=None)
+        texplain_text = self.prometheus.generate_texplain_gauges(
+            statements[:10], self.labels, query_max_length=TEXPLAIN_QUERY_MAX_LENGTH
+        )
+
+        sections = {
+            "TexplainTop10": texplain_text,
+            self.STATEMENTS_SECTION: json.dumps(statements, cls=EnhancedJSONEncoder),
+        }
+        if self.live_sets:
+            texplain_users = MetricsDomain.generate_texplain_users(users, top=USERS_TOP_K)
+            sections["TexplainUsers"] = self.prometheus.generate_texplain_users_gauges(
+                texplain_users=texplain_users, labels=self.labels
+            )
+        return sections
+
+    def _build_pool_metrics(self):
+        # ocupación como gauge; checkouts, timeouts y demás acumulados como counter (*_total)
+        stats = self.database.getPoolStats()
+        gauges = self.prometheus.generate_gauges(
+            [
+                (f"exporter_db_pool_{key}", f"Pool de conexiones a SQL Server: {key}", value)
+                for key, value in stats.items()
+                if key not in ConnectionPool.COUNTERS
+            ],
+            self.labels
+        )
+        counters = self.prometheus.generate_counters(
+            [
+                (f"exporter_db_pool_{key.removesuffix('_total')}_total", f"Pool de conexiones a SQL Server: {key}", value)
+                for key, value in stats.items()
+                if key in ConnectionPool.COUNTERS
+            ],
+            self.labels
+        )
+        return gauges + counters
 
+    def namespaces(self) -> List[str]:
+        """Espacio de claves de cada base de la instancia; el primero es el de la instancia."""
+        return [self._namespace(database["name"]) for database in self.databases or [{"name": self.target}]]
 
     def fetchRecords(self):
-        record = self.redis.get_value("metrics:Baseconta")
-        mem = self.redis.get_value("BaseContaMemoryUsage")
-        q = self.redis.get_value("BaseContaQueriesProcessing")
-        user = self.redis.get_value("BaseContaTexplainUsers")
-        rop = self.redis.get_value("BaseContaTexplainTop10")
-        return "\n".join(filter(None, [record, q, mem, rop, user]))
+        # una generación por base; solo la primera trae las series de la instancia
+        return "\n".join(filter(None, (
+            ExpositionService.render_generation(sections)
+            for _, sections in self.redis.read_generations(self.namespaces())
+        )))
@@ -0,0 +1,62 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from src.Domain.PlanCacheDomain import PlanCacheDomain
+from src.Services.DatabaseService import DatabaseService
+
+
+class PlanCacheService:
+    """
+    Mantiene una copia local de sys.dm_exec_query_stats y la actualiza de forma
+    incremental: cada ciclo solo se leen las sentencias cuya última ejecución
+    terminó (last_completion_time) después del watermark del ciclo anterior.
+    Cada `full_scan_every` ciclos se hace un escaneo completo para descartar
+    planes que SQL Server ya sacó del cache.
+    """
+
+    def __init__(self, database: DatabaseService, full_scan_every: int = 60, top: int = 50):
+        self.database = database
+        self.full_scan_every = full_scan_every
+        self.top = top
+        self.entries: Dict[str, Dict] = {}
+        self.watermark: Optional[datetime] = None
+        self.cycles_since_full_scan = 0
+
+    def apply(
+        self, rows: List[Dict], since: Optional[datetime], db_name: Union[str, Sequence[str]]
+    ) -> Tuple[List[Dict], List[Dict], Optional[str]]:
+        """
+        Mezcla las filas del plan cache leídas en el lote de recolección
+        con el `since` que devolvió resolve_since() y devuelve
+        (heavy_raw, freq_raw, watermark).
+        db_name: una base o todas las de la instancia; frequent trae el TOP de cada una.
+        """
+        if since is None:
+            self.entries = {}
+            self.watermark = None
+            self.cycles_since_full_scan = 0
+        else:
+            self.cycles_since_full_scan += 1
+
+        self.watermark = PlanCacheDomain.merge(self.entries, rows, self.watermark)
+
+        heavy = PlanCacheDomain.top_heavy(self.entries.values(), self.top)
+        freq = [
+            row
+            for name in ((db_name,) if isinstance(db_name, str) else db_name)
+            for row in PlanCacheDomain.top_frequent(self.entries.values(), name, self.top)
+        ]
+        return heavy, freq, self.watermark.isoformat() if self.watermark else None
+
+    def resolve_since(self, stored_watermark: Optional[str]) -> Optional[datetime]:
+        """
+        Solo se lee de forma incremental si el estado local está caliente y
+        coincide con el watermark publicado; si no, escaneo completo.
+        """
+        if not self.entries or self.watermark is None:
+            return None
+        if self.cycles_since_full_scan >= self.full_scan_every:
+            return None
+        if stored_watermark != self.watermark.isoformat():
+            return None
+        return self.watermark
@@ -1,95 +1,245 @@
-from prometheus_client import CollectorRegistry, Gauge, generate_latest
+from typing import Dict, List, Optional, Tuple
+
+from src.Utils.ExpositionWriter import ExpositionWriter
+from src.Utils.Instrumentation import instruments
 
 class PrometheusService:
     def __init__(self):
         pass
 
-    def generate_text(self, deltas: dict, metric_type: str):
+    @instruments.timed("exporter_render_seconds", method="generate_text")
+    def generate_text(self, deltas: dict, metric_type: str, labels: Optional[Dict[str, str]] = None):
         """
         Genera textPlain de Prometheus a partir de un dict de métricas.
         metric_type: 'heavy' o 'freq'
+        labels: etiquetas fijas añadidas a cada serie (p. ej. target)
         """
-        registry = CollectorRegistry()
-        gauges_cache = {}
+        labels = labels or {}
+        writer = ExpositionWriter()
 
         for table, metrics in deltas.items():
             for key, value in metrics.items():
                 if key == "is_new_table":
                     continue
 
-                gauge_name = f"db_{metric_type}_{key}"
-
-                if gauge_name not in gauges_cache:
-                    gauges_cache[gauge_name] = Gauge(
-                        gauge_name,
-                        f"Métrica {metric_type} {key}",
-                        ["table", "is_new_table"],
-                        registry=registry,
-                    )
-
-                gauges_cache[gauge_name].labels(
-                    table=table,
-                    is_new_table=str(metrics["is_new_table"]),
-                ).set(value)
+                writer.gauge(
+                    f"db_{metric_type}_{key}",
+                    f"Métrica {metric_type} {key}",
+                    value,
+                    {"table": table, "is_new_table": str(metrics["is_new_table"]), **labels},
+                )
 
-        return generate_latest(registry).decode("utf-8")
+        return writer.render()
 
-    def generate_simple_gauge(self, name: str, description: str, value: float):
+    @instruments.timed("exporter_render_seconds", method="generate_simple_gauge")
+    def generate_simple_gauge(self, name: str, description: str, value: float, labels: Optional[Dict[str, str]] = None):
         """
         Genera textPlain simple para un único gauge.
         """
-        registry = CollectorRegistry()
-        g = Gauge(name, description, registry=registry)
-        g.set(value)
-        return generate_latest(registry).decode("utf-8")
+        return self.generate_gauges([(name, description, value)], labels)
 
-    def generate_texplain_gauges(self, texplain_top10):
+    @instruments.timed("exporter_render_seconds", method="generate_gauges")
+    def generate_gauges(self, gauges: List[Tuple], labels: Optional[Dict[str, str]] = None):
+        """
+        Varios gauges (nombre, descripción, valor[, etiquetas propias]) en un solo
+        texto, con un único bloque # HELP / # TYPE por nombre.
+        Sin etiquetas propias equivale a concatenar generate_simple_gauge de cada uno.
+        """
+        labels = labels or {}
+        writer = ExpositionWriter()
+        for name, description, value, *own_labels in gauges:
+            writer.gauge(name, description, value, {**labels, **own_labels[0]} if own_labels else labels)
+        return writer.render()
+
+    @instruments.timed("exporter_render_seconds", method="generate_counters")
+    def generate_counters(self, counters: List[Tuple], labels: Optional[Dict[str, str]] = None):
+        """
+        Como generate_gauges pero con # TYPE counter: valores acumulados desde
+        el arranque del proceso (Prometheus calcula rate() sobre ellos).
+        """
+        labels = labels or {}
+        writer = ExpositionWriter()
+        for name, description, value, *own_labels in counters:
+            writer.counter(name, description, value, {**labels, **own_labels[0]} if own_labels else labels)
+        return writer.render()
+
+    # Contadores de texplain que se suman si dos filas comparten huella
+    TEXPLAIN_SUMMED = (
+        "cpu_time_total", "duration_total", "logical_reads_total", "logical_writes_total", "physical_reads_total",
+    )
+
+    @instruments.timed("exporter_render_seconds", method="generate_texplain_gauges")
+    def generate_texplain_gauges(
+        self,
+        texplain_top10,
+        labels: Optional[Dict[str, str]] = None,
+        query_max_length: Optional[int] = 1024,
+    ):
         """
         Recibe la lista generada por generate_texplain_top10 y devuelve
-        un string para exportar a Prometheus, incluyendo query_text.
+        un string para exportar a Prometheus.
+        Las series llevan la huella corta de la sentencia (fingerprint); el
+        texto va una sola vez por huella en texplain_query_info (valor 1,
+        recortado a query_max_length), para unirlo en la consulta:
+            texplain_cpu_time_total * on(target, fingerprint) group_left(query) texplain_query_info
+        El puesto no es etiqueta (cada cambio del TOP crearía y retiraría
+        series): va como valor en texplain_rank. Si dos filas comparten huella
+        (planes de una misma sentencia) se suman en una sola serie con el
+        mejor puesto.
         """
-        lines = []
-
+        extra = labels or {}
+        statements: Dict[str, Dict] = {}
         for row in texplain_top10:
-            labels = f'rank="{row["rank"]}",table="{row["table"]}",query="{row["query_text"]}"'
+            fingerprint = row.get("fingerprint") or ""
+            statement = statements.get(fingerprint)
+            if statement is None:
+                statements[fingerprint] = dict(row, fingerprint=fingerprint)
+                continue
+            for field in self.TEXPLAIN_SUMMED:
+                statement[field] += row[field]
+            statement["plan_reuse_count"] = max(statement["plan_reuse_count"], row["plan_reuse_count"])
 
-            lines.append(f'texplain_cpu_time_total{{{labels}}} {row["cpu_time_total"]}')
-            lines.append(f'texplain_duration_total{{{labels}}} {row["duration_total"]}')
-            lines.append(f'texplain_logical_reads_total{{{labels}}} {row["logical_reads_total"]}')
-            lines.append(f'texplain_logical_writes_total{{{labels}}} {row["logical_writes_total"]}')
-            lines.append(f'texplain_physical_reads_total{{{labels}}} {row["physical_reads_total"]}')
-            lines.append(f'texplain_plan_reuse_count{{{labels}}} {row["plan_reuse_count"]}')
+        lines = []
+        for fingerprint, row in statements.items():
+            query = row["query_text"]
+            if query_max_length and len(query) > query_max_length:
+                query = query[:query_max_length] + "…"
+            info_labels = ExpositionWriter.format_labels(
+                {"fingerprint": fingerprint, "table": row["table"], "query": query, **extra},
+                sort_labels=False,
+            )
+            lines.append(f'texplain_query_info{info_labels} 1')
+
+            series_labels = ExpositionWriter.format_labels(
+                {"table": row["table"], "fingerprint": fingerprint, **extra},
+                sort_labels=False,
+            )
+            lines.append(f'texplain_rank{series_labels} {row["rank"]}')
+            for field in self.TEXPLAIN_SUMMED:
+                lines.append(f'texplain_{field}{series_labels} {row[field]}')
+            lines.append(f'texplain_plan_reuse_count{series_labels} {row["plan_reuse_count"]}')
 
         return "\n".join(lines)
 
-    def generate_texplain_users_gauges(self, texplain_users):
+    @instruments.timed("exporter_render_seconds", method="generate_texplain_users_gauges")
+    def generate_texplain_users_gauges(self, texplain_users, labels: Optional[Dict[str, str]] = None):
         """
         Genera textPlain Prometheus a partir de un diccionario de usuarios conectados.
+        El puesto va como valor en user_rank, no como etiqueta.
         """
-        registry = CollectorRegistry()
-        gauges_cache = {}
+        labels = labels or {}
+        writer = ExpositionWriter()
 
         for row in texplain_users:
-            host = row["host_name"]
-            client = row["client_net_address"]
-            program = row["program_name"]
-            rank = str(row["rank"])
-
-            gauge_name = "user_requests_running_now"
-
-            if gauge_name not in gauges_cache:
-                gauges_cache[gauge_name] = Gauge(
-                    gauge_name,
-                    "Número de requests activas por usuario",
-                    ["host_name", "client_net_address", "program_name", "rank"],
-                    registry=registry
-                )
+            user_labels = {
+                "host_name": row["host_name"],
+                "client_net_address": row["client_net_address"],
+                "program_name": row["program_name"],
+                **labels,
+            }
+            writer.gauge(
+                "user_requests_running_now",
+                "Número de requests activas por usuario",
+                row["requests_running_now"],
+                user_labels,
+            )
+            writer.gauge("user_rank", "Puesto del usuario por requests activas", row["rank"], user_labels)
+
+        return writer.render()
+
+    @instruments.timed("exporter_render_seconds", method="merge_expositions")
+    def merge_expositions(self, texts: List[str]) -> str:
+        """
+        Une varios textos de exposición (uno por target) agrupando las líneas
+        de cada métrica: un solo # HELP / # TYPE y todas sus muestras juntas.
+        """
+        return self.merge_expositions_limited(texts)[0]
+
+    def merge_expositions_limited(
+        self,
+        texts: List[str],
+        max_series: Optional[int] = None,
+        shed_prefixes: Tuple[str, ...] = (),
+    ) -> Tuple[str, int]:
+        """
+        merge_expositions con presupuesto de series: devuelve (texto, descartadas).
+        Las familias cuyo nombre empieza con shed_prefixes (alta cardinalidad:
+        texplain, usuarios) ocupan solo el presupuesto que dejan las demás: se
+        recortan por texto de origen (un target) al mismo número de muestras,
+        las primeras de cada uno, es decir los primeros puestos de su ranking.
+        Así el presupuesto se reparte por puesto entre todos los targets (el
+        puesto 1 de cada uno antes que el 2 de cualquiera) y una sentencia
+        conserva todas sus series o ninguna. Las demás (deltas por tabla,
+        memoria, exporter) nunca se descartan.
+        """
+        families = self._group_families(texts)
+
+        dropped = 0
+        if max_series:
+            shed = [f for name, f in families.items() if name.startswith(shed_prefixes)]
+            remaining = max_series - sum(
+                len(f["samples"]) for name, f in families.items() if not name.startswith(shed_prefixes)
+            )
+            # muestras de cada familia recortable por texto de origen
+            per_source = [list(self._count_by_source(f["sources"]).values()) for f in shed]
+            # mayor k tal que k muestras de cada origen en cada familia entren en lo que queda
+            keep = max((count for counts in per_source for count in counts), default=0)
+            while keep > 0 and sum(min(keep, count) for counts in per_source for count in counts) > remaining:
+                keep -= 1
+            for family in shed:
+                before = len(family["samples"])
+                self._keep_per_source(family, keep)
+                dropped += before - len(family["samples"])
 
-            gauges_cache[gauge_name].labels(
-                host_name=host,
-                client_net_address=client,
-                program_name=program,
-                rank=rank
-            ).set(row["requests_running_now"])
+        lines = []
+        for family in families.values():
+            lines.extend(family["meta"])
+            lines.extend(family["samples"])
+        return ("\n".join(lines) + "\n" if lines else ""), dropped
+
+    @staticmethod
+    def _count_by_source(sources: List[int]) -> Dict[int, int]:
+        counts: Dict[int, int] = {}
+        for source in sources:
+            counts[source] = counts.get(source, 0) + 1
+        return counts
+
+    @staticmethod
+    def _keep_per_source(family: Dict[str, List], keep: int):
+        """Deja las primeras `keep` muestras de cada texto de origen, en su orden."""
+        seen: Dict[int, int] = {}
+        samples, sources = [], []
+        for sample, source in zip(family["samples"], family["sources"]):
+            seen[source] = seen.get(source, 0) + 1
+            if seen[source] <= keep:
+                samples.append(sample)
+                sources.append(source)
+        family["samples"], family["sources"] = samples, sources
+
+    @staticmethod
+    def _group_families(texts: List[str]) -> Dict[str, Dict[str, List]]:
+        """
+        nombre -> {"meta": # HELP/# TYPE, "samples": líneas, "sources": índice
+        en texts de cada muestra}.
+        """
+        families: Dict[str, Dict[str, List]] = {}
 
-        return generate_latest(registry).decode("utf-8")
\ No newline at end of file
+        for source, text in enumerate(texts):
+            if not text:
+                continue
+            for line in text.splitlines():
+                if not line.strip():
+                    continue
+                if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                    name = line.split(" ", 3)[2]
+                    family = families.setdefault(name, {"meta": [], "samples": [], "sources": []})
+                    if not any(m.startswith(line[:7]) for m in family["meta"]):
+                        family["meta"].append(line)
+                    continue
+                if line.startswith("#"):
+                    continue
+                name = line.split("{", 1)[0].split(" ", 1)[0]
+                family = families.setdefault(name, {"meta": [], "samples": [], "sources": []})
+                family["samples"].append(line)
+                family["sources"].append(source)
+        return families
@@ -0,0 +1,105 @@
+import hashlib
+import json
+from typing import Dict, Optional
+
+from src.Domain.QueryDomain import QueryDomain
+from src.Services.RedisService import RedisService
+from src.Utils.LruCache import LruCache
+
+
+class QueryAnalysisService:
+    """
+    Analiza sentencias SQL (tabla principal, tipo, tablas, huella sin
+    literales y texto normalizado) y guarda el resultado en un cache LRU con
+    TTL indexado por la huella de la sentencia (sql_handle + offsets, o
+    query_hash).
+    Opcionalmente se respalda en Redis para arrancar con el cache caliente.
+    """
+
+    # la versión cambia con la forma del análisis: un respaldo anterior no se restaura
+    CHECKPOINT_KEY = "StatementAnalysisCache:v2"
+    # campos que un análisis restaurado debe traer (query_fingerprint llegó con el lexer)
+    REQUIRED_FIELDS = ("main_table", "query_type", "tables", "query_fingerprint", "query_normalized")
+
+    def __init__(
+        self,
+        max_items: int = 5000,
+        ttl: Optional[float] = 86400,
+        redis: Optional[RedisService] = None,
+    ):
+        self.cache = LruCache(max_items=max_items, ttl=ttl)
+        self.redis = redis
+        if self.redis:
+            self.restore()
+
+    # ------------------- Análisis -------------------
+    def analyze(self, row: Dict) -> Dict:
+        """
+        Devuelve el análisis de una fila de plan cache.
+        Solo se parsea el SQL cuando la huella no está en cache. Se entrega
+        una copia: quien la modifique no altera lo que queda en cache.
+        """
+        text = row.get("query_text", "") or ""
+        key = self.fingerprint(row, text)
+
+        analysis = self.cache.get(key)
+        if analysis is None:
+            analysis = self._analyze_text(text)
+            self.cache.set(key, analysis)
+        return {**analysis, "tables": list(analysis["tables"])}
+
+    def main_table(self, row: Dict) -> str:
+        return self.analyze(row)["main_table"]
+
+    @staticmethod
+    def fingerprint(row: Dict, text: str = "") -> str:
+        """
+        Huella estable de la sentencia:
+        sql_handle + offsets si existen, si no query_hash, si no hash del texto.
+        """
+        handle = row.get("sql_handle")
+        if handle:
+            return f"h:{handle}:{row.get('statement_start_offset', 0)}:{row.get('statement_end_offset', -1)}"
+
+        query_hash = row.get("query_hash")
+        if query_hash:
+            return f"q:{query_hash}"
+
+        return "t:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _analyze_text(text: str) -> Dict:
+        # el lexer recibe el texto original: los comentarios -- terminan en el salto de línea
+        analysis = QueryDomain.analyze(text)
+        analysis["query_normalized"] = " ".join(text.split()).lower()
+        return analysis
+
+    # ------------------- Respaldo en Redis -------------------
+    def checkpoint(self, ttl: int = 86400):
+        if not self.redis:
+            return
+        entries = [[key, value, stored_at] for key, (value, stored_at) in self.cache.dump().items()]
+        self.redis.set(self.CHECKPOINT_KEY, json.dumps(entries), ttl)
+
+    def restore(self):
+        """
+        Carga el respaldo de Redis. Si no se puede leer o está corrupto se
+        arranca con el cache vacío: el análisis se recalcula en el ciclo.
+        Los análisis a los que les falta algún campo (de una versión anterior)
+        se descartan y se recalculan al verlos.
+        """
+        try:
+            raw = self.redis.get_value(self.CHECKPOINT_KEY)
+            if not raw:
+                return
+            entries = {
+                key: (dict(value), float(stored_at))
+                for key, value, stored_at in json.loads(raw)
+                if all(field in value for field in self.REQUIRED_FIELDS)
+            }
+        except Exception:
+            return
+        self.cache.load(entries)
+
+    def stats(self) -> Dict[str, int]:
+        return self.cache.stats()
@@ -1,33 +1,154 @@
 from src.Utils.RedisConection import RedisConection
+from src.Utils.Instrumentation import instruments
 from redis import Redis
-from typing import List, Optional, Union
+from redis.exceptions import NoScriptError
+from typing import Dict, List, Optional, Tuple, Union
+import time
+
+
+# Publica una generación: secciones en `{<namespace>}:gen:<n>`, secciones en
+# vivo (consultas en curso, memoria, pool) en `{<namespace>}:gen:<n>:live` con
+# su propio TTL más corto, valores extra y el puntero `{<namespace>}:current`,
+# todo atómico. Si se pasa una clave de lease (KEYS[4]) solo se escribe cuando
+# su dueño sigue siendo ARGV[4] (fencing: un recolector que perdió el
+# liderazgo no pisa al nuevo). Todas las claves que toca el script van en KEYS
+# y comparten hash tag (mismo slot en Redis Cluster): el lease y las claves
+# extra se arman con el tag del espacio (ver RedisService.namespace_key).
+# KEYS: hash de la generación, hash en vivo, puntero, lease ('' = sin fencing), claves extra...
+# ARGV: id, ttl, ttl en vivo, dueño, n secciones, n en vivo, campo/valor * (n + n en vivo),
+#       valor de cada clave extra
+PUBLISH_GENERATION_LUA = """
+if KEYS[4] ~= '' and redis.call('GET', KEYS[4]) ~= ARGV[4] then
+    return 0
+end
+local i = 7
+for part, count in ipairs({tonumber(ARGV[5]), tonumber(ARGV[6])}) do
+    if count > 0 then
+        redis.call('HSET', KEYS[part], unpack(ARGV, i, i + count * 2 - 1))
+        redis.call('EXPIRE', KEYS[part], ARGV[part + 1])
+    end
+    i = i + count * 2
+end
+for k = 5, #KEYS do
+    redis.call('SET', KEYS[k], ARGV[i])
+    i = i + 1
+end
+redis.call('SET', KEYS[3], ARGV[1])
+return 1
+"""
+
+# Lee la generación vigente de un espacio en un solo viaje: el puntero
+# KEYS[1] y los dos hashes de esa generación ({} si aún no hay ninguna).
+# Los hashes no pueden ir en KEYS porque dependen del puntero; llevan el mismo
+# hash tag (ARGV[1] es el prefijo `{<namespace>}:gen:`), así que están en el
+# mismo slot que KEYS[1].
+READ_GENERATION_LUA = """
+local generation = redis.call('GET', KEYS[1])
+if not generation then
+    return {}
+end
+local key = ARGV[1] .. generation
+return {generation, redis.call('HGETALL', key), redis.call('HGETALL', key .. ':live')}
+"""
+
+# Renueva (PEXPIRE) o libera (DEL) un lease solo si sigue siendo del mismo dueño.
+RENEW_LEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+# SET que solo se aplica si el lease KEYS[2] sigue siendo de ARGV[2].
+SET_FENCED_LUA = """
+if redis.call('GET', KEYS[2]) ~= ARGV[2] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1])
+return 1
+"""
+# zset_put que solo se aplica si el lease KEYS[2] sigue siendo de ARGV[4].
+# ARGV: miembro, score, máximo de miembros (0 = sin recorte), dueño
+ZSET_PUT_FENCED_LUA = """
+if redis.call('GET', KEYS[2]) ~= ARGV[4] then
+    return 0
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], ARGV[2], ARGV[2])
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+if tonumber(ARGV[3]) > 0 then
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -tonumber(ARGV[3]) - 1)
+end
+return 1
+"""
+RELEASE_LEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
 
 
 class RedisService:
 
     def __init__(self, con: RedisConection):
         self.redis: Redis = con.getConn()
+        # valores binarios (snapshot codificado): sin decode_responses
+        self.raw: Redis = con.getRawConn()
+        self._publish_generation = self.redis.register_script(PUBLISH_GENERATION_LUA)
+        self._read_generation = self.redis.register_script(READ_GENERATION_LUA)
+        self._renew_lease = self.redis.register_script(RENEW_LEASE_LUA)
+        self._release_lease = self.redis.register_script(RELEASE_LEASE_LUA)
+        self._set_fenced = self.redis.register_script(SET_FENCED_LUA)
+        self._zset_put_fenced = self.redis.register_script(ZSET_PUT_FENCED_LUA)
 
     # ---------------------------
     #        STRING METHODS
     # ---------------------------
+    @instruments.timed("exporter_redis_seconds", op="set")
     def set(self, key: str, value: str, ttl: Optional[int] = None):
         if ttl:
             return self.redis.setex(key, ttl, value)
         return self.redis.set(key, value)
 
+    @instruments.timed("exporter_redis_seconds", op="get_value")
     def get_value(self, key: str) -> Optional[str]:
         raw = self.redis.get(key)
         if raw is None:
             return None
         return raw.decode("utf-8") if isinstance(raw, bytes) else str(raw)
 
+    @instruments.timed("exporter_redis_seconds", op="get_many")
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """MGET: un valor (o None) por clave, en el mismo orden."""
+        if not keys:
+            return []
+        return [
+            raw.decode("utf-8") if isinstance(raw, bytes) else raw
+            for raw in self.redis.mget(keys)
+        ]
+
+    @instruments.timed("exporter_redis_seconds", op="set_many")
+    def set_many(self, values: Dict[str, str], ttl: int):
+        """SETEX de cada clave en un solo pipeline (sin MULTI)."""
+        if not values:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for key, value in values.items():
+            pipe.setex(key, ttl, value)
+        pipe.execute()
+
+    @instruments.timed("exporter_redis_seconds", op="get_bytes")
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Valor tal cual está guardado (sin decodificar a texto)."""
+        return self.raw.get(key)
+
     # ---------------------------
     #          LIST METHODS
     # ---------------------------
+    @instruments.timed("exporter_redis_seconds", op="list_push")
     def list_push(self, key: str, value: str):
         return self.redis.rpush(key, value)
 
+    @instruments.timed("exporter_redis_seconds", op="list_range")
     def list_range(self, key: str, start: int = 0, end: int = -1) -> List[str]:
         raw_items = self.redis.lrange(key, start, end)
         if not raw_items:
@@ -40,18 +161,69 @@ class RedisService:
     def get_list(self, key: str) -> List[str]:
         return self.list_range(key, 0, -1)
 
+    @instruments.timed("exporter_redis_seconds", op="list_trim")
     def list_trim(self, key: str, max_items: int):
         return self.redis.ltrim(key, -max_items, -1)
 
+    # ---------------------------
+    #       SORTED SET METHODS
+    # ---------------------------
+    @instruments.timed("exporter_redis_seconds", op="zset_put")
+    def zset_put(
+        self,
+        key: str,
+        member: str,
+        score: float,
+        max_items: Optional[int] = None,
+        fence: Optional[Tuple[str, str]] = None,
+    ) -> bool:
+        """
+        Guarda member con score reemplazando lo que hubiera con ese mismo
+        score, y recorta a los max_items de mayor score; todo en un MULTI/EXEC.
+        fence: (clave_lease, dueño); si el lease ya no es de ese dueño no se
+        escribe nada y se devuelve False.
+        """
+        if fence:
+            lease_key, owner = fence
+            return bool(self._zset_put_fenced(keys=[key, lease_key], args=[member, score, max_items or 0, owner]))
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.zremrangebyscore(key, score, score)
+        pipe.zadd(key, {member: score})
+        if max_items:
+            pipe.zremrangebyrank(key, 0, -max_items - 1)
+        pipe.execute()
+        return True
+
+    @instruments.timed("exporter_redis_seconds", op="zset_range_by_score")
+    def zset_range_by_score(
+        self, key: str, min_score: Union[float, str], max_score: Union[float, str], limit: Optional[int] = None
+    ) -> List[str]:
+        """
+        Miembros con score en [min_score, max_score], de menor a mayor score.
+        Acepta la sintaxis de Redis para límites exclusivos ("(100").
+        """
+        if limit:
+            return self.redis.zrangebyscore(key, min_score, max_score, start=0, num=limit)
+        return self.redis.zrangebyscore(key, min_score, max_score)
+
+    @instruments.timed("exporter_redis_seconds", op="zset_last")
+    def zset_last(self, key: str) -> Optional[Tuple[str, float]]:
+        """(miembro, score) del mayor score, o None si el conjunto está vacío."""
+        last = self.redis.zrange(key, -1, -1, withscores=True)
+        return tuple(last[0]) if last else None
+
     # ---------------------------
     #        KEY UTILITIES
     # ---------------------------
+    @instruments.timed("exporter_redis_seconds", op="delete")
     def delete(self, key: str) -> int:
         return self.redis.delete(key)
 
+    @instruments.timed("exporter_redis_seconds", op="exists")
     def exists(self, key: str) -> bool:
         return self.redis.exists(key) == 1
 
+    @instruments.timed("exporter_redis_seconds", op="keys")
     def keys(self, pattern: str) -> List[str]:
         raw_keys = self.redis.keys(pattern)
         return [k.decode("utf-8") for k in raw_keys] if raw_keys else []
@@ -78,3 +250,153 @@ class RedisService:
     # ---------------------------
     def pipeline(self):
         return self.redis.pipeline()
+
+    # ---------------------------
+    #     LEASES (LIDERAZGO)
+    # ---------------------------
+    @instruments.timed("exporter_redis_seconds", op="acquire_lease")
+    def acquire_lease(self, key: str, owner: str, ttl_ms: int) -> bool:
+        """SET NX PX: toma el lease solo si nadie lo tiene."""
+        return bool(self.redis.set(key, owner, nx=True, px=ttl_ms))
+
+    @instruments.timed("exporter_redis_seconds", op="renew_lease")
+    def renew_lease(self, key: str, owner: str, ttl_ms: int) -> bool:
+        return bool(self._renew_lease(keys=[key], args=[owner, ttl_ms]))
+
+    @instruments.timed("exporter_redis_seconds", op="release_lease")
+    def release_lease(self, key: str, owner: str) -> bool:
+        return bool(self._release_lease(keys=[key], args=[owner]))
+
+    @instruments.timed("exporter_redis_seconds", op="set_fenced")
+    def set_fenced(self, key: str, value: str, fence: Optional[Tuple[str, str]]) -> bool:
+        """SET normal sin fence; con (clave_lease, dueño) solo si el lease sigue siendo de ese dueño."""
+        if not fence:
+            self.set(key, value)
+            return True
+        lease_key, owner = fence
+        return bool(self._set_fenced(keys=[key, lease_key], args=[value, owner]))
+
+    # ---------------------------
+    #   GENERACIONES VERSIONADAS
+    # ---------------------------
+    @instruments.timed("exporter_redis_seconds", op="publish_generation")
+    def publish_generation(
+        self,
+        namespace: str,
+        sections: Dict[str, str],
+        ttl: int,
+        extra_values: Optional[Dict[str, str]] = None,
+        fence: Optional[Tuple[str, str]] = None,
+        live_sections: Optional[Dict[str, str]] = None,
+        live_ttl: Optional[int] = None,
+    ) -> Optional[str]:
+        """
+        Publica todas las secciones de un ciclo como una generación nueva
+        (hash `{<namespace>}:gen:<n>`) y mueve el puntero `{<namespace>}:current`,
+        todo en una sola operación atómica.
+        live_sections: secciones que vencen a los live_ttl segundos (hash
+        `{<namespace>}:gen:<n>:live`); se leen junto con las demás.
+        fence: (clave_lease, dueño); si el lease ya no es de ese dueño no se
+        escribe nada y se devuelve None.
+        En Redis Cluster el lease y las claves de extra_values deben tener el
+        hash tag del espacio.
+        """
+        generation = str(time.time_ns())
+        extra_values = extra_values or {}
+        live_sections = live_sections or {}
+        lease_key, owner = fence or ("", "")
+
+        keys = [
+            self.generation_key(namespace, generation),
+            self.generation_key(namespace, generation) + ":live",
+            self.namespace_key(namespace, "current"),
+            lease_key,
+            *extra_values,
+        ]
+        args = [generation, ttl, live_ttl or ttl, owner, len(sections), len(live_sections)]
+        for field, value in (*sections.items(), *live_sections.items()):
+            args.extend((field, value or ""))
+        args.extend(extra_values.values())
+
+        if not self._publish_generation(keys=keys, args=args):
+            return None
+        return generation
+
+    @staticmethod
+    def hash_tag(namespace: str) -> str:
+        """
+        `{<namespace>}`, o el espacio tal cual si ya trae su hash tag (los
+        espacios que comparten el slot de su instancia, ver ExpositionService).
+        """
+        return namespace if "{" in namespace else f"{{{namespace}}}"
+
+    @classmethod
+    def namespace_key(cls, namespace: str, suffix: str) -> str:
+        """Clave del espacio en el slot de su hash tag: `{<namespace>}:<suffix>`."""
+        return f"{cls.hash_tag(namespace)}:{suffix}"
+
+    @classmethod
+    def generation_key(cls, namespace: str, generation: str) -> str:
+        return cls.namespace_key(namespace, f"gen:{generation}")
+
+    @instruments.timed("exporter_redis_seconds", op="current_generations")
+    def current_generations(self, namespaces: List[str]) -> List[Optional[str]]:
+        """
+        Solo los punteros `{<namespace>}:current`, sin el contenido: un GET por
+        espacio en un pipeline (cada espacio vive en su propio slot, un MGET
+        entre slots fallaría en Redis Cluster).
+        """
+        if not namespaces:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for namespace in namespaces:
+            pipe.get(self.namespace_key(namespace, "current"))
+        return [self._text(item) for item in pipe.execute()]
+
+    @instruments.timed("exporter_redis_seconds", op="read_generations")
+    def read_generations(self, namespaces: List[str]) -> List[Tuple[Optional[str], Dict[str, str]]]:
+        """
+        Devuelve (id, secciones) de la generación vigente de cada espacio de
+        claves, en un solo viaje: un pipeline con READ_GENERATION_LUA por
+        espacio, que resuelve el puntero y lee los hashes de esa generación
+        (una generación no cambia una vez publicada, así que las secciones
+        siempre son de un mismo ciclo). id es None si el espacio aún no tiene
+        generación.
+        """
+        if not namespaces:
+            return []
+        try:
+            return self.decode_generations(self._read_pipeline(namespaces))
+        except NoScriptError:
+            # Redis reiniciado o sin el script: se carga y se reintenta una vez
+            self.redis.script_load(READ_GENERATION_LUA)
+            return self.decode_generations(self._read_pipeline(namespaces))
+
+    def _read_pipeline(self, namespaces: List[str]) -> list:
+        # EVALSHA directo: un Script en el pipeline agrega un SCRIPT EXISTS por lectura
+        pipe = self.redis.pipeline(transaction=False)
+        for namespace in namespaces:
+            pipe.evalsha(self._read_generation.sha, *self.read_generation_args(namespace))
+        return pipe.execute()
+
+    @classmethod
+    def read_generation_args(cls, namespace: str) -> list:
+        """numkeys, KEYS y ARGV de READ_GENERATION_LUA para un espacio."""
+        return [1, cls.namespace_key(namespace, "current"), cls.namespace_key(namespace, "gen:")]
+
+    @staticmethod
+    def decode_generations(replies: list) -> List[Tuple[Optional[str], Dict[str, str]]]:
+        """Respuestas de READ_GENERATION_LUA -> [(id o None, secciones)]."""
+        result = []
+        for reply in replies:
+            sections = {}
+            if reply:
+                for flat in reply[1:]:
+                    items = [RedisService._text(item) for item in flat]
+                    sections.update(zip(items[::2], items[1::2]))
+            result.append((RedisService._text(reply[0]) if reply else None, sections))
+        return result
+
+    @staticmethod
+    def _text(value) -> str:
+        return value.decode("utf-8") if isinstance(value, bytes) else value
@@ -0,0 +1,128 @@
+import json
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.Services.RedisService import RedisService
+from src.Utils.Instrumentation import instruments
+from src.Utils.LruCache import LruCache
+
+# (sql_handle, statement_start_offset, statement_end_offset)
+TextKey = Tuple[str, int, int]
+
+logger = logging.getLogger(__name__)
+
+
+class StatementTextService:
+    """
+    Cache del texto de las sentencias del plan cache. El texto de un
+    sql_handle + offsets no cambia nunca, así que cada ciclo se leen solo los
+    contadores y el texto se busca en tres niveles:
+    LRU local -> Redis (<target>:sqltext:<handle>:<start>:<end>, con TTL;
+    sobrevive reinicios y cambios de líder) -> SQL Server, en un solo lote para
+    todas las sentencias que faltan.
+    Completa en cada fila database_name, is_internal y query_text, que es lo
+    que consumen PlanCacheDomain y QueryDomain.
+    """
+
+    FIELDS = ("database_name", "is_internal", "query_text")
+
+    def __init__(
+        self,
+        target: str,
+        max_items: int = 20000,
+        ttl: Optional[float] = 86400,
+        redis: Optional[RedisService] = None,
+    ):
+        self.target = target
+        self.ttl = ttl
+        self.cache = LruCache(max_items=max_items, ttl=ttl)
+        self.redis = redis
+        self._results = {
+            result: instruments.counter("exporter_text_cache_total", target=target, result=result)
+            for result in ("hit", "redis", "fetched", "missing")
+        }
+
+    # ------------------- Completar filas -------------------
+    def attach(self, rows: List, lookup: Callable[[List[TextKey]], List]) -> List:
+        """
+        Completa el texto de `rows` (filas sin texto de getCollectionBatch
+        con with_text=False). lookup es getStatementTexts del
+        repositorio y solo se llama con las claves que no están en cache.
+        Las sentencias que ya salieron del plan cache quedan con texto vacío y
+        se vuelven a buscar en el ciclo siguiente.
+        """
+        rows = list(rows)
+        keys = [self.key(row) for row in rows]
+        texts: Dict[TextKey, tuple] = {}
+        missing: List[TextKey] = []
+        get = self.cache.get
+        for key in keys:
+            if key in texts:
+                continue
+            text = texts[key] = get(key)
+            if text is None:
+                missing.append(key)
+        self._results["hit"].inc(len(texts) - len(missing))
+
+        if missing and self.redis:
+            missing = self._from_redis(missing, texts)
+        if missing:
+            missing = self._from_database(missing, texts, lookup)
+        self._results["missing"].inc(len(missing))
+
+        empty = (None, 0, "")
+        for row, key in zip(rows, keys):
+            row["database_name"], row["is_internal"], row["query_text"] = texts[key] or empty
+        return rows
+
+    @staticmethod
+    def key(row) -> TextKey:
+        return (row["sql_handle"], row["statement_start_offset"], row["statement_end_offset"])
+
+    def _from_redis(self, missing: List[TextKey], texts: Dict[TextKey, tuple]) -> List[TextKey]:
+        try:
+            stored = self.redis.get_many([self._redis_key(key) for key in missing])
+        except Exception as e:
+            # Redis es solo un nivel de cache: sin él, las claves van a SQL Server
+            self._redis_error("leer", e)
+            return missing
+        still_missing = []
+        for key, raw in zip(missing, stored):
+            if raw is None:
+                still_missing.append(key)
+                continue
+            text = tuple(json.loads(raw))
+            texts[key] = text
+            self.cache.set(key, text)
+        self._results["redis"].inc(len(missing) - len(still_missing))
+        return still_missing
+
+    def _from_database(self, missing: List[TextKey], texts: Dict[TextKey, tuple], lookup) -> List[TextKey]:
+        fetched = {}
+        for row in lookup(missing):
+            key = self.key(row)
+            text = tuple(row[field] for field in self.FIELDS)
+            texts[key] = text
+            fetched[key] = text
+            self.cache.set(key, text)
+        self._results["fetched"].inc(len(fetched))
+
+        if fetched and self.redis:
+            try:
+                self.redis.set_many(
+                    {self._redis_key(key): json.dumps(text) for key, text in fetched.items()},
+                    int(self.ttl or 86400),
+                )
+            except Exception as e:
+                self._redis_error("guardar", e)
+        return [key for key in missing if key not in fetched]
+
+    def _redis_error(self, action: str, error: Exception):
+        instruments.inc("exporter_events_total", event="text_cache_redis_error")
+        logger.warning("[%s] no se pudo %s el texto de las sentencias en Redis: %s", self.target, action, error)
+
+    def _redis_key(self, key: TextKey) -> str:
+        return f"{self.target}:sqltext:{key[0]}:{key[1]}:{key[2]}"
+
+    def stats(self) -> Dict[str, int]:
+        return self.cache.stats()
@@ -0,0 +1,150 @@
+import gzip
+import json
+import os
+from datetime import date, datetime
+from threading import Lock
+from typing import Dict, Iterator, List, Optional
+
+from src.Utils.CompactRow import CompactRow
+
+
+class CaptureFile:
+    """
+    Capturas de los conjuntos de resultados crudos de cada ciclo, en NDJSON
+    comprimido con gzip: una línea por ciclo y un miembro gzip por escritura,
+    así un archivo se puede seguir agregando y leer aunque el proceso muera.
+
+    Cada línea:
+        {"v": 1, "target", "db_name", "captured_at", "duration",
+         "incremental", "live", "since", "pool": {...},
+         "sets": {"heavy": {"columns": [...], "datetimes": [...], "rows": [[...]]}, ...}}
+
+    Las filas van por columnas (nombres una sola vez por conjunto) y las
+    columnas datetime se guardan en ISO y se listan en "datetimes" para
+    devolverlas como datetime al leer.
+    "live" indica si el ciclo leyó consultas, usuarios y memoria (falso con
+    los colectores livianos); las capturas anteriores no lo traen y se leen
+    como live=True.
+    """
+
+    VERSION = 1
+
+    # ---------------------------
+    #         CODIFICAR
+    # ---------------------------
+    @staticmethod
+    def encode_set(rows: List) -> Dict:
+        if not rows:
+            return {"columns": [], "datetimes": [], "rows": []}
+        columns = list(rows[0].keys())
+        datetimes = [
+            column for column in columns
+            if any(isinstance(row.get(column), (datetime, date)) for row in rows)
+        ]
+        values = []
+        for row in rows:
+            values.append([
+                value.isoformat() if isinstance(value, (datetime, date)) else value
+                for value in (row.get(column) for column in columns)
+            ])
+        return {"columns": columns, "datetimes": datetimes, "rows": values}
+
+    @staticmethod
+    def encode_record(
+        target: str,
+        db_name: str,
+        batch: Dict[str, List],
+        captured_at: datetime,
+        duration: float,
+        since: Optional[datetime] = None,
+        pool: Optional[Dict] = None,
+        live: bool = True,
+    ) -> bytes:
+        record = {
+            "v": CaptureFile.VERSION,
+            "target": target,
+            "db_name": db_name,
+            "captured_at": captured_at.isoformat(),
+            "duration": duration,
+            "incremental": "plan_cache" in batch,
+            "live": live,
+            "since": since.isoformat() if since else None,
+            "pool": pool or {},
+            "sets": {name: CaptureFile.encode_set(rows) for name, rows in batch.items()},
+        }
+        return json.dumps(record, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+
+    # ---------------------------
+    #        DECODIFICAR
+    # ---------------------------
+    @staticmethod
+    def decode_set(encoded: Dict) -> List[CompactRow]:
+        columns = encoded["columns"]
+        if not columns:
+            return []
+        build = CompactRow.builder([(column, None) for column in columns])
+        parse = [columns.index(column) for column in encoded.get("datetimes", [])]
+        rows = []
+        for values in encoded["rows"]:
+            for i in parse:
+                if values[i] is not None:
+                    values[i] = datetime.fromisoformat(values[i])
+            rows.append(build(values))
+        return rows
+
+    @staticmethod
+    def decode_record(line: bytes) -> Dict:
+        record = json.loads(line)
+        if record.get("v") != CaptureFile.VERSION:
+            raise ValueError(f"Versión de captura no soportada: {record.get('v')}")
+        record["captured_at"] = datetime.fromisoformat(record["captured_at"])
+        record["since"] = datetime.fromisoformat(record["since"]) if record["since"] else None
+        record["live"] = record.get("live", True)
+        record["batch"] = {name: CaptureFile.decode_set(rows) for name, rows in record.pop("sets").items()}
+        return record
+
+    @staticmethod
+    def read(path: str) -> Iterator[Dict]:
+        """Ciclos en orden de captura. Una última línea truncada (corte a mitad de escritura) se ignora."""
+        with gzip.open(path, "rb") as handle:
+            try:
+                for line in handle:
+                    if line.endswith(b"\n"):
+                        yield CaptureFile.decode_record(line)
+            except EOFError:
+                return
+
+    @staticmethod
+    def path_for(directory: str, target: str, day: date) -> str:
+        return os.path.join(directory, f"{target}-{day:%Y%m%d}.ndjson.gz")
+
+
+class CaptureWriter:
+    """
+    Agrega ciclos a <directorio>/<target>-<AAAAMMDD>.ndjson.gz (un archivo por
+    target y día). Con max_bytes el archivo del día deja de crecer al llegar al
+    tope: la captura es para reproducir un incidente, no un archivo histórico.
+    """
+
+    def __init__(self, directory: str, target: str, max_bytes: Optional[int] = None):
+        self.directory = directory
+        self.target = target
+        self.max_bytes = max_bytes
+        self.cycles = 0
+        self.dropped = 0
+        self._lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, db_name: str, batch: Dict[str, List], captured_at: datetime, duration: float,
+              since: Optional[datetime] = None, pool: Optional[Dict] = None, live: bool = True) -> bool:
+        path = CaptureFile.path_for(self.directory, self.target, captured_at.date())
+        with self._lock:
+            if self.max_bytes and os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+                self.dropped += 1
+                return False
+            line = CaptureFile.encode_record(self.target, db_name, batch, captured_at, duration, since, pool, live)
+            # nivel 6: se escribe una vez por ciclo y el NDJSON comprime ~10x
+            with gzip.open(path, "ab", compresslevel=6) as handle:
+                handle.write(line)
+            self.cycles += 1
+            return True
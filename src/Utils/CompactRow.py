@@ -0,0 +1,110 @@
+import keyword
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Sequence, Tuple
+
+
+# Campos que el dominio agrega a cada fila (normalize_queries). Se reservan como
+# slots para poder anotar la fila en el lugar, sin copiarla a un dict nuevo.
+ANNOTATION_FIELDS = ("query_normalized", "main_table", "query_type", "tables", "query_fingerprint", "snapshot")
+# Campos de dm_exec_sql_text: en la lectura sin texto los completa StatementTextService.
+TEXT_FIELDS = ("database_name", "is_internal", "query_text")
+
+
+class CompactRow:
+    """
+    Fila de resultado con __slots__ (sin __dict__ por fila).
+    Se comporta como un dict de solo las claves conocidas: row["col"], row.get("col"),
+    "col" in row, keys()/items(), para que el dominio la use igual que antes.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value: Any):
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return hasattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def keys(self):
+        return [name for name in self.__slots__ if hasattr(self, name)]
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.keys()]
+
+    def copy(self) -> "CompactRow":
+        clone = self.__class__.__new__(self.__class__)
+        for name, value in self.items():
+            setattr(clone, name, value)
+        return clone
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"CompactRow({self.to_dict()!r})"
+
+    # ---------------------------
+    #     CONSTRUCCIÓN
+    # ---------------------------
+    @staticmethod
+    def builder(description: Sequence[tuple]) -> Callable[[Sequence], "CompactRow"]:
+        """
+        A partir de cursor.description devuelve una función fila -> CompactRow.
+        Las columnas DECIMAL/NUMERIC se convierten a float una sola vez aquí.
+        """
+        columns = tuple(column[0] for column in description)
+        decimal_idx = tuple(i for i, column in enumerate(description) if column[1] is Decimal)
+        assign = _assigner(columns)
+
+        if not decimal_idx:
+            return assign
+
+        def build(values: Sequence) -> CompactRow:
+            values = list(values)
+            for i in decimal_idx:
+                if values[i] is not None:
+                    values[i] = float(values[i])
+            return assign(values)
+
+        return build
+
+
+@lru_cache(maxsize=64)
+def _assigner(columns: Tuple[str, ...]) -> Callable[[Sequence], CompactRow]:
+    """
+    Función que crea la fila y asigna cada columna con el descriptor de su
+    slot (armada una vez por conjunto de columnas).
+    Si algún nombre de columna no sirve como atributo se usan filas dict.
+    """
+    if not all(name.isidentifier() and not keyword.iskeyword(name) for name in columns):
+        # columnas sin alias válido: se vuelve a filas dict
+        return lambda values: dict(zip(columns, values))
+
+    row_type = _row_type(columns)
+    new = row_type.__new__
+    setters = tuple(getattr(row_type, name).__set__ for name in columns)
+
+    def assign(values: Sequence) -> CompactRow:
+        row = new(row_type)
+        for set_value, value in zip(setters, values):
+            set_value(row, value)
+        return row
+
+    return assign
+
+
+@lru_cache(maxsize=64)
+def _row_type(columns: Tuple[str, ...]) -> type:
+    """Una clase con slots por conjunto de columnas (se reutiliza entre ciclos)."""
+    slots = columns + tuple(name for name in ANNOTATION_FIELDS + TEXT_FIELDS if name not in columns)
+    return type("Row", (CompactRow,), {"__slots__": slots})
@@ -0,0 +1,184 @@
+import time
+from contextlib import contextmanager
+from threading import Condition
+from typing import Any, Dict, List, Tuple
+
+from src.Utils.DatabaseConnection import DatabaseConnection
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones ODBC.
+    - Verifica con SELECT 1 las conexiones que llevan un rato ociosas antes de entregarlas.
+    - Descarta conexiones más viejas que max_age o que fallaron durante su uso.
+    - Si abrir una conexión falla, espera con backoff exponencial antes de reintentar.
+    Lleva contadores de checkouts y tiempo de espera para exponerlos como métricas.
+    """
+
+    # Claves de stats() que solo crecen: se exponen como counter, el resto como gauge
+    COUNTERS = ("checkouts", "timeouts", "connections_opened", "connect_failures", "discarded", "wait_seconds_total")
+
+    def __init__(
+        self,
+        db_connection: DatabaseConnection,
+        max_size: int = 4,
+        max_age: float = 1800,
+        timeout: float = 10,
+        ping_after: float = 5,
+        backoff: float = 0.5,
+        max_backoff: float = 30,
+    ):
+        self.db_connection = db_connection
+        self.max_size = max_size
+        self.max_age = max_age
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        # (conexión, creada_en, devuelta_en); se usa como pila (LIFO)
+        self._idle: List[Tuple[Any, float, float]] = []
+        self._open = 0
+        self._cond = Condition()
+        self._next_attempt = 0.0
+        self._current_backoff = backoff
+
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connections_opened = 0
+        self.connect_failures = 0
+        self.discarded = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    # ---------------------------
+    #        PRÉSTAMO
+    # ---------------------------
+    @contextmanager
+    def connection(self):
+        """
+        Presta una conexión y la devuelve al terminar el bloque.
+        Si el bloque lanza una excepción la conexión se descarta.
+        """
+        conn, created_at = self._checkout()
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self._checkin(conn, created_at, broken)
+
+    def _checkout(self) -> Tuple[Any, float]:
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        while True:
+            with self._cond:
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise TimeoutError("No hay conexiones libres en el pool")
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    conn, created_at, returned_at = self._idle.pop()
+                else:
+                    conn, created_at, returned_at = None, 0.0, 0.0
+                    self._open += 1
+
+            if conn is not None:
+                if self._is_usable(conn, created_at, returned_at):
+                    self._record_checkout(started)
+                    return conn, created_at
+                self._discard(conn)
+                continue
+
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+
+            self._record_checkout(started)
+            return conn, time.monotonic()
+
+    def _checkin(self, conn, created_at: float, broken: bool):
+        if broken or time.monotonic() - created_at > self.max_age:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    # ---------------------------
+    #     APERTURA / VALIDACIÓN
+    # ---------------------------
+    def _connect(self):
+        # el estado del backoff se comparte entre hilos; la conexión se abre fuera del lock
+        with self._cond:
+            if time.monotonic() < self._next_attempt:
+                raise ConnectionError("Base de datos no disponible, reintento en backoff")
+
+        conn = self.db_connection.connection()
+        with self._cond:
+            if conn is None:
+                self.connect_failures += 1
+                self._next_attempt = time.monotonic() + self._current_backoff
+                self._current_backoff = min(self._current_backoff * 2, self.max_backoff)
+                raise ConnectionError("No se pudo abrir conexión a la base de datos")
+
+            self._current_backoff = self.backoff
+            self._next_attempt = 0.0
+            self.connections_opened += 1
+        return conn
+
+    def _is_usable(self, conn, created_at: float, returned_at: float) -> bool:
+        now = time.monotonic()
+        if now - created_at > self.max_age:
+            return False
+        if now - returned_at < self.ping_after:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._open -= 1
+            self.discarded += 1
+            self._cond.notify()
+
+    def _record_checkout(self, started: float):
+        waited = time.monotonic() - started
+        with self._cond:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "size": self._open,
+                "idle": len(self._idle),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connections_opened": self.connections_opened,
+                "connect_failures": self.connect_failures,
+                "discarded": self.discarded,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
@@ -1,19 +1,25 @@
+import logging
 import pyodbc
 import time
 from settings.DataBaseSetting import DATABASE_CONNECTION_STRING
+from src.Utils.Instrumentation import instruments
+
+logger = logging.getLogger(__name__)
 
 
 class DatabaseConnection:
-    _instance = None  
+    # Una instancia por cadena de conexión (una por instancia/base monitoreada)
+    _instances = {}
 
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:   
-            cls._instance = super(DatabaseConnection, cls).__new__(cls)
-        return cls._instance
+    def __new__(cls, connection_string: str = DATABASE_CONNECTION_STRING, *args, **kwargs):
+        if connection_string not in cls._instances:
+            cls._instances[connection_string] = super(DatabaseConnection, cls).__new__(cls)
+        return cls._instances[connection_string]
 
-    def __init__(self):
+    def __init__(self, connection_string: str = DATABASE_CONNECTION_STRING):
          
         if not hasattr(self, "_initialized"):
+            self.connection_string = connection_string
             self.max_retries = 3
             self.retry_delay = 0.3
             self._initialized = True
@@ -23,11 +29,12 @@ class DatabaseConnection:
         Devuelve una conexión a la base de datos. Implementa reintentos en caso de fallo.
         """
         try:
-            connection = pyodbc.connect(DATABASE_CONNECTION_STRING)
-            print('hecho')
+            connection = pyodbc.connect(self.connection_string)
+            instruments.inc("exporter_events_total", event="db_connect")
             return connection
         except Exception as e:
-            print(str(e))
+            instruments.inc("exporter_events_total", event="db_connect_error")
+            logger.warning("conexión a SQL Server fallida (intento %d): %s", retry_count + 1, e)
             if retry_count < self.max_retries:
                 time.sleep(self.retry_delay * (retry_count + 1))   
                 return self.connection(retry_count=retry_count + 1)
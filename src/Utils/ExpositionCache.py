@@ -0,0 +1,51 @@
+import gzip
+import hashlib
+import time
+from threading import Lock
+from typing import Optional, Tuple
+
+
+class ExpositionCache:
+    """
+    Guarda en memoria la última respuesta de /metrics para una combinación de
+    generaciones (su clave), ya codificada, comprimida con gzip y con su ETag
+    (huella del cuerpo).
+    Mientras las generaciones no cambian, los scrapes repetidos la reutilizan.
+    Con max_age la respuesta se vuelve a armar al menos cada max_age segundos,
+    así las secciones que vencen en Redis dejan de exponerse aunque ningún
+    puntero haya cambiado.
+    """
+
+    def __init__(self, compresslevel: int = 6, max_age: Optional[float] = None):
+        self.compresslevel = compresslevel
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._key: Optional[str] = None
+        self._etag = ""
+        self._body = b""
+        self._gzipped = b""
+        self._stored_at = 0.0
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes, bytes]]:
+        """(etag, cuerpo, cuerpo_gzip) si la clave coincide con la guardada."""
+        with self._lock:
+            expired = self.max_age is not None and time.monotonic() - self._stored_at > self.max_age
+            if key != self._key or expired:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._etag, self._body, self._gzipped
+
+    def store(self, key: str, text: str) -> Tuple[str, bytes, bytes]:
+        body = text.encode("utf-8")
+        gzipped = gzip.compress(body, compresslevel=self.compresslevel)
+        etag = hashlib.sha1(body).hexdigest()[:20]
+        with self._lock:
+            self._key = key
+            self._etag = etag
+            self._body = body
+            self._gzipped = gzipped
+            self._stored_at = time.monotonic()
+        return etag, body, gzipped
@@ -0,0 +1,84 @@
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class ExpositionWriter:
+    """
+    Escribe texto de exposición de Prometheus directamente desde los dicts
+    del dominio, sin CollectorRegistry ni objetos Gauge.
+    Produce el mismo texto que prometheus_client.generate_latest para gauges:
+    un bloque # HELP / # TYPE por métrica, en orden de primera aparición,
+    etiquetas ordenadas por nombre y valores con el formato de Go.
+    """
+
+    def __init__(self):
+        # nombre -> (help, tipo, líneas de muestras)
+        self._families: Dict[str, Tuple[str, str, List[str]]] = {}
+
+    def family(self, name: str, help_text: str, metric_type: str = "gauge"):
+        """Declara una métrica (aunque luego no tenga muestras)."""
+        if name not in self._families:
+            self._families[name] = (help_text, metric_type, [])
+
+    def gauge(self, name: str, help_text: str, value, labels: Optional[Dict[str, str]] = None):
+        self.family(name, help_text)
+        self._families[name][2].append(self.sample_line(name, value, labels, sort_labels=True))
+
+    def counter(self, name: str, help_text: str, value, labels: Optional[Dict[str, str]] = None):
+        self.family(name, help_text, "counter")
+        self._families[name][2].append(self.sample_line(name, value, labels, sort_labels=True))
+
+    def sample(self, family: str, name: str, value, labels: Optional[Dict[str, str]] = None):
+        """Muestra de una familia ya declarada con otro nombre (p. ej. `<histograma>_bucket`)."""
+        self._families[family][2].append(self.sample_line(name, value, labels, sort_labels=False))
+
+    def render(self) -> str:
+        output = []
+        for name, (help_text, metric_type, samples) in self._families.items():
+            output.append(f"# HELP {name} {self.escape_help(help_text)}\n")
+            output.append(f"# TYPE {name} {metric_type}\n")
+            output.extend(samples)
+        return "".join(output)
+
+    # ---------------------------
+    #     FORMATO / ESCAPADO
+    # ---------------------------
+    @staticmethod
+    def sample_line(name: str, value, labels: Optional[Dict[str, str]] = None, sort_labels: bool = True) -> str:
+        label_str = ExpositionWriter.format_labels(labels or {}, sort_labels)
+        return f"{name}{label_str} {ExpositionWriter.format_value(value)}\n"
+
+    @staticmethod
+    def format_labels(labels: Dict[str, str], sort_labels: bool = True) -> str:
+        if not labels:
+            return ""
+        items: Iterable = sorted(labels.items()) if sort_labels else labels.items()
+        return "{" + ",".join(
+            f'{k}="{ExpositionWriter.escape_label_value(v)}"' for k, v in items
+        ) + "}"
+
+    @staticmethod
+    def escape_label_value(value) -> str:
+        return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+    @staticmethod
+    def escape_help(text: str) -> str:
+        return text.replace("\\", r"\\").replace("\n", r"\n")
+
+    @staticmethod
+    def format_value(value) -> str:
+        """Mismo formato que prometheus_client.utils.floatToGoString."""
+        d = float(value)
+        if d == math.inf:
+            return "+Inf"
+        if d == -math.inf:
+            return "-Inf"
+        if math.isnan(d):
+            return "NaN"
+        s = repr(d)
+        dot = s.find(".")
+        # Go pasa a notación exponencial antes que Python
+        if d > 0 and dot > 6:
+            mantissa = f"{s[0]}.{s[1:dot]}{s[dot + 1:]}".rstrip("0.")
+            return f"{mantissa}e+0{dot - 1}"
+        return s
@@ -0,0 +1,167 @@
+import time
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from src.Utils.ExpositionWriter import ExpositionWriter
+
+# Límites (segundos) de los histogramas de latencia: desde microsegundos
+# (parseo de una sentencia) hasta decenas de segundos (un DMV lento)
+DEFAULT_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# (nombre, etiquetas ordenadas)
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Instrumentation:
+    """
+    Histogramas y contadores del propio exporter, en memoria del proceso.
+    Cada observación es un bisect y unas sumas bajo un lock: lo bastante barato
+    para usarlo por sentencia parseada. render() devuelve el texto de exposición
+    (tipos histogram y counter) que el recolector publica junto a sus métricas.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._help: Dict[str, Tuple[str, str]] = {}
+        # clave -> [conteo por bucket..., fuera de rango, suma, total]
+        self._histograms: Dict[_Key, list] = {}
+        self._counters: Dict[_Key, float] = {}
+        self._lock = Lock()
+
+    # ------------------- Registro -------------------
+    def describe(self, name: str, help_text: str, metric_type: str):
+        self._help.setdefault(name, (help_text, metric_type))
+
+    def histogram(self, name: str, **labels) -> "_Histogram":
+        """Serie ya resuelta: en caminos calientes evita armar la clave en cada observación."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            data = self._histograms.get(key)
+            if data is None:
+                data = self._histograms[key] = [0] * (len(self.buckets) + 3)
+        return _Histogram(self.buckets, data, self._lock)
+
+    def counter(self, name: str, **labels) -> "_Counter":
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters.setdefault(key, 0)
+        return _Counter(self._counters, key, self._lock)
+
+    def observe(self, name: str, value: float, **labels):
+        self.histogram(name, **labels).observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def timer(self, name: str, **labels) -> "_Timer":
+        """with instruments.timer("exporter_..._seconds", stage="x"): ..."""
+        return _Timer(self.histogram(name, **labels))
+
+    def timed(self, name: str, **labels):
+        """Decorador: observa la duración de cada llamada."""
+        def decorator(func):
+            histogram = self.histogram(name, **labels)
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+    # ------------------- Exposición -------------------
+    def render(self, labels: Optional[Dict[str, str]] = None) -> str:
+        labels = labels or {}
+        with self._lock:
+            histograms = {key: list(data) for key, data in self._histograms.items()}
+            counters = dict(self._counters)
+
+        writer = ExpositionWriter()
+        for (name, own), data in sorted(histograms.items()):
+            help_text, _ = self._help.get(name, (name, "histogram"))
+            writer.family(name, help_text, "histogram")
+            base = dict(sorted({**labels, **dict(own)}.items()))
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                writer.sample(name, f"{name}_bucket", cumulative, {**base, "le": ExpositionWriter.format_value(bound)})
+            writer.sample(name, f"{name}_bucket", data[-1], {**base, "le": "+Inf"})
+            writer.sample(name, f"{name}_sum", data[-2], base)
+            writer.sample(name, f"{name}_count", data[-1], base)
+
+        for (name, own), value in sorted(counters.items()):
+            help_text, _ = self._help.get(name, (name, "counter"))
+            writer.family(name, help_text, "counter")
+            writer.sample(name, name, value, dict(sorted({**labels, **dict(own)}.items())))
+        return writer.render()
+
+
+class _Histogram:
+    __slots__ = ("buckets", "data", "lock")
+
+    def __init__(self, buckets: Tuple[float, ...], data: list, lock: Lock):
+        self.buckets = buckets
+        self.data = data
+        self.lock = lock
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        data = self.data
+        with self.lock:
+            data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+
+class _Counter:
+    __slots__ = ("counters", "key", "lock")
+
+    def __init__(self, counters: Dict[_Key, float], key: _Key, lock: Lock):
+        self.counters = counters
+        self.key = key
+        self.lock = lock
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.counters[self.key] += amount
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram: _Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+# Registro único del proceso: lo usan repositorio, dominio y servicios
+instruments = Instrumentation()
+
+instruments.describe("exporter_dmv_query_seconds", "Latencia de cada consulta a los DMV (ejecución + lectura)", "histogram")
+instruments.describe("exporter_dmv_rows_total", "Filas leídas de cada consulta a los DMV", "counter")
+instruments.describe("exporter_dmv_errors_total", "Consultas a los DMV que fallaron", "counter")
+instruments.describe("exporter_parse_seconds", "Tiempo de QueryDomain.analyze (lexer + análisis) por sentencia", "histogram")
+instruments.describe("exporter_parse_path_total", "Camino con el que QueryDomain.analyze resolvió la tabla principal", "counter")
+instruments.describe("exporter_stage_seconds", "Tiempo de cada etapa del ciclo (agrupación, deltas)", "histogram")
+instruments.describe("exporter_render_seconds", "Tiempo de render del texto Prometheus por método", "histogram")
+instruments.describe("exporter_redis_seconds", "Latencia de ida y vuelta a Redis por operación", "histogram")
+instruments.describe("exporter_process_record_seconds", "Duración completa de MetricsService.processRecord", "histogram")
+instruments.describe("exporter_text_cache_total", "Textos de sentencias por origen: hit (local), redis, fetched (SQL Server) o missing", "counter")
+instruments.describe("exporter_events_total", "Eventos del exporter (conexiones a SQL Server, errores)", "counter")
@@ -0,0 +1,78 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional
+
+
+class LruCache:
+    """
+    Cache LRU acotado con expiración (TTL) por entrada.
+    Lleva contadores de aciertos/fallos para exponerlos como métricas.
+    """
+
+    # Acumulados desde el arranque (se exportan como counter); size es un gauge
+    COUNTERS = ("hits", "misses", "evictions")
+
+    def __init__(self, max_items: int = 5000, ttl: Optional[float] = None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, stored_at = entry
+            if self.ttl and time.time() - stored_at > self.ttl:
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, stored_at: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (value, stored_at if stored_at is not None else time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    # ---------------------------
+    #     VOLCADO / RESTAURACIÓN
+    # ---------------------------
+    def dump(self) -> Dict[Hashable, tuple]:
+        """Copia de las entradas vigentes (valor, timestamp) en orden LRU."""
+        with self._lock:
+            return dict(self._data)
+
+    def load(self, entries: Dict[Hashable, tuple]):
+        """Restaura entradas descartando las ya expiradas."""
+        now = time.time()
+        for key, (value, stored_at) in entries.items():
+            if self.ttl and now - stored_at > self.ttl:
+                continue
+            self.set(key, value, stored_at=stored_at)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+        }
@@ -12,8 +12,34 @@ class RedisConection:
             db=0,
             decode_responses=True,
             password=None)
+        self._raw = None
+        self._async = None
     def getConn(self):
         return self.con
-    
-
-
+    def getRawConn(self):
+        """Cliente sobre el mismo servidor que devuelve bytes sin decodificar."""
+        if self._raw is None:
+            self._raw = redis.Redis(
+                host=REDIS_SERVER,
+                port=REDIS_PORT,
+                db=0,
+                decode_responses=False,
+                password=None)
+        return self._raw
+    def getAsyncConn(self, max_connections: int = 50):
+        """
+        Cliente redis.asyncio con su propio pool acotado de conexiones
+        (para el servidor asíncrono; se crea al primer uso).
+        """
+        if self._async is None:
+            import redis.asyncio as aioredis
+            self._async = aioredis.Redis(
+                connection_pool=aioredis.BlockingConnectionPool(
+                    host=REDIS_SERVER,
+                    port=REDIS_PORT,
+                    db=0,
+                    decode_responses=True,
+                    password=None,
+                    max_connections=max_connections,
+                ))
+        return self._async
@@ -0,0 +1,260 @@
+import json
+import struct
+import sys
+import zlib
+from array import array
+from typing import Dict, List, Optional, Union
+
+
+class SnapshotCodec:
+    """
+    Codificación binaria del último snapshot agrupado (ver MetricsDomain.build_snapshot).
+
+    Formato (versión 1), todo little-endian:
+        "MSNP" | versión u8 | flags u8 | cuerpo (zlib si flags & 1)
+    cuerpo:
+        snapshot, watermark              cadenas con longitud (u32, -1 = None)
+        diccionario de tablas            u32 n + nombres separados por \\0
+        sección heavy, sección frequent  u32 filas, u16 campos, índices u32 de
+                                         tabla y una columna empaquetada por campo
+
+    Cada columna lleva un tipo: "q" int64, "d" float64, "m" float64 con máscara
+    de enteros (sumas que mezclan int y float) o "e" lista vacía (el campo
+    "queries" de frequent). Si el snapshot no encaja (tipos no numéricos,
+    tablas con campos distintos, caracteres \\0) se guarda en JSON.
+    decode reconoce ambos formatos y devuelve lo mismo que json.loads(json.dumps(...)).
+    Un snapshot corrupto o truncado (zlib, longitudes, índices de tabla, tipos
+    de columna, bytes sobrantes) siempre termina en ValueError.
+    """
+
+    MAGIC = b"MSNP"
+    VERSION = 1
+    FLAG_ZLIB = 1
+    # nivel 1: casi todo el ahorro de tamaño por una fracción del tiempo del nivel 6
+    ZLIB_LEVEL = 1
+    SECTIONS = ("heavy", "frequent")
+
+    _INT64_MIN = -(2 ** 63)
+    _INT64_MAX = 2 ** 63 - 1
+    # enteros representables exactamente en un float64 (columnas "m")
+    _EXACT_FLOAT_INT = 2 ** 53
+
+    class Unsupported(ValueError):
+        """El snapshot no se puede representar en el formato binario."""
+
+    # ---------------------------
+    #         CODIFICAR
+    # ---------------------------
+    @staticmethod
+    def encode(snapshot: Dict, binary: bool = True, compress: bool = True) -> Union[bytes, str]:
+        """
+        bytes en formato binario, o el JSON de siempre si binary es False
+        o el snapshot no encaja en el formato.
+        """
+        if binary:
+            try:
+                return SnapshotCodec.encode_binary(snapshot, compress)
+            except SnapshotCodec.Unsupported:
+                pass
+        return json.dumps(snapshot)
+
+    @staticmethod
+    def encode_binary(snapshot: Dict, compress: bool = True) -> bytes:
+        if set(snapshot) - {"snapshot", "watermark", *SnapshotCodec.SECTIONS}:
+            raise SnapshotCodec.Unsupported("claves desconocidas en el snapshot")
+
+        tables: Dict[str, int] = {}
+        parts: List[bytes] = [
+            SnapshotCodec._pack_str(snapshot.get("snapshot")),
+            SnapshotCodec._pack_str(snapshot.get("watermark")),
+        ]
+        sections = [
+            SnapshotCodec._pack_section(snapshot.get(name) or {}, tables)
+            for name in SnapshotCodec.SECTIONS
+        ]
+
+        names = "\0".join(tables).encode("utf-8")
+        parts.append(struct.pack("<II", len(tables), len(names)))
+        parts.append(names)
+        parts.extend(sections)
+
+        body = b"".join(parts)
+        flags = 0
+        if compress:
+            body = zlib.compress(body, SnapshotCodec.ZLIB_LEVEL)
+            flags |= SnapshotCodec.FLAG_ZLIB
+        return SnapshotCodec.MAGIC + bytes((SnapshotCodec.VERSION, flags)) + body
+
+    @staticmethod
+    def _pack_section(section: Dict, tables: Dict[str, int]) -> bytes:
+        if not section:
+            return struct.pack("<IH", 0, 0)
+
+        rows = list(section.values())
+        fields = list(rows[0].keys())
+        if any(list(row.keys()) != fields for row in rows):
+            raise SnapshotCodec.Unsupported("tablas con campos distintos")
+
+        index = array("I", (
+            tables.setdefault(SnapshotCodec._json_key(tbl), len(tables)) for tbl in section
+        ))
+        parts = [struct.pack("<IH", len(rows), len(fields))]
+        for field in fields:
+            parts.append(SnapshotCodec._pack_str(field))
+        parts.append(_to_le(index))
+        for field in fields:
+            parts.append(SnapshotCodec._pack_column([row[field] for row in rows]))
+        return b"".join(parts)
+
+    @staticmethod
+    def _pack_column(values: List) -> bytes:
+        kinds = {type(v) for v in values}
+        if kinds == {list} and not any(values):
+            return b"e"
+        if kinds == {int}:
+            if min(values) >= SnapshotCodec._INT64_MIN and max(values) <= SnapshotCodec._INT64_MAX:
+                return b"q" + _to_le(array("q", values))
+            raise SnapshotCodec.Unsupported("entero fuera de int64")
+        if kinds == {float}:
+            return b"d" + _to_le(array("d", values))
+        if kinds == {int, float}:
+            mask = bytes(type(v) is int for v in values)
+            if any(abs(v) > SnapshotCodec._EXACT_FLOAT_INT for v in values if type(v) is int):
+                raise SnapshotCodec.Unsupported("entero no representable en float64")
+            return b"m" + _to_le(array("d", values)) + mask
+        raise SnapshotCodec.Unsupported(f"columna con tipos {kinds}")
+
+    @staticmethod
+    def _pack_str(value: Optional[str]) -> bytes:
+        if value is None:
+            return struct.pack("<i", -1)
+        if not isinstance(value, str):
+            raise SnapshotCodec.Unsupported("se esperaba texto")
+        raw = value.encode("utf-8")
+        return struct.pack("<i", len(raw)) + raw
+
+    @staticmethod
+    def _json_key(key) -> str:
+        """La misma conversión de claves que json.dumps (None -> "null", ...)."""
+        if isinstance(key, str):
+            if "\0" in key:
+                raise SnapshotCodec.Unsupported("nombre de tabla con \\0")
+            return key
+        if key is None or isinstance(key, (bool, int, float)):
+            return json.dumps(key)
+        raise SnapshotCodec.Unsupported("clave de tabla no serializable")
+
+    # ---------------------------
+    #        DECODIFICAR
+    # ---------------------------
+    @staticmethod
+    def decode(raw: Union[bytes, str, None]) -> Optional[Dict]:
+        if not raw:
+            return None
+        if isinstance(raw, bytes) and raw[:4] == SnapshotCodec.MAGIC:
+            return SnapshotCodec.decode_binary(raw)
+        return json.loads(raw)
+
+    @staticmethod
+    def decode_binary(raw: bytes) -> Dict:
+        if len(raw) < 6:
+            raise ValueError("snapshot truncado")
+        version, flags = raw[4], raw[5]
+        if version != SnapshotCodec.VERSION:
+            raise ValueError(f"versión de snapshot no soportada: {version}")
+        if flags & ~SnapshotCodec.FLAG_ZLIB:
+            raise ValueError(f"flags de snapshot desconocidos: {flags}")
+        body = raw[6:]
+        if flags & SnapshotCodec.FLAG_ZLIB:
+            try:
+                body = zlib.decompress(body)
+            except zlib.error as e:
+                raise ValueError(f"snapshot comprimido ilegible: {e}") from None
+
+        reader = _Reader(memoryview(body))
+        snapshot = reader.string()
+        watermark = reader.string()
+        count, size = reader.unpack("<II")
+        names = bytes(reader.take(size)).decode("utf-8").split("\0") if count else []
+        if len(names) != count:
+            raise ValueError("diccionario de tablas inconsistente")
+
+        result = {"snapshot": snapshot}
+        for name in SnapshotCodec.SECTIONS:
+            result[name] = SnapshotCodec._read_section(reader, names)
+        result["watermark"] = watermark
+        if reader.offset != len(body):
+            raise ValueError("bytes sobrantes al final del snapshot")
+        return result
+
+    @staticmethod
+    def _read_section(reader: "_Reader", names: List[str]) -> Dict:
+        rows, field_count = reader.unpack("<IH")
+        if not rows:
+            return {}
+        fields = [reader.string() for _ in range(field_count)]
+        if None in fields:
+            raise ValueError("nombre de campo nulo")
+        index = reader.array("I", rows)
+        if max(index) >= len(names):
+            raise ValueError("índice de tabla fuera del diccionario")
+        if not fields:
+            return {names[i]: {} for i in index}
+        columns = [SnapshotCodec._read_column(reader, rows) for _ in fields]
+        return {
+            names[i]: dict(zip(fields, values))
+            for i, values in zip(index, zip(*columns))
+        }
+
+    @staticmethod
+    def _read_column(reader: "_Reader", rows: int) -> List:
+        kind = bytes(reader.take(1))
+        if kind == b"e":
+            return [[] for _ in range(rows)]
+        if kind == b"q":
+            return reader.array("q", rows)
+        if kind == b"d":
+            return reader.array("d", rows)
+        if kind == b"m":
+            values = reader.array("d", rows)
+            mask = reader.take(rows)
+            return [int(v) if is_int else v for v, is_int in zip(values, mask)]
+        raise ValueError(f"tipo de columna desconocido: {kind!r}")
+
+
+def _to_le(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class _Reader:
+    """Cursor de lectura sobre el cuerpo del snapshot (sin copias intermedias)."""
+
+    def __init__(self, buffer: memoryview):
+        self.buffer = buffer
+        self.offset = 0
+
+    def take(self, size: int) -> memoryview:
+        chunk = self.buffer[self.offset:self.offset + size]
+        if len(chunk) != size:
+            raise ValueError("snapshot truncado")
+        self.offset += size
+        return chunk
+
+    def unpack(self, fmt: str) -> tuple:
+        return struct.unpack(fmt, self.take(struct.calcsize(fmt)))
+
+    def string(self) -> Optional[str]:
+        (size,) = self.unpack("<i")
+        if size < -1:
+            raise ValueError("longitud de texto inválida")
+        return None if size < 0 else bytes(self.take(size)).decode("utf-8")
+
+    def array(self, typecode: str, count: int) -> List:
+        values = array(typecode)
+        values.frombytes(self.take(values.itemsize * count))
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values.tolist()
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+from src.Domain.PlanCacheDomain import PlanCacheDomain
+from src.Services.PlanCacheService import PlanCacheService
+
+
+START = datetime(2024, 1, 1, 10, 0, 0)
+
+
+def stats_row(handle: str, started: datetime, elapsed: timedelta, executions: int) -> dict:
+    """Fila de QUERY_COUNTERS_SQL con el fin de la última ejecución (LAST_COMPLETION_TIME)."""
+    return {
+        "plan_handle": handle,
+        "statement_start_offset": 0,
+        "statement_end_offset": -1,
+        "execution_count": executions,
+        "cpu_time_total": executions * 1000,
+        "database_name": "Baseconta",
+        "is_internal": 0,
+        "last_execution_time": started,
+        "last_completion_time": started + elapsed,
+    }
+
+
+class FakeQueryStats:
+    """dm_exec_query_stats en memoria con el filtro incremental de QUERY_STATS_SINCE."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def put(self, row: dict):
+        self.rows[row["plan_handle"]] = row
+
+    def read(self, since=None) -> list:
+        return [row for row in self.rows.values() if since is None or row["last_completion_time"] >= since]
+
+
+def test_merge_watermark_is_completion_time():
+    rows = [
+        stats_row("0xA", START, timedelta(seconds=90), 1),
+        stats_row("0xB", START + timedelta(seconds=60), timedelta(seconds=1), 1),
+    ]
+    watermark = PlanCacheDomain.merge({}, rows, None)
+    assert watermark == START + timedelta(seconds=90)
+
+
+def test_merge_falls_back_to_last_execution_time():
+    row = stats_row("0xA", START, timedelta(seconds=5), 1)
+    del row["last_completion_time"]
+    assert PlanCacheDomain.merge({}, [row], None) == START
+
+
+def test_statement_started_before_watermark_and_completed_after_is_read():
+    dmv = FakeQueryStats()
+    service = PlanCacheService(database=None, full_scan_every=60)
+
+    # ciclo 1 (escaneo completo): B terminó a las 10:00:50; A lleva corriendo desde las 10:00:30
+    dmv.put(stats_row("0xA", START - timedelta(hours=1), timedelta(seconds=1), 10))
+    dmv.put(stats_row("0xB", START + timedelta(seconds=50), timedelta(0), 5))
+    since = service.resolve_since(None)
+    _, _, watermark = service.apply(dmv.read(since), since, "Baseconta")
+    assert watermark == (START + timedelta(seconds=50)).isoformat()
+
+    # ciclo 2: A termina a las 10:01:30 (empezó antes del watermark)
+    dmv.put(stats_row("0xA", START + timedelta(seconds=30), timedelta(seconds=60), 11))
+    since = service.resolve_since(watermark)
+    assert since == START + timedelta(seconds=50)
+    heavy, _, watermark = service.apply(dmv.read(since), since, "Baseconta")
+
+    executions = {row["plan_handle"]: row["execution_count"] for row in heavy}
+    assert executions["0xA"] == 11
+    assert watermark == (START + timedelta(seconds=90)).isoformat()
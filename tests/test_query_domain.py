@@ -0,0 +1,36 @@
+import pytest
+
+from benchmarks.plan_cache_generator import PlanCacheGenerator
+from benchmarks.sql_corpus import CORPUS
+from src.Domain.QueryDomain import QueryDomain
+
+
+@pytest.mark.parametrize("case", CORPUS, ids=[f"corpus_{i}" for i in range(len(CORPUS))])
+def test_analyze_corpus(case):
+    result = QueryDomain.analyze(case["sql"])
+    assert result["main_table"] == case["main_table"]
+    assert result["query_type"] == case["query_type"]
+    assert result["tables"] == case["tables"]
+
+
+@pytest.mark.parametrize("case", CORPUS, ids=[f"corpus_{i}" for i in range(len(CORPUS))])
+def test_get_main_table_corpus(case):
+    assert QueryDomain.getMainTable(case["sql"]) == case["main_table"]
+
+
+def test_corpus_size():
+    """bench_sql_lexer informa 47/47 sobre este corpus: que no se achique sin aviso."""
+    assert len(CORPUS) == 47
+
+
+def test_get_main_table_short_circuit_matches_analyze():
+    """El corte temprano de getMainTable no cambia la tabla principal de ningún texto del plan cache."""
+    texts = [row["query_text"] for row in PlanCacheGenerator(statements=2000).rows()]
+    texts += [
+        "SELECT a.id FROM (SELECT id FROM interna) a JOIN externa e ON e.id = a.id",
+        "WITH c AS (SELECT id FROM base) SELECT * FROM c JOIN otra o ON o.id = c.id",
+        "(SELECT id FROM uno) UNION SELECT id FROM dos",
+        "UPDATE a SET a.x = 1 FROM tabla_real a WHERE a.id = 2",
+    ]
+    for text in texts:
+        assert QueryDomain.getMainTable(text) == QueryDomain.analyze(text)["main_table"], text
@@ -0,0 +1,45 @@
+import pytest
+from redis.crc import key_slot
+
+from src.Services.ExpositionService import ExpositionService
+from src.Services.LeaderElectionService import LeaderElectionService
+from src.Services.RedisService import RedisService
+
+
+def publish_keys(namespace: str, instance: str, extras=()) -> list:
+    """KEYS de PUBLISH_GENERATION_LUA con fence, como los arma publish_generation."""
+    generation = RedisService.generation_key(namespace, "1")
+    return [
+        generation,
+        generation + ":live",
+        RedisService.namespace_key(namespace, "current"),
+        LeaderElectionService.lease_key(instance),
+        *extras,
+    ]
+
+
+@pytest.mark.parametrize("namespace", [
+    ExpositionService.target_namespace("conta", "conta"),
+    ExpositionService.target_namespace("ventas", "conta"),
+    ExpositionService.exporter_namespace("conta"),
+    ExpositionService.collector_namespace("conta", "memory"),
+])
+def test_publish_keys_share_the_instance_slot(namespace):
+    keys = publish_keys(namespace, "conta", [RedisService.namespace_key(namespace, "LastMetrics")])
+    assert len({key_slot(key.encode()) for key in keys}) == 1, keys
+
+
+def test_read_keys_share_the_namespace_slot():
+    _, current, prefix = RedisService.read_generation_args("conta")
+    assert key_slot(current.encode()) == key_slot(f"{prefix}123:live".encode())
+
+
+def test_decode_generations():
+    replies = [
+        [b"7", [b"metrics", b"a 1"], [b"MemoryUsage", b"m 2"]],
+        [],
+    ]
+    assert RedisService.decode_generations(replies) == [
+        ("7", {"metrics": "a 1", "MemoryUsage": "m 2"}),
+        (None, {}),
+    ]
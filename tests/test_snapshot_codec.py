@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from src.Services.MetricsService import MetricsService
+from src.Services.PrometheusService import PrometheusService
+from src.Utils.SnapshotCodec import SnapshotCodec
+
+
+SNAPSHOT = {
+    "snapshot": "2024-01-01T10:00:00-05:00",
+    "heavy": {
+        f"tabla_{i}": {
+            "execution_count": 10 * i + 1,
+            "cpu_time_total": 1000 * i,
+            "duration_total": 1.5 * i,
+            "logical_reads_total": i if i % 2 else float(i),
+        }
+        for i in range(40)
+    },
+    "frequent": {
+        f"tabla_{i}": {"execution_count": i + 1, "cpu_time_total": 7 * i, "queries": []}
+        for i in range(0, 40, 3)
+    },
+    "watermark": "2024-01-01T09:59:30",
+}
+
+
+class FakeRedis:
+    def __init__(self, raw):
+        self.raw = raw
+
+    def get_bytes(self, key):
+        return self.raw
+
+
+def last_snapshot(raw):
+    service = MetricsService(redis=FakeRedis(raw), database=None, prometheus=PrometheusService(), target="t")
+    return service._get_last_snapshot()
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_round_trip(compress):
+    raw = SnapshotCodec.encode(SNAPSHOT, compress=compress)
+    assert SnapshotCodec.decode(raw) == SNAPSHOT
+    assert last_snapshot(raw) == SNAPSHOT
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_truncated_snapshot_counts_as_missing(compress):
+    raw = SnapshotCodec.encode(SNAPSHOT, compress=compress)
+    for size in range(len(raw)):
+        assert last_snapshot(raw[:size]) is None
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_corrupted_snapshot_never_raises(compress):
+    raw = SnapshotCodec.encode(SNAPSHOT, compress=compress)
+    rng = random.Random(7)
+    for _ in range(2000):
+        corrupted = bytearray(raw)
+        for _ in range(rng.randint(1, 4)):
+            corrupted[rng.randrange(4, len(corrupted))] = rng.randrange(256)
+        snapshot = last_snapshot(bytes(corrupted))
+        # un cambio que deja el formato válido (p. ej. un valor) puede decodificarse
+        assert snapshot is None or isinstance(snapshot["heavy"], dict)
+
+
+def test_decode_reports_structural_errors_as_value_error():
+    raw = bytearray(SnapshotCodec.encode(SNAPSHOT, compress=False))
+    with pytest.raises(ValueError):
+        SnapshotCodec.decode(bytes(raw) + b"\0")
+    with pytest.raises(ValueError):
+        SnapshotCodec.decode(bytes(raw[:-1]))
+    with pytest.raises(ValueError):
+        SnapshotCodec.decode(b"not json")
@@ -0,0 +1,85 @@
+"""
+Armado de los servicios del servidor web, compartido por main.py (Flask) y
+async_main.py (aiohttp). Importar este módulo no crea conexiones ni arranca
+nada: cada punto de entrada llama a build_web_services() y, con
+APP_ROLE=ALL, a start_embedded_collector() una sola vez.
+"""
+import logging
+
+from src.Utils.RedisConection import RedisConection
+from src.Services.RedisService import RedisService
+from src.Services.PrometheusService import PrometheusService
+from src.Services.HistoryService import HistoryService
+from src.Services.GrafanaService import GrafanaService
+from src.Services.ExpositionService import ExpositionService
+from src.Domain.CollectorDomain import CollectorDomain
+from settings.DataBaseSetting import DATABASE_TARGETS, DATABASE_INSTANCES
+from settings.AppSettings import HISTORY_ENABLED, HISTORY_RAW_POINTS, HISTORY_5M_POINTS, HISTORY_1H_POINTS, SCHEDULE_INTERVAL
+from settings.AppSettings import APP_ROLE
+from settings.AppSettings import EXPOSITION_MAX_SERIES
+from settings.AppSettings import COLLECTORS_ENABLED
+from settings.AppSettings import LOG_LEVEL
+
+
+def configure_logging():
+    """Nivel y formato de los logs del proceso (LOG_LEVEL)."""
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+
+
+def build_web_services() -> dict:
+    """Redis, Prometheus, historial, exposición y Grafana de los targets configurados."""
+    redis_service = RedisService(RedisConection())
+    prometheus = PrometheusService()
+    history_service = HistoryService(
+        redis=redis_service,
+        raw_points=HISTORY_RAW_POINTS,
+        five_minute_points=HISTORY_5M_POINTS,
+        hour_points=HISTORY_1H_POINTS,
+        cycle=SCHEDULE_INTERVAL,
+    ) if HISTORY_ENABLED else None
+    targets = [target["name"] for target in DATABASE_TARGETS]
+    instance_of = {
+        target["name"]: instance["name"] for instance in DATABASE_INSTANCES for target in instance["targets"]
+    }
+
+    exposition_service = ExpositionService(
+        redis=redis_service,
+        prometheus=prometheus,
+        targets=targets,
+        max_series=EXPOSITION_MAX_SERIES,
+        collectors=CollectorDomain.names() if COLLECTORS_ENABLED else None,
+        instances=[instance["name"] for instance in DATABASE_INSTANCES],
+        instance_of=instance_of,
+    )
+    grafana_service = GrafanaService(
+        redis=redis_service,
+        history=history_service,
+        targets=targets,
+        instance_of=instance_of,
+    )
+    return {
+        "redis": redis_service,
+        "prometheus": prometheus,
+        "history": history_service,
+        "exposition": exposition_service,
+        "grafana": grafana_service,
+        "targets": targets,
+    }
+
+
+def start_embedded_collector(services: dict):
+    """
+    APP_ROLE=WEB: este proceso solo lee de Redis (varios workers / réplicas);
+    la recolección corre aparte con `python collector.py`.
+    APP_ROLE=ALL (por defecto): servidor y recolector en el mismo proceso. Aun así,
+    con varios workers el lease por instancia deja un solo recolector activo.
+    """
+    if APP_ROLE != "ALL":
+        return None
+
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from collector import build_collector, start_collector
+
+    collection_service = build_collector(services["redis"], services["prometheus"], services["history"])
+    start_collector(collection_service, BackgroundScheduler())
+    return collection_service